@@ -0,0 +1,33 @@
+"""Fake tracks shared by the benchmarks."""
+
+import wavelink
+from wavelink.types.tracks import TrackPayload
+
+from utils.track_codec import encode_track
+
+
+def fake_track(index: int) -> TrackPayload:
+    payload: TrackPayload = {
+        "encoded": "",
+        "info": {
+            "identifier": f"video{index:06d}",
+            "isSeekable": True,
+            "author": f"Artist {index % 97}",
+            "length": 180_000 + index,
+            "isStream": False,
+            "position": 0,
+            "title": f"Benchmark track number {index}",
+            "uri": f"https://www.youtube.com/watch?v=video{index:06d}",
+            "sourceName": "youtube",
+        },
+        "pluginInfo": {},
+        "userData": {},
+    }
+    payload["encoded"] = encode_track(payload)
+    return payload
+
+
+def fake_playable(index: int) -> wavelink.Playable:
+    track = wavelink.Playable(fake_track(index))
+    track.extras = {"requested_by": f"user{index % 50}"}
+    return track
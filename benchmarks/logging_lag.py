@@ -0,0 +1,103 @@
+"""Measures event loop lag while the bot logs heavily at debug level, with
+handlers writing on the loop (the old setup) against the background log
+pipeline. Also runs both against a disk that takes 1 ms per write.
+
+Run with ``python -m benchmarks.logging_lag``.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from utils.logs import TEXT_FORMAT, LogPipeline
+from utils.metrics import LoopMonitor
+
+DURATION = 3.0
+# Debug records per second, spread over the event loop like busy event handlers
+RATE = 20_000
+BATCH = 50
+
+
+class SlowFileHandler(logging.FileHandler):
+    def emit(self, record: logging.LogRecord) -> None:
+        time.sleep(0.001)
+        super().emit(record)
+
+
+async def log_heavily(logger: logging.Logger) -> int:
+    sent = 0
+    deadline = time.perf_counter() + DURATION
+    while time.perf_counter() < deadline:
+        for _ in range(BATCH):
+            logger.debug(f"Player update in guild {sent % 1000}: position={sent}")
+            sent += 1
+        await asyncio.sleep(BATCH / RATE)
+    return sent
+
+
+async def measure(logger: logging.Logger) -> tuple[LoopMonitor, int]:
+    monitor = LoopMonitor(interval=0.01)
+    monitor.start()
+    sent = await log_heavily(logger)
+    monitor.close()
+    return monitor, sent
+
+
+def report(name: str, monitor: LoopMonitor, sent: int, dropped: int = 0) -> None:
+    lag = monitor.lag
+    print(
+        f"{name:<28} lag p50 {lag.quantile(0.5):6.1f} ms | p99 {lag.quantile(0.99):6.1f} ms "
+        f"| max {lag.max:6.1f} ms | logged {sent:>6} | dropped {dropped}"
+    )
+
+
+def fresh_logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(f"benchmark.{name}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def file_handler(directory: str, name: str, slow: bool) -> logging.Handler:
+    handler_cls = SlowFileHandler if slow else logging.FileHandler
+    handler = handler_cls(os.path.join(directory, f"{name}.log"))
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def run(directory: str, slow: bool) -> None:
+    label = "slow disk" if slow else "local disk"
+
+    # Old setup: every record is formatted and written on the loop
+    logger = fresh_logger(f"direct_{slow}")
+    handler = file_handler(directory, f"direct_{slow}", slow)
+    logger.addHandler(handler)
+
+    monitor, sent = asyncio.run(measure(logger))
+    handler.close()
+    report(f"direct, {label}", monitor, sent)
+
+    # Background pipeline writing to the same kind of file, without the
+    # console output to keep the terminal readable
+    logger = fresh_logger(f"pipeline_{slow}")
+    pipeline = LogPipeline(os.path.join(directory, f"pipeline_{slow}.log"))
+    handler = file_handler(directory, f"pipeline_{slow}_target", slow)
+    pipeline.listener.handlers = (handler,)
+    pipeline.attach(logger)
+
+    monitor, sent = asyncio.run(measure(logger))
+    pipeline.close()
+    handler.close()
+    report(f"pipeline, {label}", monitor, sent, pipeline.handler.dropped)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        run(directory, slow=False)
+        run(directory, slow=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Measures how long restoring a guild's player state takes against queue size,
+and what a flush costs when a track was played or a playlist chunk was added.
+
+Run with ``python -m benchmarks.player_store_restore``. Lavalink is not needed,
+restoring is timed up to the point where the queue's tracks are rebuilt.
+"""
+
+import asyncio
+import functools
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import fake_playable, fake_track
+from players.queue import TrackQueue
+from utils.player_store import PlayerSnapshot, PlayerStore
+
+QUEUE_SIZES = [0, 100, 1_000, 5_000, 10_000]
+GUILDS = 1_000
+ROUNDS = 5
+# Tracks added per flush, like a chunk of a playlist being queued
+CHUNK = 100
+
+
+def snapshot(guild_id: int, size: int, full: bool = True) -> PlayerSnapshot:
+    tracks = [fake_track(index) for index in range(size)]
+    return PlayerSnapshot(
+        guild_id=guild_id,
+        channel_id=guild_id,
+        node_id="http://localhost:2333",
+        current=(tracks[0]["encoded"], {"requested_by": "bench"}) if tracks else None,
+        position=42_000,
+        queue=[
+            (
+                track["encoded"],
+                {"requested_by": "bench"},
+                track["info"]["length"],
+                f"youtube:{track['info']['identifier']}",
+            )
+            for track in tracks
+        ],
+    )
+
+
+def queue_snapshot(guild_id: int, queue: TrackQueue, full: bool) -> PlayerSnapshot:
+    # What GuildPlayer.snapshot gives, without a player
+    changes = queue.take_changes()
+    if full:
+        changes = None
+    return PlayerSnapshot(
+        guild_id=guild_id,
+        channel_id=guild_id,
+        node_id="http://localhost:2333",
+        queue=queue.saved() if changes is None else [],
+        changes=changes,
+    )
+
+
+async def timed_flush(
+    store: PlayerStore, guild_id: int, queue: TrackQueue, full: bool
+) -> float:
+    store.mark_dirty(guild_id, lambda _: queue_snapshot(guild_id, queue, full))
+    await store.flush()
+    return store.stats.last_flush_ms
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+
+        # Many idle guilds, to show that opening the store stays cheap
+        store = PlayerStore(path)
+        store.open()
+        for guild_id in range(GUILDS):
+            store.mark_dirty(guild_id, functools.partial(snapshot, guild_id, 10))
+        await store.flush()
+        await store.close()
+
+        started = time.perf_counter()
+        store = PlayerStore(path)
+        store.open()
+        print(
+            f"Open with {GUILDS} saved guilds: "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+        print(f"{'queue':>7} {'flush ms':>9} {'load ms':>8} {'rebuild ms':>11}")
+        for size in QUEUE_SIZES:
+            guild_id = GUILDS + size
+            saved = snapshot(guild_id, size)
+
+            store.mark_dirty(guild_id, lambda _: saved)
+            await store.flush()
+            flush_ms = store.stats.last_flush_ms
+
+            loads: list[float] = []
+            rebuilds: list[float] = []
+            for _ in range(ROUNDS):
+                started = time.perf_counter()
+                loaded = await store.load(guild_id)
+                loaded_at = time.perf_counter()
+
+                assert loaded is not None and len(loaded.queue) == size
+                TrackQueue().load_saved(loaded.queue)
+
+                loads.append((loaded_at - started) * 1000)
+                rebuilds.append((time.perf_counter() - loaded_at) * 1000)
+
+            print(
+                f"{size:>7} {flush_ms:>9.1f} {statistics.median(loads):>8.1f} "
+                f"{statistics.median(rebuilds):>11.1f}"
+            )
+
+        # A track played and a chunk added between two flushes, with only the
+        # changes written against the whole queue written again
+        print(f"\n{'queue':>7} {'rewrite ms':>11} {'changes ms':>11}")
+        tracks = [fake_playable(index) for index in range(CHUNK)]
+        for size in QUEUE_SIZES[1:]:
+            guild_id = 2 * GUILDS + size
+            queue = TrackQueue()
+            queue.put([fake_playable(index) for index in range(size)])
+            await timed_flush(store, guild_id, queue, True)
+
+            timings: dict[bool, list[float]] = {True: [], False: []}
+            for _ in range(ROUNDS):
+                for full in timings:
+                    queue.get()
+                    queue.put(tracks)
+                    queue.delete_range(len(queue) - CHUNK + 1, len(queue))
+                    timings[full].append(
+                        await timed_flush(store, guild_id, queue, full)
+                    )
+
+            print(
+                f"{size:>7} {statistics.median(timings[True]):>11.1f} "
+                f"{statistics.median(timings[False]):>11.2f}"
+            )
+
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""Measures the memory a queued track takes, stored as a full Playable like
+before against the compact records of TrackQueue, and what building tracks
+back costs when they are read.
+
+Run with ``python -m benchmarks.queue_memory``.
+"""
+
+import gc
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+
+import wavelink
+
+from benchmarks.common import fake_playable
+from players.queue import TrackQueue
+
+QUEUE_SIZES = [1_000, 5_000, 20_000]
+# Several large queues loaded at once, like on a busy bot
+QUEUES = 4
+ROUNDS = 5
+
+
+def playable_queue(tracks: list[wavelink.Playable]) -> wavelink.Queue:
+    # What every queue held before, a list of Playables
+    queue = wavelink.Queue()
+    queue.put(tracks)
+    return queue
+
+
+def compact_queue(tracks: list[wavelink.Playable]) -> TrackQueue:
+    queue = TrackQueue()
+    queue.put(tracks)
+    return queue
+
+
+def queued_bytes(
+    size: int, make_queue: Callable[[list[wavelink.Playable]], wavelink.Queue]
+) -> int:
+    """Bytes still allocated by a queue once the tracks put in it are gone."""
+    gc.collect()
+    tracemalloc.start()
+
+    tracks = [fake_playable(index) for index in range(size)]
+    queue = make_queue(tracks)
+    del tracks
+    gc.collect()
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del queue
+    return current
+
+
+def timed(func: Callable[[], object]) -> float:
+    times: list[float] = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(times)
+
+
+def main() -> None:
+    print(
+        f"{'queue':>7} {'Playable B/track':>17} {'compact B/track':>16} {'saved':>6} "
+        f"| {QUEUES} queues, MiB before {'after':>6}"
+    )
+
+    for size in QUEUE_SIZES:
+        before = queued_bytes(size, playable_queue) / size
+        after = queued_bytes(size, compact_queue) / size
+        print(
+            f"{size:>7} {before:>17.0f} {after:>16.0f} {1 - after / before:>6.0%} "
+            f"| {before * size * QUEUES / 2**20:>23.1f} "
+            f"{after * size * QUEUES / 2**20:>6.1f}"
+        )
+
+    size = 5_000
+    tracks = [fake_playable(index) for index in range(size)]
+    print(f"\nAdding {size} tracks: {timed(lambda: compact_queue(tracks)):.1f} ms")
+
+    queue = compact_queue(tracks)
+    del tracks
+    gc.collect()
+
+    # Reading builds tracks again, which is only done for a page or the next track
+    print(f"Building the next track: {timed(lambda: queue.page(0, 1)) * 1000:.0f} us")
+    print(f"Building a /queue page: {timed(lambda: queue.page(100, 5)) * 1000:.0f} us")
+    print(f"Saving the queue: {timed(queue.saved):.1f} ms")
+    print(f"Shuffling the queue: {timed(queue.shuffle):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
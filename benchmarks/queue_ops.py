@@ -0,0 +1,116 @@
+"""Measures positional queue operations, like ``/remove``, ``/move`` and
+``/jump``, on the plain list queues used before and on the ``ChunkedList``
+that ``TrackList`` keeps its records in now. Also times ``/dedupe`` and the
+duplicate check made for every added track.
+
+Run with ``python -m benchmarks.queue_ops``.
+"""
+
+import random
+import statistics
+import time
+from typing import Callable, MutableSequence
+
+from benchmarks.common import fake_playable
+from players.queue import TrackList, TrackQueue
+from utils.chunked_list import ChunkedList
+
+QUEUE_SIZES = [10_000, 30_000, 100_000]
+# Operations timed per round, at random positions
+OPERATIONS = 200
+ROUNDS = 5
+
+
+def remove(items: MutableSequence[object], positions: list[int]) -> None:
+    for position in positions:
+        del items[position % len(items)]
+        items.append(object())
+
+
+def move_to_front(items: MutableSequence[object], positions: list[int]) -> None:
+    for position in positions:
+        items.insert(0, items.pop(position % len(items)))
+
+
+def insert(items: MutableSequence[object], positions: list[int]) -> None:
+    for position in positions:
+        items.insert(position % len(items), object())
+        del items[-1]
+
+
+def remove_range(items: MutableSequence[object], positions: list[int]) -> None:
+    # Removes 50 tracks at a time, like /remove 100 149
+    for position in positions:
+        start = position % (len(items) - 50)
+        del items[start : start + 50]
+        items.extend(object() for _ in range(50))
+
+
+def jump(items: MutableSequence[object], positions: list[int]) -> None:
+    # Drops everything before the track, then takes it from the front
+    for position in positions:
+        index = position % 100
+        del items[:index]
+        items.pop(0)
+        items.extend(object() for _ in range(index + 1))
+
+
+def timed(
+    make: Callable[[list[object]], MutableSequence[object]],
+    operation: Callable[[MutableSequence[object], list[int]], None],
+    size: int,
+) -> float:
+    """Median microseconds per operation."""
+    times: list[float] = []
+    for _ in range(ROUNDS):
+        items = make([object() for _ in range(size)])
+        positions = [random.randrange(size) for _ in range(OPERATIONS)]
+
+        started = time.perf_counter()
+        operation(items, positions)
+        times.append((time.perf_counter() - started) / OPERATIONS * 1_000_000)
+
+    return statistics.median(times)
+
+
+def main() -> None:
+    operations = {
+        "remove": remove,
+        "move to front": move_to_front,
+        "insert": insert,
+        "remove 50": remove_range,
+        "jump": jump,
+    }
+
+    print(f"{'operation':<14} {'queue':>7} {'list us':>8} {'chunked us':>11}")
+    for name, operation in operations.items():
+        for size in QUEUE_SIZES:
+            before = timed(list, operation, size)
+            after = timed(ChunkedList, operation, size)
+            print(f"{name:<14} {size:>7} {before:>8.2f} {after:>11.2f}")
+
+    # Every song queued twice, like two merged copies of a playlist
+    print(f"\n{'queue':>7} {'dedupe ms':>10} {'duplicate check us':>19}")
+    for size in QUEUE_SIZES:
+        tracks = [fake_playable(index % (size // 2)) for index in range(size)]
+        queued = TrackList(tracks)
+
+        dedupe: list[float] = []
+        for _ in range(ROUNDS):
+            copied = queued.copy()
+            started = time.perf_counter()
+            copied.dedupe()
+            dedupe.append((time.perf_counter() - started) * 1000)
+
+        queue = TrackQueue()
+        queue.put(tracks)
+        started = time.perf_counter()
+        for track in tracks[:OPERATIONS]:
+            queue.is_queued(track)
+        check = (time.perf_counter() - started) / OPERATIONS * 1_000_000
+
+        print(f"{size:>7} {statistics.median(dedupe):>10.1f} {check:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compares rendering a /queue page against copying the whole queue first,
+and against showing a page that is already cached.
+
+Run with ``python -m benchmarks.queue_view``.
+"""
+
+import asyncio
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+
+from benchmarks.common import fake_playable
+from players.queue import TrackQueue
+from utils.views import QueuedView, QueuePages
+
+QUEUE_SIZES = [100, 1_000, 5_000, 10_000]
+ROUNDS = 20
+
+
+def copy_whole_queue(queue: TrackQueue) -> None:
+    # What QueuedView used to do before slicing the page
+    tracks = [queue.peek(index) for index in range(queue.count)]
+    tracks[1:][:5]
+    sum(track.length for track in tracks)
+
+
+def measure(func: Callable[[], object]) -> tuple[float, int]:
+    times: list[float] = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(times), peak
+
+
+async def main() -> None:
+    print(
+        f"{'queue':>7} {'copy ms':>8} {'copy KiB':>9} {'page ms':>8} "
+        f"{'page KiB':>9} {'cached ms':>10}"
+    )
+
+    for size in QUEUE_SIZES:
+        queue = TrackQueue()
+        queue.put([fake_playable(index) for index in range(size)])
+        last_page = size // 5
+
+        copy_ms, copy_peak = measure(lambda: copy_whole_queue(queue))
+        page_ms, page_peak = measure(lambda: QueuedView(QueuePages(queue), last_page))
+
+        pages = QueuePages(queue)
+        pages.get(last_page)
+        cached_ms, _ = measure(lambda: QueuedView(pages, last_page))
+
+        print(
+            f"{size:>7} {copy_ms:>8.2f} {copy_peak / 1024:>9.1f} "
+            f"{page_ms:>8.2f} {page_peak / 1024:>9.1f} {cached_ms:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
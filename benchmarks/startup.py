@@ -0,0 +1,210 @@
+"""Measures bot startup against a fake Lavalink node that takes a while to
+accept the websocket, like one that is still starting up.
+
+Reports the time to import the bot, to load every cog, until the bot would
+connect to the gateway, and until audio is ready, for the old startup
+(cogs one by one, then waiting for Lavalink) and the current one.
+
+Run with ``python -m benchmarks.startup``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+import discord
+import wavelink
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from bot import BeatBob
+
+# Time Lavalink takes to accept the websocket
+HANDSHAKE_DELAY = 2.0
+RUNS = 3
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+async def websocket(request: web.Request) -> web.WebSocketResponse:
+    await asyncio.sleep(HANDSHAKE_DELAY)
+
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    await ws.send_str(json.dumps({"op": "ready", "resumed": False, "sessionId": "x"}))
+    async for _ in ws:
+        pass
+    return ws
+
+
+async def info(request: web.Request) -> web.Response:
+    return web.json_response({"sourceManagers": ["youtube"]})
+
+
+async def session(request: web.Request) -> web.Response:
+    return web.json_response({"resuming": True, "timeout": 60})
+
+
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response(
+        {
+            "players": 0,
+            "playingPlayers": 0,
+            "uptime": 1000,
+            "memory": {"free": 1, "used": 1, "allocated": 1, "reservable": 1},
+            "cpu": {"cores": 1, "systemLoad": 0.0, "lavalinkLoad": 0.0},
+        }
+    )
+
+
+async def start_lavalink(port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/v4/websocket", websocket)
+    app.router.add_get("/v4/info", info)
+    app.router.add_get("/v4/stats", stats)
+    app.router.add_patch("/v4/sessions/{session}", session)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def forget_cogs() -> None:
+    # Every run imports the cogs again, like a fresh process would
+    for name in [name for name in sys.modules if name.startswith("cogs.")]:
+        del sys.modules[name]
+
+
+def time_import() -> float:
+    """Seconds a fresh interpreter takes to import the bot and its dependencies."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import time; started = time.perf_counter(); import bot; "
+            "print(time.perf_counter() - started)",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return float(output.split()[-1])
+
+
+def extensions() -> list[str]:
+    return sorted(
+        filename[:-3]
+        for filename in os.listdir("cogs")
+        if filename.endswith(".py") and not filename.startswith("__")
+    )
+
+
+async def fake_login(bot: BeatBob) -> None:
+    # What logging in sets up before setup_hook runs. Lavalink wants the
+    # bot's user id
+    await bot._async_setup_hook()
+    bot._connection.user = discord.ClientUser(
+        state=bot._connection,
+        data={
+            "id": 1,
+            "username": "BeatBob",
+            "discriminator": "0",
+            "global_name": None,
+            "avatar": None,
+        },
+    )
+
+
+async def run(old: bool) -> tuple[float, float, float]:
+    """Starts a bot without connecting it to Discord.
+
+    Returns:
+        tuple[float, float, float]: Seconds until the cogs were loaded, until
+            the gateway would be connected, and until audio was ready.
+    """
+    from bot import BeatBob
+
+    forget_cogs()
+    bot = BeatBob()
+    await fake_login(bot)
+
+    started = time.perf_counter()
+    if old:
+        bot.player_store.start()
+        bot.edit_scheduler.start()
+        for name in extensions():
+            await bot._load_cog(name)
+        cogs_loaded = time.perf_counter() - started
+
+        await wavelink.Pool.connect(nodes=bot.node_pool.create_nodes({}), client=bot)
+        await bot.node_pool.refresh_stats()
+        gateway = time.perf_counter() - started
+    else:
+        await bot.setup_hook()
+        cogs_loaded = gateway = time.perf_counter() - started
+
+    while not bot.node_pool.ready:
+        await asyncio.sleep(0.005)
+    ready = time.perf_counter() - started
+
+    for node in wavelink.Pool.nodes.values():
+        await node.close(eject=True)
+        await node._session.close()
+    await bot.close()
+
+    return cogs_loaded, gateway, ready
+
+
+async def compare(port: int) -> None:
+    lavalink = await start_lavalink(port)
+
+    for old in (True, False):
+        runs = [await run(old) for _ in range(RUNS)]
+        cogs_loaded, gateway, ready = (
+            statistics.median(column) * 1000 for column in zip(*runs)
+        )
+        print(
+            f"{'old' if old else 'current':<8} cogs {cogs_loaded:7.1f} ms "
+            f"| gateway after {gateway:7.1f} ms | audio ready after {ready:7.1f} ms"
+        )
+
+    await lavalink.cleanup()
+
+
+def main() -> None:
+    port = free_port()
+    directory = tempfile.mkdtemp()
+    os.environ.update(
+        LAVALINK_URI=f"http://127.0.0.1:{port}",
+        LAVALINK_NODES="",
+        PLAYER_STORE_PATH=os.path.join(directory, "beatbob.db"),
+        METRICS_PORT="0",
+    )
+
+    imports = statistics.median(time_import() for _ in range(RUNS)) * 1000
+    print(f"import   {imports:7.1f} ms")
+
+    # Keep the console to the results
+    logging.getLogger("beatbob").setLevel(logging.CRITICAL)
+    logging.getLogger("wavelink").setLevel(logging.CRITICAL)
+
+    asyncio.run(compare(port))
+
+
+if __name__ == "__main__":
+    main()
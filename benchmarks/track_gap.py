@@ -0,0 +1,151 @@
+"""Measures the gap between two tracks of a Spotify playlist, with and without
+looking ahead, against a fake Lavalink node.
+
+Like lavasrc, the fake node has to search YouTube before it can start a
+mirrored track, which takes ``SEARCH_MS``. Starting a track it was given a
+playable copy of only takes ``PLAY_MS``. The gap is timed from the end of
+one track until the node accepted the next. The playlist is queued twice,
+the second time as new tracks, like someone queueing it again.
+
+Run with ``python -m benchmarks.track_gap``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+from typing import cast
+
+import aiohttp
+import discord
+import wavelink
+from aiohttp import web
+
+from benchmarks.common import fake_track
+from players.guild_player import GuildPlayer
+from players.prefetch import Prefetcher
+from utils import compat
+from utils.search import SearchCache, TrackResolver
+from utils.track_codec import decode_track, encode_track
+
+# Assumed time Lavalink takes to search YouTube, and to start a track
+SEARCH_MS = 300
+PLAY_MS = 5
+# Long enough for the look-ahead of the next tracks to finish
+TRACK_SECONDS = 1.0
+TRACKS = 8
+PORT = 23330
+
+
+def spotify_track(index: int) -> wavelink.Playable:
+    payload = fake_track(index)
+    payload["info"]["sourceName"] = "spotify"
+    payload["info"]["isrc"] = f"USRC1{index:07d}"
+    payload["encoded"] = encode_track(payload)
+    return wavelink.Playable(payload)
+
+
+class FakeLavalink:
+    def __init__(self) -> None:
+        self.searches = 0
+
+    async def load_tracks(self, request: web.Request) -> web.Response:
+        self.searches += 1
+        await asyncio.sleep(SEARCH_MS / 1000)
+
+        index = abs(hash(request.query["identifier"])) % 1_000_000
+        return web.json_response({"loadType": "search", "data": [fake_track(index)]})
+
+    async def update_player(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        info = decode_track(data["track"]["encoded"])["info"]
+        if info["sourceName"] == "spotify":
+            # lavasrc looks for a copy to play first
+            self.searches += 1
+            await asyncio.sleep(SEARCH_MS / 1000)
+
+        await asyncio.sleep(PLAY_MS / 1000)
+        return web.json_response({})
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_get("/v4/loadtracks", self.load_tracks)
+        app.router.add_patch(
+            "/v4/sessions/{session}/players/{guild}", self.update_player
+        )
+
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", PORT).start()
+        return runner
+
+
+async def play_queue(depth: int) -> tuple[list[float], int, int]:
+    """Plays the playlist twice.
+
+    Returns:
+        tuple[list[float], int, int]: Gaps in ms, and searches Lavalink made
+            in the first and in the second round.
+    """
+    lavalink = FakeLavalink()
+    runner = await lavalink.start()
+
+    async with aiohttp.ClientSession() as session:
+        node = wavelink.Node(
+            uri=f"http://127.0.0.1:{PORT}",
+            password="",
+            session=session,
+            # Requests carry the bot's user id
+            client=cast(discord.Client, SimpleNamespace(user=SimpleNamespace(id=1))),
+        )
+        compat.set_session_id(node, "bench")
+
+        # Enough of a player for the queue and the look-ahead
+        guild_player = GuildPlayer(
+            cast(wavelink.Player, SimpleNamespace(node=node, guild=None))
+        )
+        queue = guild_player.get_queue()
+        prefetcher = Prefetcher(
+            TrackResolver(SearchCache(maxsize=512, ttl=600)), depth=depth
+        )
+
+        gaps: list[float] = []
+        searches: list[int] = []
+        for _ in range(2):
+            queue.put([spotify_track(index) for index in range(TRACKS)])
+            lavalink.searches = 0
+
+            while queue:
+                prefetcher.schedule(0, guild_player)
+                await asyncio.sleep(TRACK_SECONDS)
+
+                ended = time.perf_counter()
+                track = queue.get()
+                await node._update_player(0, data={"track": {"encoded": track.encoded}})
+                gaps.append((time.perf_counter() - ended) * 1000)
+
+            searches.append(lavalink.searches)
+
+        prefetcher.close()
+
+    await runner.cleanup()
+    return gaps, searches[0], searches[1]
+
+
+async def main() -> None:
+    print(
+        f"{'look-ahead':>10} {'median gap ms':>14} {'max gap ms':>11} "
+        f"{'searches':>9} {'again':>6}"
+    )
+    for depth in (0, 3):
+        gaps, first, second = await play_queue(depth)
+        print(
+            f"{depth:>10} {statistics.median(gaps):>14.1f} {max(gaps):>11.1f} "
+            f"{first:>9} {second:>6}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
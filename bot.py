@@ -1,7 +1,8 @@
-import datetime
+import asyncio
 import logging
 import os
 import platform
+from typing import TYPE_CHECKING, Any, cast
 
 import discord
 import wavelink
@@ -9,6 +10,23 @@ from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 
+from players.prefetch import Prefetcher, parse_providers
+from players.reaper import IdleReaper
+from utils import compat
+from utils.announcements import Announcer
+from utils.command_sync import CommandSyncer
+from utils.edits import EditScheduler
+from utils.logs import LogPipeline
+from utils.metrics import TransitionMetrics
+from utils.nodes import NodePool, parse_nodes
+from utils.player_store import PlayerStore
+from utils.search import SearchCache, TrackResolver
+from utils.sharding import format_shard_ids, parse_shard_ids
+from utils.tracing import Tracer, TracingCommandTree
+
+if TYPE_CHECKING:
+    from cogs.music import Music
+
 # Fetch environment variables
 load_dotenv()
 
@@ -16,9 +34,77 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "")
 COMMAND_PREFIX = os.getenv("COMMAND_PREFIX", "!")
 
 GUILD_ID = os.getenv("GUILD_ID", "")
+# Sync global slash commands on startup, when they changed since the last sync
+SYNC_COMMANDS_ON_STARTUP = os.getenv("SYNC_COMMANDS_ON_STARTUP", "").lower() == "true"
+
+# Empty shard count lets Discord decide. Shard ids and cluster id are set by
+# launcher.py when running as one of several worker processes
+SHARD_COUNT = int(os.getenv("SHARD_COUNT") or 0) or None
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS", ""))
+CLUSTER_ID = os.getenv("CLUSTER_ID", "")
 
 LAVALINK_URI = os.getenv("LAVALINK_URI", "")
 LAVALINK_PASSWORD = os.getenv("LAVALINK_PASSWORD", "youshallnotpass")
+# Comma separated [region@]uri[|password], takes precedence over LAVALINK_URI
+LAVALINK_NODES = os.getenv("LAVALINK_NODES", "")
+LAVALINK_STATS_INTERVAL = float(os.getenv("LAVALINK_STATS_INTERVAL", "30"))
+LAVALINK_FAILOVER_DELAY = float(os.getenv("LAVALINK_FAILOVER_DELAY", "5"))
+# Keep audio playing through restarts. 0 disables resuming
+LAVALINK_RESUME_TIMEOUT = int(os.getenv("LAVALINK_RESUME_TIMEOUT", "60"))
+
+PLAYER_STORE_PATH = os.getenv("PLAYER_STORE_PATH", "data/beatbob.db")
+PLAYER_STORE_FLUSH_INTERVAL = float(os.getenv("PLAYER_STORE_FLUSH_INTERVAL", "2"))
+
+# Seconds between progress updates of live now playing messages
+NOW_PLAYING_INTERVAL = float(os.getenv("NOW_PLAYING_INTERVAL", "10"))
+# Cap on message edits per second across all guilds
+MESSAGE_EDITS_PER_SECOND = float(os.getenv("MESSAGE_EDITS_PER_SECOND", "10"))
+
+# Seconds to collect announcements in a channel before posting them as one message
+ANNOUNCE_WINDOW = float(os.getenv("ANNOUNCE_WINDOW", "1.5"))
+
+# Start the next track this many ms before the current one ends, trading the
+# very end of a song for less silence in between. 0 waits for the track end
+EARLY_HANDOFF_MS = int(os.getenv("EARLY_HANDOFF_MS", "0"))
+
+# Playlists stop adding tracks while a queue holds this many
+MAX_QUEUE_LENGTH = int(os.getenv("MAX_QUEUE_LENGTH", "5000"))
+
+# Seconds a player may sit in a voice channel without listeners, and without
+# playing anything, before it is disconnected. 0 disables either
+ALONE_TIMEOUT = float(os.getenv("ALONE_TIMEOUT", "60"))
+IDLE_TIMEOUT = float(os.getenv("IDLE_TIMEOUT", "300"))
+# Past this many players both timeouts shrink in proportion. 0 keeps them fixed
+IDLE_SOFT_LIMIT = int(os.getenv("IDLE_SOFT_LIMIT", "0"))
+
+# Queued tracks to resolve ahead of playback. 0 disables looking ahead
+LOOKAHEAD_DEPTH = int(os.getenv("LOOKAHEAD_DEPTH", "3"))
+# Look-ahead searches allowed at once per Lavalink node
+LOOKAHEAD_PER_NODE = int(os.getenv("LOOKAHEAD_PER_NODE", "2"))
+# Comma separated queries tried for mirrored tracks, as in lavasrc.providers
+# of Lavalink's application.yml. Empty uses lavasrc's defaults
+LOOKAHEAD_PROVIDERS = parse_providers(os.getenv("LOOKAHEAD_PROVIDERS", ""))
+
+# Port of the Prometheus metrics endpoint at /metrics. 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# "text" or "json" lines
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Log files are rotated at this size or age, and this many old ones are kept
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "10"))
+# Records waiting to be written before new ones are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Share of commands logged with their timings, and how slow a command has to
+# be for all its steps to be logged
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
 
 
 def require_setting(name: str, value: str) -> str:
@@ -28,76 +114,196 @@ def require_setting(name: str, value: str) -> str:
     return value
 
 
-# Setup loggers
-logger = logging.getLogger("beatbob")
-logger.setLevel(logging.DEBUG)
-log_formatter = logging.Formatter(
-    fmt="%(asctime)s :: %(levelname)-7s :: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+def setup_logging() -> LogPipeline:
+    """Sets up the bot's loggers, when it's run rather than imported.
 
-# File handler
-os.makedirs(os.path.dirname("logs/"), exist_ok=True)
-file_handler = logging.FileHandler(
-    filename=f'logs/beatbob_{datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S")}.log',
-    encoding="utf-8",
-    mode="w",
-)
-file_handler.setFormatter(log_formatter)
+    Records are written by a background thread, so logging never blocks the
+    event loop on disk or console output.
 
-# Console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(log_formatter)
+    Returns:
+        LogPipeline: The running pipeline, to be closed on exit.
+    """
+    logger = logging.getLogger("beatbob")
+    logger.setLevel(logging.DEBUG)
 
-# Add handlers
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+    log_pipeline = LogPipeline(
+        f'logs/beatbob{f"_cluster{CLUSTER_ID}" if CLUSTER_ID else ""}.log',
+        json_format=LOG_FORMAT == "json",
+        max_bytes=LOG_MAX_BYTES,
+        interval=LOG_ROTATE_HOURS * 60 * 60,
+        backup_count=LOG_BACKUPS,
+        queue_size=LOG_QUEUE_SIZE,
+    )
+    log_pipeline.attach(logger)
+    return log_pipeline
 
 
-class BeatBob(commands.Bot):
+class BeatBob(commands.AutoShardedBot):
     def __init__(self) -> None:
         intents = discord.Intents.default()
         intents.message_content = True
 
         self.logger = logging.getLogger("beatbob")
 
+        self.resolver = TrackResolver(
+            SearchCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+        )
+
+        self.node_pool = NodePool(
+            parse_nodes(
+                LAVALINK_NODES or require_setting("LAVALINK_URI", LAVALINK_URI),
+                LAVALINK_PASSWORD,
+            ),
+            stats_interval=LAVALINK_STATS_INTERVAL,
+            failover_delay=LAVALINK_FAILOVER_DELAY,
+            resume_timeout=LAVALINK_RESUME_TIMEOUT,
+        )
+
+        self.player_store = PlayerStore(
+            PLAYER_STORE_PATH,
+            flush_interval=PLAYER_STORE_FLUSH_INTERVAL,
+            # Every cluster has its own Lavalink sessions
+            session_scope=f"cluster{CLUSTER_ID}" if CLUSTER_ID else "",
+        )
+        self.player_store.open()
+
+        self.edit_scheduler = EditScheduler(max_per_second=MESSAGE_EDITS_PER_SECOND)
+        self.now_playing_interval = NOW_PLAYING_INTERVAL
+        self.max_queue_length = MAX_QUEUE_LENGTH
+        self.handoff_ms = EARLY_HANDOFF_MS
+        self.announcer = Announcer(window=ANNOUNCE_WINDOW)
+        self.transitions = TransitionMetrics()
+        self.prefetcher = Prefetcher(
+            self.resolver,
+            providers=LOOKAHEAD_PROVIDERS,
+            depth=LOOKAHEAD_DEPTH,
+            per_node=LOOKAHEAD_PER_NODE,
+        )
+        self.reaper = IdleReaper(
+            alone_timeout=ALONE_TIMEOUT,
+            idle_timeout=IDLE_TIMEOUT,
+            soft_limit=IDLE_SOFT_LIMIT,
+        )
+
+        self.tracer = Tracer(sample_rate=TRACE_SAMPLE_RATE, slow_ms=TRACE_SLOW_MS)
+        http_trace = self.tracer.http_trace()
+        # Lets message edits follow Discord's rate limit buckets
+        self.edit_scheduler.watch(http_trace)
+
         super().__init__(
             command_prefix=COMMAND_PREFIX,
             intents=intents,
             description="A mediocre music bot",
+            tree_cls=TracingCommandTree,
+            http_trace=http_trace,
+            shard_count=SHARD_COUNT,
+            # None runs every shard, the stubs just don't say so
+            shard_ids=cast(list[int], SHARD_IDS),
+        )
+
+        self.cluster_id = CLUSTER_ID
+
+        self.command_syncer = CommandSyncer(self.tree, self.player_store)
+        self._sync_task: asyncio.Task[None] | None = None
+
+        self.metrics_host = METRICS_HOST
+        # Every cluster needs its own port
+        self.metrics_port = (
+            METRICS_PORT + int(CLUSTER_ID)
+            if METRICS_PORT and CLUSTER_ID
+            else METRICS_PORT
         )
 
     async def setup_hook(self) -> None:
-        # Load cogs
-        for filename in os.listdir(os.path.join(os.path.dirname(__file__), "cogs")):
-            if not filename.endswith(".py") or filename.startswith("__"):
-                continue
-
-            extension_name = filename[:-3]
-
-            try:
-                await self.load_extension(f"cogs.{extension_name}")
-                self.logger.debug(f"Loaded extension '{extension_name}'")
-            except Exception:
-                self.logger.exception(f"Failed to load extension '{extension_name}'")
-
-        # Connect Lavalink
-        node = wavelink.Node(
-            uri=require_setting("LAVALINK_URI", LAVALINK_URI),
-            password=LAVALINK_PASSWORD,
+        self.player_store.start()
+        self.edit_scheduler.start()
+
+        # Load cogs, concurrently since each may wait on its own setup
+        extensions = [
+            filename[:-3]
+            for filename in os.listdir(os.path.join(os.path.dirname(__file__), "cogs"))
+            if filename.endswith(".py") and not filename.startswith("__")
+        ]
+        await asyncio.gather(*(self._load_cog(name) for name in extensions))
+
+        if not compat.SUPPORTED:
+            self.logger.warning(
+                f"Resuming and moving players off lost nodes need discord.py "
+                f"{compat.DISCORD_VERSION} and wavelink {compat.WAVELINK_VERSION}."
+            )
+
+        # Lavalink connects in the background, the gateway doesn't wait for it
+        self.node_pool.start(
+            self, self.player_store.sessions if self.resuming else None
         )
+
+        # Workers share their commands, one of them syncing is enough
+        if SYNC_COMMANDS_ON_STARTUP and self.cluster_id in ("", "0"):
+            self._sync_task = asyncio.create_task(self._sync_commands())
+
+    async def _sync_commands(self) -> None:
+        try:
+            result = await self.command_syncer.sync()
+        except Exception:
+            self.logger.exception("Failed to sync commands on startup.")
+            return
+
+        if not result.synced:
+            self.logger.info(f"Skipped syncing commands, {result.reason}.")
+
+    async def _load_cog(self, extension_name: str) -> None:
         try:
-            await wavelink.Pool.connect(nodes=[node], client=self)
+            await self.load_extension(f"cogs.{extension_name}")
+            self.logger.debug(f"Loaded extension '{extension_name}'")
         except Exception:
-            self.logger.exception("Failed to connect to Lavalink.")
-            raise
+            self.logger.exception(f"Failed to load extension '{extension_name}'")
+
+    @property
+    def resuming(self) -> bool:
+        return self.node_pool.resume_timeout > 0 and compat.SUPPORTED
+
+    async def close(self) -> None:
+        if self.resuming:
+            await self._detach_players()
+            await compat.close_gateway_resumable(self)
+
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+
+        # Cogs are unloaded first, which lets Music save its players
+        await super().close()
+        self.edit_scheduler.close()
+        self.announcer.close()
+        self.prefetcher.close()
+        self.reaper.close()
+        await self.node_pool.close()
+        await self.player_store.close()
+
+    async def _detach_players(self) -> None:
+        # Saved first, a player detached without its state can't be resumed
+        music = cast("Music | None", self.get_cog("Music"))
+        if music is None or not await music.save_players():
+            return
+
+        detached = music.detach_players()
+        self.logger.info(f"Saved {detached} guild players for resuming.")
+
+    async def on_app_command_completion(
+        self,
+        interaction: discord.Interaction,
+        command: app_commands.Command[Any, ..., Any] | app_commands.ContextMenu,
+    ) -> None:
+        self.tracer.finish(interaction)
 
     async def on_ready(self) -> None:
         assert self.user is not None
         self.logger.info(f"Logged in as: {self.user.name}")
         self.logger.info(f"Python version: {platform.python_version()}")
         self.logger.info(f"System OS: {platform.system()} {platform.release()}")
+        self.logger.info(
+            f"Shards: {format_shard_ids(list(self.shards))} of {self.shard_count}"
+            + (f" | Cluster: {self.cluster_id}" if self.cluster_id else "")
+        )
         self.logger.info("Bot is ready!")
 
     async def on_disconnect(self) -> None:
@@ -106,7 +312,20 @@ class BeatBob(commands.Bot):
     async def on_connect(self) -> None:
         self.logger.info("Connected to Discord.")
 
+    async def on_shard_ready(self, shard_id: int) -> None:
+        self.logger.info(f"Shard {shard_id} is ready.")
+
+    async def on_shard_resumed(self, shard_id: int) -> None:
+        self.logger.info(f"Shard {shard_id} resumed its session.")
+
+    async def on_shard_disconnect(self, shard_id: int) -> None:
+        self.logger.warning(f"Shard {shard_id} disconnected from Discord.")
+
 
 if __name__ == "__main__":
+    log_pipeline = setup_logging()
     bot = BeatBob()
-    bot.run(require_setting("DISCORD_TOKEN", DISCORD_TOKEN))
+    try:
+        bot.run(require_setting("DISCORD_TOKEN", DISCORD_TOKEN))
+    finally:
+        log_pipeline.close()
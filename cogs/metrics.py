@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, cast
+
+import discord
+import wavelink
+from aiohttp import web
+from discord import app_commands
+from discord.ext import commands
+
+from utils.metrics import Histogram, LoopMonitor, expose_metric, process_rss
+
+if TYPE_CHECKING:
+    from bot import BeatBob
+    from cogs.music import Music
+
+logger = logging.getLogger("beatbob")
+
+
+class Metrics(commands.Cog):
+    """Serves bot metrics over HTTP in the Prometheus text format.
+
+    Labels are limited to command names, shards, nodes, transition phases,
+    reclaim reasons and close codes, so the amount of series doesn't grow
+    with the amount of guilds.
+    """
+
+    def __init__(self, bot: BeatBob) -> None:
+        self.bot = bot
+
+        # (command, "ok" or "error") -> count
+        self.commands: dict[tuple[str, str], int] = {}
+        self.command_latency: dict[str, Histogram] = {}
+        self.close_codes: dict[int, int] = {}
+
+        self.loop_monitor = LoopMonitor()
+        self._runner: web.AppRunner | None = None
+        self._previous_on_error = bot.tree.on_error
+
+    async def cog_load(self) -> None:
+        self.loop_monitor.start()
+        self.bot.tree.error(self.on_app_command_error)
+
+        if self.bot.metrics_port <= 0:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.serve)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(
+                self._runner, self.bot.metrics_host, self.bot.metrics_port
+            ).start()
+        except OSError:
+            await self._runner.cleanup()
+            self._runner = None
+            raise
+
+        logger.info(
+            f"Serving metrics on http://{self.bot.metrics_host}:{self.bot.metrics_port}/metrics"
+        )
+
+    async def cog_unload(self) -> None:
+        self.loop_monitor.close()
+        self.bot.tree.error(self._previous_on_error)
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _command_done(self, interaction: discord.Interaction, status: str) -> None:
+        command = interaction.command
+        if command is None:
+            return
+
+        name = command.qualified_name
+        self.commands[(name, status)] = self.commands.get((name, status), 0) + 1
+
+        # Measured from when the user ran the command, as Discord saw it
+        latency = discord.utils.utcnow() - interaction.created_at
+        self.command_latency.setdefault(name, Histogram()).observe(
+            latency.total_seconds() * 1000
+        )
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(
+        self,
+        interaction: discord.Interaction,
+        command: (
+            app_commands.Command[commands.Cog, ..., None] | app_commands.ContextMenu
+        ),
+    ) -> None:
+        self._command_done(interaction, "ok")
+
+    async def on_app_command_error(
+        self,
+        interaction: discord.Interaction[BeatBob],
+        error: app_commands.AppCommandError,
+    ) -> None:
+        self._command_done(interaction, "error")
+
+        # Keep the default logging of unhandled errors
+        await self._previous_on_error(interaction, error)
+
+    @commands.Cog.listener()
+    async def on_wavelink_websocket_closed(
+        self, payload: wavelink.WebsocketClosedEventPayload
+    ) -> None:
+        code = int(payload.code.value)
+        self.close_codes[code] = self.close_codes.get(code, 0) + 1
+
+    async def serve(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    def render(self) -> str:
+        lines = expose_metric(
+            "beatbob_commands_total",
+            "counter",
+            "Slash commands run, by command and outcome.",
+            [
+                ({"command": name, "status": status}, count)
+                for (name, status), count in sorted(self.commands.items())
+            ],
+        )
+
+        lines += [
+            "# HELP beatbob_command_latency_ms Time from running a slash command to it finishing.",
+            "# TYPE beatbob_command_latency_ms histogram",
+        ]
+        for name, histogram in sorted(self.command_latency.items()):
+            lines += histogram.expose("beatbob_command_latency_ms", {"command": name})
+
+        # Music may not be loaded, or failed to load
+        music = cast("Music | None", self.bot.get_cog("Music"))
+        queue_lengths = (
+            [guild_player.get_queue_size() for guild_player in music.players.values()]
+            if music is not None
+            else []
+        )
+        lines += expose_metric(
+            "beatbob_players",
+            "gauge",
+            "Active guild players.",
+            [({}, len(queue_lengths))],
+        )
+        lines += expose_metric(
+            "beatbob_queued_tracks",
+            "gauge",
+            "Tracks queued across all guilds.",
+            [({}, sum(queue_lengths))],
+        )
+        lines += expose_metric(
+            "beatbob_max_queue_length",
+            "gauge",
+            "Length of the longest queue.",
+            [({}, max(queue_lengths, default=0))],
+        )
+
+        reaper = self.bot.reaper
+        lines += expose_metric(
+            "beatbob_players_reclaimed_total",
+            "counter",
+            "Players disconnected because nobody was listening, by reason.",
+            [
+                ({"reason": reason}, count)
+                for reason, count in sorted(reaper.stats.reclaimed.items())
+            ],
+        )
+        lines += expose_metric(
+            "beatbob_player_reclaim_failures_total",
+            "counter",
+            "Players that failed to be reclaimed.",
+            [({}, reaper.stats.failed)],
+        )
+        lines += expose_metric(
+            "beatbob_players_awaiting_reclaim",
+            "gauge",
+            "Players without listeners, waiting for their timeout.",
+            [({}, len(reaper))],
+        )
+
+        lines += [
+            "# HELP beatbob_search_latency_ms Latency of searches sent to Lavalink.",
+            "# TYPE beatbob_search_latency_ms histogram",
+            *self.bot.resolver.latency.expose("beatbob_search_latency_ms"),
+        ]
+
+        lines += [
+            "# HELP beatbob_loop_lag_ms How late the event loop runs scheduled work.",
+            "# TYPE beatbob_loop_lag_ms histogram",
+            *self.loop_monitor.lag.expose("beatbob_loop_lag_ms"),
+        ]
+
+        lines += expose_metric(
+            "beatbob_gateway_latency_seconds",
+            "gauge",
+            "Heartbeat latency of each shard.",
+            [
+                ({"shard": str(shard_id)}, shard.latency)
+                for shard_id, shard in sorted(self.bot.shards.items())
+            ],
+        )
+
+        lines += expose_metric(
+            "beatbob_voice_websocket_closed_total",
+            "counter",
+            "Discord voice websocket closes reported by Lavalink, by close code.",
+            [
+                ({"code": str(code)}, count)
+                for code, count in sorted(self.close_codes.items())
+            ],
+        )
+
+        lines += expose_metric(
+            "beatbob_process_resident_memory_bytes",
+            "gauge",
+            "Resident memory of the bot process.",
+            [({}, process_rss())],
+        )
+
+        return "\n".join(lines) + "\n" + self.bot.transitions.expose()
+
+
+async def setup(bot: BeatBob) -> None:
+    await bot.add_cog(Metrics(bot))
@@ -6,8 +6,12 @@ from typing import TYPE_CHECKING, cast
 if TYPE_CHECKING:
     from bot import BeatBob
 
+import asyncio
+import functools
 import logging
+import time
 import typing
+from collections import deque
 
 import discord
 import wavelink
@@ -15,20 +19,28 @@ from discord import app_commands
 from discord.app_commands.checks import has_permissions
 from discord.ext import commands
 
-from players.guild_player import GuildPlayer
+from players.guild_player import GuildPlayer, PlaylistIngest
+from players.reaper import REAP_REASONS
+from utils import compat
+from utils.announcements import AnnouncementChannel, can_post
 from utils.embeds import error_embed, success_embed
-from utils.enums import AutoPlayMode, LoopMode
+from utils.enums import AutoPlayMode, DuplicateMode, FilterPreset, LoopMode
+from utils.tracing import traced
 from utils.views import (
+    Announcement,
+    AnnouncementsView,
+    NothingPlayingView,
     NowPlayingView,
-    PlaylistAddedView,
     QueuedView,
-    TrackAddedView,
-    TrackSkippedView,
+    playlist_added,
+    track_added,
+    track_skipped,
 )
 
 logger = logging.getLogger("beatbob")
 
 
+@traced("check")
 def same_voice_channel(interaction: discord.Interaction) -> bool:
     # Must be in a guild
     if interaction.guild is None:
@@ -60,6 +72,25 @@ class Music(commands.Cog):
 
         self.players: dict[int, GuildPlayer] = {}
 
+        # Guild id -> (lost node id, time lost, track position) for players
+        # whose Lavalink node disconnected
+        self._lost: dict[int, tuple[str, float, int]] = {}
+
+        # Time each guild's last track ended, and the silence before the
+        # next one started of the most recent transitions
+        self._track_ended: dict[int, float] = {}
+        self.track_gaps: deque[float] = deque(maxlen=200)
+        # Guild id -> time and position in ms of the last player update
+        self._position_updates: dict[int, tuple[float, int]] = {}
+
+        # Guild id -> message showing the current song, kept up to date
+        self.now_playing: dict[int, discord.Message] = {}
+        self._now_playing_task: asyncio.Task[None] | None = None
+
+    async def cog_load(self) -> None:
+        self._now_playing_task = asyncio.create_task(self._refresh_now_playing())
+
+    @traced("ensure_voice")
     async def ensure_voice(
         self, interaction: discord.Interaction
     ) -> wavelink.Player | None:
@@ -87,8 +118,13 @@ class Music(commands.Cog):
 
             return typing.cast(wavelink.Player, guild_voice)
 
+        node = self.bot.node_pool.best_node(voice.channel.rtc_region)
+
         return typing.cast(
-            wavelink.Player, await voice.channel.connect(cls=wavelink.Player)
+            wavelink.Player,
+            await voice.channel.connect(
+                cls=functools.partial(wavelink.Player, nodes=[node])
+            ),
         )
 
     def get_guild_player(self, guild_id: int) -> GuildPlayer | None:
@@ -98,7 +134,24 @@ class Music(commands.Cog):
         return self.players.get(guild_id)
 
     def remove_guild_player(self, guild_id: int) -> bool:
-        return self.players.pop(guild_id, None) is not None
+        self.bot.player_store.mark_deleted(guild_id)
+        self.bot.prefetcher.cancel(guild_id)
+        self.bot.transitions.forget(guild_id)
+        self.bot.reaper.cancel(guild_id)
+        self._track_ended.pop(guild_id, None)
+        self._position_updates.pop(guild_id, None)
+
+        guild_player = self.players.pop(guild_id, None)
+        removed = guild_player is not None
+        if guild_player is not None:
+            guild_player.release()
+
+        # One last edit to show that nothing is playing, after which the
+        # scheduler forgets the message
+        self.update_now_playing(guild_id, final=True)
+        self.now_playing.pop(guild_id, None)
+
+        return removed
 
     def remove_player(self, player: wavelink.Player) -> bool:
         if player.guild is None:
@@ -119,18 +172,88 @@ class Music(commands.Cog):
             GuildPlayer: The guild player that was created.
         """
         guild_player = GuildPlayer(player)
+        guild_player.on_change = self._player_changed
+        guild_player.max_queue_length = self.bot.max_queue_length
+        guild_player.transitions = self.bot.transitions
+        guild_player.handoff_ms = self.bot.handoff_ms
 
-        player.inactive_timeout = 600
+        # Listeners leaving are handled by the reaper, see on_voice_state_update
+        player.inactive_channel_tokens = None
 
         self.players[guild_id] = guild_player
+        self.set_idle_timeout(player)
+        self.check_listeners(guild_id)
 
         return guild_player
 
-    def get_or_create_guild_player(
+    def set_idle_timeout(self, player: wavelink.Player) -> None:
+        """Updates how long the player may sit without playing, to the current load."""
+        reaper = self.bot.reaper
+        player.inactive_timeout = int(
+            reaper.timeout(reaper.idle_timeout, len(self.players))
+        )
+
+    def check_listeners(self, guild_id: int) -> None:
+        """Schedules the guild's player to be reaped while nobody listens to it."""
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild is not None else None
+        if voice_client is None:
+            return
+
+        channel = cast(wavelink.Player, voice_client).channel
+        if channel is not None and any(not member.bot for member in channel.members):
+            self.bot.reaper.cancel(guild_id)
+            return
+
+        reaper = self.bot.reaper
+        reaper.schedule(
+            guild_id,
+            reaper.timeout(reaper.alone_timeout, len(self.players)),
+            functools.partial(self.reap, guild_id, "alone"),
+        )
+
+    async def reap(self, guild_id: int, reason: str) -> None:
+        """Disconnects a guild's player and releases everything it holds.
+
+        Args:
+            guild_id (int): Id of guild.
+            reason (str): One of ``REAP_REASONS``, counted in the reaper's stats.
+        """
+        guild_player = self.players.get(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild is not None else None
+        if guild_player is None and voice_client is None:
+            return
+
+        # Removed first, so disconnecting below isn't taken for a kick
+        self.remove_guild_player(guild_id)
+
+        if guild_player is not None and guild_player.player.connected:
+            await guild_player.cleanup()
+        elif voice_client is not None:
+            await voice_client.disconnect(force=True)
+
+        self.bot.reaper.record(reason)
+        self.bot.logger.info(
+            f"Reclaimed player in guild {guild_id}: {REAP_REASONS[reason].lower()}."
+        )
+
+    def _player_changed(self, guild_player: GuildPlayer) -> None:
+        guild = guild_player.player.guild
+        if guild is None:
+            return
+
+        self.bot.player_store.mark_dirty(guild.id, guild_player.snapshot)
+        self.bot.prefetcher.schedule(guild.id, guild_player)
+
+    async def get_or_create_guild_player(
         self, guild_id: int, player: wavelink.Player
     ) -> GuildPlayer:
         """Gets or creates a guild player if none exist for selected guild id.
 
+        A new player picks up the queue and settings saved for the guild
+        before the last restart, if there are any.
+
         Args:
             guild_id (int | None): Id of guild.
             player (wavelink.Player): Wavelink player connected to guild.
@@ -149,11 +272,20 @@ class Music(commands.Cog):
         if guild_player:
             return guild_player
 
-        return self.create_guild_player(
+        guild_player = self.create_guild_player(
             guild_id,
             player,
         )
 
+        try:
+            snapshot = await self.bot.player_store.load(guild_id)
+            if snapshot is not None:
+                await guild_player.restore(snapshot)
+        except Exception:
+            self.bot.logger.exception(f"Failed to restore player in guild {guild_id}.")
+
+        return guild_player
+
     def get_player(self, guild: discord.Guild) -> wavelink.Player | None:
         voice_client = guild.voice_client
 
@@ -162,6 +294,14 @@ class Music(commands.Cog):
 
         return cast(wavelink.Player, guild.voice_client)
 
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if not self.bot.node_pool.ready:
+            raise app_commands.CheckFailure(
+                "Audio is still warming up, try again in a few seconds."
+            )
+
+        return True
+
     async def cog_app_command_error(
         self, interaction: discord.Interaction, error: app_commands.AppCommandError
     ) -> None:
@@ -183,6 +323,33 @@ class Music(commands.Cog):
             "Something went wrong while running that command. Check the logs for details.",
         )
 
+    async def announce(
+        self, interaction: discord.Interaction, announcement: Announcement
+    ) -> discord.WebhookMessage:
+        """Tells the channel a command was used in what it changed.
+
+        The user gets a private reply right away. The public announcement is
+        batched with others made in the same channel around the same time.
+        Where the bot can't post in the channel, the reply itself is public.
+
+        Args:
+            interaction (discord.Interaction): Deferred interaction of the command.
+            announcement (Announcement): What to announce.
+
+        Returns:
+            discord.WebhookMessage: The reply to the user.
+        """
+        view = AnnouncementsView([announcement])
+
+        channel = interaction.channel
+        if not isinstance(channel, AnnouncementChannel) or not can_post(
+            channel, interaction.app_permissions
+        ):
+            return await interaction.followup.send(view=view, wait=True)
+
+        self.bot.announcer.announce(channel, announcement)
+        return await interaction.followup.send(view=view, ephemeral=True, wait=True)
+
     async def _send_error(
         self, interaction: discord.Interaction, title: str, message: str
     ) -> None:
@@ -192,6 +359,212 @@ class Music(commands.Cog):
         else:
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    async def migrate_lost_players(self, node: wavelink.Node | None = None) -> None:
+        """Moves guild players off lost Lavalink nodes.
+
+        Args:
+            node (wavelink.Node | None, optional): Only move players lost from
+                this node, plus ones that waited longer than the failover delay.
+                Defaults to None, which moves every lost player.
+        """
+        failover_delay = self.bot.node_pool.failover_delay
+
+        for guild_id, (node_id, lost_at, position) in list(self._lost.items()):
+            waited = time.monotonic() - lost_at
+            if (
+                node is not None
+                and node_id != node.identifier
+                and waited < failover_delay
+            ):
+                continue
+
+            guild_player = self.get_guild_player(guild_id)
+            if guild_player is None:
+                self._lost.pop(guild_id, None)
+                continue
+
+            try:
+                target = self.bot.node_pool.best_node(
+                    guild_player.player.channel.rtc_region
+                )
+            except wavelink.InvalidNodeException:
+                self.bot.logger.warning(
+                    f"No healthy Lavalink node for guild {guild_id}, waiting for one to connect."
+                )
+                continue
+
+            # Claim the guild so overlapping migrations don't move it twice
+            if self._lost.pop(guild_id, None) is None:
+                continue
+
+            try:
+                await guild_player.migrate(target, position)
+            except Exception:
+                self.bot.node_pool.migrations.failed += 1
+                self.bot.logger.exception(
+                    f"Failed to migrate guild {guild_id} to node {target.identifier}."
+                )
+                continue
+
+            gap = time.monotonic() - lost_at
+            self.bot.node_pool.migrations.record(gap)
+            self.bot.logger.info(
+                f"Migrated guild {guild_id} to node {target.identifier}. Audio gap: {gap * 1000:.0f} ms"
+            )
+
+    def render_now_playing(self, guild_id: int) -> discord.ui.LayoutView:
+        guild_player = self.get_guild_player(guild_id)
+        if guild_player is None or guild_player.current is None:
+            return NothingPlayingView()
+
+        return NowPlayingView(guild_player.current, guild_player.progress())
+
+    def update_now_playing(self, guild_id: int, final: bool = False) -> None:
+        """Schedules an edit of the guild's live now playing message, if it has one.
+
+        Args:
+            guild_id (int): Id of guild.
+            final (bool, optional): Whether the message won't be edited again.
+                Defaults to False.
+        """
+        message = self.now_playing.get(guild_id)
+        if message is None:
+            return
+
+        def forget() -> None:
+            if self.now_playing.get(guild_id) is message:
+                del self.now_playing[guild_id]
+
+        self.bot.edit_scheduler.request(
+            message,
+            functools.partial(self.render_now_playing, guild_id),
+            on_gone=forget,
+            final=final,
+        )
+
+    async def _refresh_now_playing(self) -> None:
+        # A single loop moves every progress bar forward
+        while True:
+            await asyncio.sleep(self.bot.now_playing_interval)
+
+            for guild_id in list(self.now_playing):
+                # One broken guild must not stop the others from updating
+                try:
+                    self._refresh_guild_now_playing(guild_id)
+                except Exception:
+                    self.bot.logger.exception(
+                        f"Failed to refresh the now playing message of guild {guild_id}."
+                    )
+
+    def _refresh_guild_now_playing(self, guild_id: int) -> None:
+        guild_player = self.get_guild_player(guild_id)
+        if guild_player is None or not guild_player.is_playing():
+            return
+
+        # Nobody to see the progress bar move, or disconnected meanwhile
+        channel = guild_player.player.channel
+        if (
+            channel is None
+            or guild_player.player.paused
+            or not any(not member.bot for member in channel.members)
+        ):
+            return
+
+        self.update_now_playing(guild_id)
+
+    async def cog_unload(self) -> None:
+        if self._now_playing_task is not None:
+            self._now_playing_task.cancel()
+
+        await self.save_players()
+
+    async def save_players(self) -> bool:
+        """Writes the state of every guild player to the player store.
+
+        Returns:
+            bool: Whether it was written.
+        """
+        for guild_id, guild_player in self.players.items():
+            self.bot.player_store.mark_dirty(guild_id, guild_player.snapshot)
+
+        try:
+            await self.bot.player_store.flush()
+        except Exception:
+            self.bot.logger.exception("Failed to save guild players.")
+            return False
+
+        return True
+
+    def detach_players(self) -> int:
+        """Forgets every player without disconnecting it.
+
+        Lavalink keeps playing until the bot comes back and resumes the
+        session. Only for shutting down, see ``BeatBob.close``.
+
+        Returns:
+            int: Amount of players detached.
+        """
+        for guild_player in self.players.values():
+            compat.detach_player(guild_player.player)
+
+        return len(self.players)
+
+    async def adopt_players(self, node: wavelink.Node) -> None:
+        """Adopts players Lavalink kept alive through a resumed session.
+
+        Only guilds with saved state are adopted here. Every other saved guild
+        is restored when its player is next created.
+
+        Args:
+            node (wavelink.Node): Node that just resumed its previous session.
+        """
+        # Resuming happens during setup, before guilds and channels are cached
+        await self.bot.wait_until_ready()
+
+        try:
+            live = await node.fetch_players()
+        except Exception:
+            self.bot.logger.exception(
+                f"Failed to fetch resumed players from node {node.identifier}."
+            )
+            return
+
+        adopted = 0
+        for info in live:
+            if info.guild_id in self.players or not self.bot.player_store.has(
+                info.guild_id
+            ):
+                continue
+
+            guild = self.bot.get_guild(info.guild_id)
+            if guild is None or guild.voice_client is not None:
+                continue
+
+            try:
+                snapshot = await self.bot.player_store.load(guild.id)
+                channel = guild.get_channel(snapshot.channel_id) if snapshot else None
+                if snapshot is None or not isinstance(
+                    channel, (discord.VoiceChannel, discord.StageChannel)
+                ):
+                    continue
+
+                player = await channel.connect(
+                    cls=functools.partial(wavelink.Player, nodes=[node])
+                )
+                guild_player = self.create_guild_player(guild.id, player)
+                await guild_player.restore(snapshot, info)
+            except Exception:
+                self.bot.logger.exception(
+                    f"Failed to adopt player in guild {info.guild_id}."
+                )
+                continue
+
+            adopted += 1
+
+        self.bot.logger.info(
+            f"Adopted {adopted} guild players that kept playing on node {node.identifier}."
+        )
+
     @commands.Cog.listener()
     async def on_wavelink_node_ready(
         self, payload: wavelink.NodeReadyEventPayload
@@ -200,15 +573,116 @@ class Music(commands.Cog):
             f"Wavelink Node connected: {payload.node} | Resumed: {payload.resumed}"
         )
 
+        try:
+            await self.bot.player_store.save_session(
+                payload.node.identifier, payload.session_id
+            )
+        except Exception:
+            self.bot.logger.exception("Failed to save Lavalink session.")
+
+        if payload.resumed:
+            await self.adopt_players(payload.node)
+
+        if not payload.resumed:
+            await self.migrate_lost_players(payload.node)
+            return
+
+        # Lavalink kept playing while the websocket was down, nothing to move
+        for guild_id, (node_id, _, _) in list(self._lost.items()):
+            if node_id == payload.node.identifier:
+                del self._lost[guild_id]
+                self.bot.node_pool.migrations.resumed += 1
+
     @commands.Cog.listener()
     async def on_wavelink_node_disconnected(
         self, payload: wavelink.NodeDisconnectedEventPayload
     ) -> None:
-        self.players.clear()
+        node = payload.node
+        lost_at = time.monotonic()
+
+        affected = 0
+        for guild_id, guild_player in self.players.items():
+            if (
+                guild_player.player.node.identifier != node.identifier
+                or guild_id in self._lost
+            ):
+                continue
+
+            self._lost[guild_id] = (
+                node.identifier,
+                lost_at,
+                guild_player.player.position,
+            )
+            affected += 1
+
         self.bot.logger.warning(
-            f"Wavelink node disconnected: {payload.node}. Cleared guild players."
+            f"Wavelink node disconnected: {node}. Guild players affected: {affected}."
         )
 
+        if not affected:
+            return
+
+        # Audio keeps playing while only the websocket is down, so give the
+        # node a chance to reconnect and resume before moving players away.
+        await asyncio.sleep(self.bot.node_pool.failover_delay)
+
+        if node.status is wavelink.NodeStatus.CONNECTED:
+            return
+
+        await self.migrate_lost_players(node)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(
+        self,
+        member: discord.Member,
+        before: discord.VoiceState,
+        after: discord.VoiceState,
+    ) -> None:
+        if before.channel == after.channel:
+            return
+
+        guild_id = member.guild.id
+        assert self.bot.user is not None
+
+        if member.id == self.bot.user.id and after.channel is None:
+            # Kicked, or the channel was deleted. Disconnecting ourselves ends
+            # up here too, after the player was already removed
+            if guild_id in self.players:
+                try:
+                    await self.reap(guild_id, "disconnected")
+                except Exception:
+                    self.bot.reaper.stats.failed += 1
+                    self.bot.logger.exception(
+                        f"Failed to release player in guild {guild_id}."
+                    )
+            return
+
+        voice_client = member.guild.voice_client
+        if voice_client is None:
+            return
+
+        # Only listeners of the bot's channel matter, or the bot moving
+        if member.id != self.bot.user.id and voice_client.channel not in (
+            before.channel,
+            after.channel,
+        ):
+            return
+
+        self.check_listeners(guild_id)
+
+    @commands.Cog.listener()
+    async def on_wavelink_inactive_player(self, player: wavelink.Player) -> None:
+        if player.guild is None:
+            return
+
+        try:
+            await self.reap(player.guild.id, "idle")
+        except Exception:
+            self.bot.reaper.stats.failed += 1
+            self.bot.logger.exception(
+                f"Failed to reclaim idle player in guild {player.guild.id}."
+            )
+
     @commands.Cog.listener()
     async def on_wavelink_websocket_closed(
         self, payload: wavelink.WebsocketClosedEventPayload
@@ -242,6 +716,25 @@ class Music(commands.Cog):
         if guild_player is None:
             return
 
+        # The next track was started early and took over, see schedule_handoff
+        if payload.reason == "replaced":
+            return
+
+        if payload.reason == "finished":
+            self._track_ended[guild_id] = time.monotonic()
+
+            # Lavalink doesn't say when the track ended, so it's estimated
+            # from the last position update
+            update = self._position_updates.get(guild_id)
+            if update is not None:
+                updated_at, position = update
+                ended_at = updated_at + (payload.track.length - position) / 1000
+                self.bot.transitions.observe(
+                    "delivery",
+                    guild_id,
+                    max(0.0, (time.monotonic() - ended_at) * 1000),
+                )
+
         try:
             await guild_player.advance()
         except Exception:
@@ -316,6 +809,49 @@ class Music(commands.Cog):
         self, payload: wavelink.TrackStartEventPayload
     ) -> None:
         """Ensure correct guild settings are set when a track start."""
+        if payload.player is None or payload.player.guild is None:
+            return
+
+        guild_id = payload.player.guild.id
+
+        ended_at = self._track_ended.pop(guild_id, None)
+        if ended_at is not None:
+            self.track_gaps.append(time.monotonic() - ended_at)
+
+        # Positions of the previous track would misplace the end of this one
+        self._position_updates.pop(guild_id, None)
+
+        guild_player = self.get_guild_player(guild_id)
+        if guild_player is not None:
+            if guild_player.play_sent is not None:
+                self.bot.transitions.observe(
+                    "start",
+                    guild_id,
+                    (time.perf_counter() - guild_player.play_sent) * 1000,
+                )
+                guild_player.play_sent = None
+
+            guild_player.schedule_handoff()
+
+        self.set_idle_timeout(payload.player)
+        self.update_now_playing(guild_id)
+
+    @commands.Cog.listener()
+    async def on_wavelink_player_update(
+        self, payload: wavelink.PlayerUpdateEventPayload
+    ) -> None:
+        """Note the position and plan the early start of the next track with it."""
+        if payload.player is None or payload.player.guild is None:
+            return
+
+        guild_id = payload.player.guild.id
+        self._position_updates[guild_id] = (time.monotonic(), payload.position)
+
+        guild_player = self.get_guild_player(guild_id)
+        if guild_player is not None and guild_player.handoff_ms > 0:
+            # wavelink applies the update to the player right after dispatching it
+            await asyncio.sleep(0)
+            guild_player.schedule_handoff()
 
     # -------------------------
     # PLAY
@@ -323,7 +859,7 @@ class Music(commands.Cog):
     @app_commands.guild_only()
     @app_commands.command(name="play", description="Play a song")
     async def play(self, interaction: discord.Interaction, query: str) -> None:
-        await interaction.response.defer()
+        await interaction.response.defer(ephemeral=True)
 
         player = await self.ensure_voice(interaction)
         if not player:
@@ -334,7 +870,7 @@ class Music(commands.Cog):
 
         assert interaction.guild is not None  # Guild should be a guarantee
 
-        tracks: wavelink.Search = await wavelink.Playable.search(query)
+        tracks: wavelink.Search = await self.bot.resolver.search(query)
 
         if not tracks:
             return await interaction.followup.send(
@@ -345,29 +881,63 @@ class Music(commands.Cog):
                 ephemeral=True,
             )
 
-        guild_player: GuildPlayer = self.get_or_create_guild_player(
+        guild_player: GuildPlayer = await self.get_or_create_guild_player(
             interaction.guild.id, player
         )
 
         if isinstance(tracks, wavelink.Playlist):
             tracks.extras = {"requested_by": interaction.user.name}
 
-            amount_added: int = await guild_player.add_playlist(tracks)
-            return await interaction.followup.send(
-                view=PlaylistAddedView(
+            ingest = await guild_player.add_playlist(tracks)
+            message = await self.announce(
+                interaction,
+                playlist_added(
                     tracks.name,
                     tracks.url or "",
                     tracks.extras.requested_by,
-                    amount_added,
-                )
+                    ingest.added if ingest.finished else ingest.total,
+                    skipped=ingest.skipped,
+                ),
             )
 
+            # The reply counts the songs as the rest of the playlist comes in
+            def render() -> discord.ui.LayoutView:
+                return AnnouncementsView(
+                    [
+                        playlist_added(
+                            ingest.playlist.name,
+                            ingest.playlist.url or "",
+                            interaction.user.name,
+                            ingest.added,
+                            ingest.total,
+                            stopped=ingest.cancelled,
+                            skipped=ingest.skipped,
+                        )
+                    ]
+                )
+
+            def progressed(ingest: PlaylistIngest) -> None:
+                self.bot.edit_scheduler.request(message, render, final=ingest.finished)
+
+            if not ingest.finished:
+                ingest.on_progress = progressed
+                progressed(ingest)
+            return
+
         track: wavelink.Playable = tracks[0]
         requested_by = interaction.user.global_name or interaction.user.name
         track.extras = {"requested_by": requested_by}
-        await guild_player.add_track(track)
-        await interaction.followup.send(
-            view=TrackAddedView(track.title, track.uri or "", track.extras.requested_by)
+        if not await guild_player.add_track(track):
+            return await interaction.followup.send(
+                embed=error_embed(
+                    "Already queued", f"{track.title} is already in the queue."
+                ),
+                ephemeral=True,
+            )
+
+        await self.announce(
+            interaction,
+            track_added(track.title, track.uri or "", track.extras.requested_by),
         )
 
     # -------------------------
@@ -377,7 +947,7 @@ class Music(commands.Cog):
     @app_commands.command(name="skip", description="Skip a song")
     @app_commands.check(same_voice_channel)
     async def skip(self, interaction: discord.Interaction) -> None:
-        await interaction.response.defer()
+        await interaction.response.defer(ephemeral=True)
 
         assert interaction.guild is not None  # Guild should be a guarantee
 
@@ -389,13 +959,15 @@ class Music(commands.Cog):
 
         track = await guild_player.skip()
         if track is not None:
-            return await interaction.followup.send(
-                view=TrackSkippedView(
+            await self.announce(
+                interaction,
+                track_skipped(
                     track.title,
                     track.uri or "",
                     interaction.user.global_name or "unknown",
-                )
+                ),
             )
+            return
 
         await interaction.followup.send(
             "No track is currently playing.",
@@ -500,9 +1072,8 @@ class Music(commands.Cog):
                 "I currently have no player in this server."
             )
 
-        await interaction.followup.send(
-            view=QueuedView(guild_player.get_queue(), page_number=page or 1)
-        )
+        view = QueuedView(guild_player.queue_pages, page_number=page or 1)
+        view.message = await interaction.followup.send(view=view, wait=True)
 
     # -------------------------
     # VOLUME
@@ -606,6 +1177,180 @@ class Music(commands.Cog):
             embed=success_embed(title="Shuffle", text=f"Shuffled queue!")
         )
 
+    # -------------------------
+    # REMOVE
+    # -------------------------
+    @app_commands.guild_only()
+    @app_commands.command(name="remove", description="Remove songs from the queue.")
+    @app_commands.describe(
+        position="Position of the song in /queue.",
+        to="Also remove every song up to this position.",
+    )
+    @app_commands.check(same_voice_channel)
+    async def remove(
+        self,
+        interaction: discord.Interaction,
+        position: app_commands.Range[int, 1],
+        to: app_commands.Range[int, 1] | None = None,
+    ) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        assert interaction.guild is not None  # Guild should be a guarantee
+
+        guild_player: GuildPlayer | None = self.get_guild_player(interaction.guild.id)
+        if guild_player is None:
+            return await interaction.followup.send(
+                "I currently have no player in this server."
+            )
+
+        if position > guild_player.get_queue_size():
+            return await interaction.followup.send(
+                embed=error_embed("Not in queue", f"There is no song at {position}.")
+            )
+
+        if to is None or to == position:
+            track = guild_player.remove(position - 1)
+            return await interaction.followup.send(
+                embed=success_embed(title="Removed", text=f"Removed {track.title}.")
+            )
+
+        start, stop = min(position, to), max(position, to)
+        removed = guild_player.remove_range(start - 1, stop)
+
+        await interaction.followup.send(
+            embed=success_embed(title="Removed", text=f"Removed {removed} songs.")
+        )
+
+    # -------------------------
+    # MOVE
+    # -------------------------
+    @app_commands.guild_only()
+    @app_commands.command(name="move", description="Move a song in the queue.")
+    @app_commands.describe(
+        position="Position of the song in /queue.",
+        to="Position to move it to, 1 plays it next.",
+    )
+    @app_commands.check(same_voice_channel)
+    async def move(
+        self,
+        interaction: discord.Interaction,
+        position: app_commands.Range[int, 1],
+        to: app_commands.Range[int, 1],
+    ) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        assert interaction.guild is not None  # Guild should be a guarantee
+
+        guild_player: GuildPlayer | None = self.get_guild_player(interaction.guild.id)
+        if guild_player is None:
+            return await interaction.followup.send(
+                "I currently have no player in this server."
+            )
+
+        size = guild_player.get_queue_size()
+        if position > size:
+            return await interaction.followup.send(
+                embed=error_embed("Not in queue", f"There is no song at {position}.")
+            )
+
+        # Past the end means last
+        to = min(to, size)
+        track = guild_player.move(position - 1, to - 1)
+
+        await interaction.followup.send(
+            embed=success_embed(title="Moved", text=f"Moved {track.title} to {to}.")
+        )
+
+    # -------------------------
+    # JUMP
+    # -------------------------
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="jump",
+        description="Play a song in the queue now, skipping the ones before.",
+    )
+    @app_commands.describe(position="Position of the song in /queue.")
+    @app_commands.check(same_voice_channel)
+    async def jump(
+        self, interaction: discord.Interaction, position: app_commands.Range[int, 1]
+    ) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        assert interaction.guild is not None  # Guild should be a guarantee
+
+        guild_player: GuildPlayer | None = self.get_guild_player(interaction.guild.id)
+        if guild_player is None:
+            return await interaction.followup.send(
+                "I currently have no player in this server."
+            )
+
+        try:
+            track = await guild_player.jump(position - 1)
+        except IndexError:
+            return await interaction.followup.send(
+                embed=error_embed("Not in queue", f"There is no song at {position}.")
+            )
+
+        await interaction.followup.send(
+            embed=success_embed(title="Jumped", text=f"Now playing {track.title}.")
+        )
+
+    # -------------------------
+    # DEDUPE
+    # -------------------------
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="dedupe", description="Remove songs that are in the queue more than once."
+    )
+    @app_commands.check(same_voice_channel)
+    async def dedupe(self, interaction: discord.Interaction) -> None:
+        await interaction.response.defer()
+
+        assert interaction.guild is not None  # Guild should be a guarantee
+
+        guild_player: GuildPlayer | None = self.get_guild_player(interaction.guild.id)
+        if guild_player is None:
+            return await interaction.followup.send(
+                "I currently have no player in this server."
+            )
+
+        removed = guild_player.dedupe()
+
+        await interaction.followup.send(
+            embed=success_embed(
+                title="Dedupe", text=f"Removed {removed} duplicate songs."
+            )
+        )
+
+    # -------------------------
+    # DUPLICATES
+    # -------------------------
+    @app_commands.guild_only()
+    @app_commands.command(
+        name="duplicates", description="Allow or reject songs that are queued already."
+    )
+    @app_commands.check(same_voice_channel)
+    async def duplicates(
+        self, interaction: discord.Interaction, mode: DuplicateMode
+    ) -> None:
+        await interaction.response.defer()
+
+        assert interaction.guild is not None  # Guild should be a guarantee
+
+        guild_player: GuildPlayer | None = self.get_guild_player(interaction.guild.id)
+        if guild_player is None:
+            return await interaction.followup.send(
+                "I currently have no player in this server."
+            )
+
+        guild_player.set_reject_duplicates(mode == DuplicateMode.REJECT)
+
+        await interaction.followup.send(
+            embed=success_embed(
+                title="Duplicates", text=f"Duplicates set to {mode.name}."
+            )
+        )
+
     # -------------------------
     # NIGHTCORE
     # -------------------------
@@ -711,13 +1456,43 @@ class Music(commands.Cog):
             embed=success_embed(title="Rate", text=f"Rate changed to {value}.")
         )
 
+    # -------------------------
+    # FILTER PRESETS
+    # -------------------------
+    @app_commands.guild_only()
+    @app_commands.command(name="filter", description="Apply a filter preset.")
+    @app_commands.check(same_voice_channel)
+    async def filter(
+        self, interaction: discord.Interaction, preset: FilterPreset
+    ) -> None:
+        await interaction.response.defer()
+
+        assert interaction.guild is not None  # Guild should be a guarantee
+
+        guild_player: GuildPlayer | None = self.get_guild_player(interaction.guild.id)
+        if guild_player is None:
+            return await interaction.followup.send(
+                "I currently have no player in this server."
+            )
+
+        await guild_player.apply_preset(preset)
+
+        await interaction.followup.send(
+            embed=success_embed(
+                title="Filter", text=f"Filter preset set to {preset.value}."
+            )
+        )
+
     # -------------------------
     # CURRENT
     # -------------------------
     @app_commands.guild_only()
     @app_commands.command(name="current", description="See the currently playing song.")
+    @app_commands.describe(live="Post a message that keeps updating as songs play.")
     @app_commands.check(same_voice_channel)
-    async def current(self, interaction: discord.Interaction) -> None:
+    async def current(
+        self, interaction: discord.Interaction, live: bool = False
+    ) -> None:
         await interaction.response.defer(ephemeral=True)
 
         assert interaction.guild is not None  # Guild should be a guarantee
@@ -728,6 +1503,25 @@ class Music(commands.Cog):
                 "I currently have no player in this server."
             )
 
+        if live:
+            channel = interaction.channel
+            if not isinstance(channel, discord.abc.Messageable):
+                return await interaction.followup.send(
+                    "I can't post messages in this channel."
+                )
+
+            # Only one live message per guild, the old one stops updating
+            old_message = self.now_playing.pop(interaction.guild.id, None)
+            if old_message is not None:
+                self.bot.edit_scheduler.forget(old_message)
+
+            self.now_playing[interaction.guild.id] = await channel.send(
+                view=self.render_now_playing(interaction.guild.id)
+            )
+            return await interaction.followup.send(
+                "Posted a now playing message that updates as the music plays."
+            )
+
         current_song = guild_player.current
 
         if current_song is None:
@@ -735,9 +1529,9 @@ class Music(commands.Cog):
                 "No song is currently playing. Use `/play` to add something to the queue!",
             )
 
-        progress = await guild_player.get_progress()
-
-        await interaction.followup.send(view=NowPlayingView(current_song, progress))
+        await interaction.followup.send(
+            view=NowPlayingView(current_song, guild_player.progress())
+        )
 
 
 async def setup(bot: BeatBob) -> None:
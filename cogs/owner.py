@@ -1,13 +1,25 @@
+from __future__ import annotations
+
+import io
 import logging
-from typing import cast
+from typing import TYPE_CHECKING, cast
 
 import discord
+import wavelink
 from discord import app_commands
 from discord.ext import commands
 
+from utils.metrics import TRANSITION_PHASES
+from utils.tracing import traced
+
+if TYPE_CHECKING:
+    from bot import BeatBob
+    from cogs.music import Music
+
 logger = logging.getLogger("beatbob")
 
 
+@traced("check")
 async def is_bot_owner(interaction: discord.Interaction) -> bool:
     bot = cast(commands.Bot, interaction.client)
     if await bot.is_owner(interaction.user):
@@ -17,42 +29,244 @@ async def is_bot_owner(interaction: discord.Interaction) -> bool:
 
 
 class Owner(commands.Cog):
-    def __init__(self, bot: commands.Bot) -> None:
+    def __init__(self, bot: BeatBob) -> None:
         self.bot = bot
 
     @app_commands.check(is_bot_owner)
     @app_commands.command(name="sync", description="Sync bot commands.")
+    @app_commands.describe(
+        force="Sync even if the commands didn't change since the last sync."
+    )
     async def sync(
-        self, interaction: discord.Interaction, guild_id: str | None = None
+        self,
+        interaction: discord.Interaction,
+        guild_id: str | None = None,
+        force: bool = False,
     ) -> None:
         await interaction.response.defer()
 
         try:
-            if guild_id:
-                guild = discord.Object(id=int(guild_id))
-                # self.bot.tree.copy_global_to(guild=guild)
-                synced = await self.bot.tree.sync(guild=guild)
-                await interaction.followup.send(
-                    f"Synced {len(synced)} commands to guild {guild_id}", ephemeral=True
-                )
-
-            else:
-                synced = await self.bot.tree.sync()
-
-                await interaction.followup.send(
-                    f"Synced {len(synced)} commands globally", ephemeral=True
-                )
+            guild = discord.Object(id=int(guild_id)) if guild_id else None
+            # self.bot.tree.copy_global_to(guild=guild)
+            result = await self.bot.command_syncer.sync(guild=guild, force=force)
 
         except ValueError:
             await interaction.followup.send(
                 f"`{guild_id}` is not a valid Discord guild id.", ephemeral=True
             )
+            return
         except Exception:
             logger.exception("Failed to sync commands.")
             await interaction.followup.send(
                 "Failed to sync commands. Check the bot logs for details.",
                 ephemeral=True,
             )
+            return
+
+        target = f"to guild {guild_id}" if guild_id else "globally"
+        if result.synced:
+            await interaction.followup.send(
+                f"Synced {result.commands} commands {target}", ephemeral=True
+            )
+        else:
+            await interaction.followup.send(
+                f"Skipped syncing {result.commands} commands {target}, {result.reason}. "
+                "Use `force` to sync anyway.",
+                ephemeral=True,
+            )
+
+    @app_commands.check(is_bot_owner)
+    @app_commands.command(name="stats", description="Show bot performance stats.")
+    async def stats(self, interaction: discord.Interaction) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        cache = self.bot.resolver.cache
+        in_flight = self.bot.resolver.in_flight
+        lines = [
+            "**Search cache**",
+            f"Entries: {len(cache)}/{cache.maxsize} (ttl {cache.ttl:.0f}s)",
+            f"Hits: {cache.stats.hits} | Misses: {cache.stats.misses} "
+            f"| Hit rate: {cache.stats.hit_rate:.1%}",
+            f"Evictions: {cache.stats.evictions} | Expirations: {cache.stats.expirations}",
+            "",
+            "**Search requests**",
+            f"Total: {in_flight.calls} | Collapsed: {in_flight.collapsed} "
+            f"| In flight: {len(in_flight)}",
+            "",
+            "**Lavalink nodes**",
+        ]
+
+        node_pool = self.bot.node_pool
+        for node in wavelink.Pool.nodes.values():
+            lines.append(
+                f"`{node.identifier}` {node.status.name} | Players: {len(node.players)} "
+                f"| Penalty: {node_pool.penalty(node):.1f}"
+            )
+
+        migrations = node_pool.migrations
+        gaps = sorted(migrations.gaps)
+        lines += [
+            "",
+            "**Node failover**",
+            f"Migrated: {migrations.migrated} | Failed: {migrations.failed} "
+            f"| Resumed: {migrations.resumed}",
+        ]
+        if gaps:
+            lines.append(
+                f"Audio gap: median {gaps[len(gaps) // 2] * 1000:.0f} ms "
+                f"| max {gaps[-1] * 1000:.0f} ms"
+            )
+
+        store = self.bot.player_store.stats
+        lines += [
+            "",
+            "**Player store**",
+            f"Flushes: {store.flushes} | Players written: {store.players_written} "
+            f"| Tracks written: {store.tracks_written}",
+            f"Last flush: {store.last_flush_ms:.1f} ms",
+        ]
+
+        edits = self.bot.edit_scheduler.stats
+        lines += [
+            "",
+            "**Message edits**",
+            f"Live messages: {len(self.bot.edit_scheduler)} | Requested: {edits.requested} "
+            f"| Sent: {edits.sent} | Coalesced: {edits.coalesced}",
+            f"Rate limited: {edits.rate_limited} | Failed: {edits.failed}",
+        ]
+
+        announcer = self.bot.announcer.stats
+        lines += [
+            "",
+            "**Announcements**",
+            f"Announced: {announcer.announced} | Messages: {announcer.messages} "
+            f"| Failed: {announcer.failed}",
+        ]
+
+        prefetch = self.bot.prefetcher.stats
+        lines += [
+            "",
+            "**Track transitions**",
+            f"Looked ahead: {prefetch.resolved} resolved | {prefetch.dropped} dropped "
+            f"| {prefetch.failed} failed",
+        ]
+        music = cast("Music | None", self.bot.get_cog("Music"))
+        if music is not None and music.track_gaps:
+            gaps = sorted(music.track_gaps)
+            lines.append(
+                f"Gap between tracks: median {gaps[len(gaps) // 2] * 1000:.0f} ms "
+                f"| max {gaps[-1] * 1000:.0f} ms"
+            )
+
+        reaper = self.bot.reaper
+        reclaimed = reaper.stats.reclaimed
+        lines += [
+            "",
+            "**Idle players**",
+            f"Reclaimed: {reaper.stats.total} ({reclaimed['alone']} alone "
+            f"| {reclaimed['idle']} idle | {reclaimed['disconnected']} disconnected) "
+            f"| Failed: {reaper.stats.failed}",
+            f"Waiting to be reclaimed: {len(reaper)}",
+        ]
+
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+    @app_commands.check(is_bot_owner)
+    @app_commands.command(
+        name="transitions", description="Show how long track changes take."
+    )
+    @app_commands.describe(
+        guild_id="Only show this server", export="Attach the histograms as metrics"
+    )
+    async def transitions(
+        self,
+        interaction: discord.Interaction,
+        guild_id: str | None = None,
+        export: bool = False,
+    ) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        metrics = self.bot.transitions
+        if guild_id is not None:
+            if not guild_id.isdigit() or int(guild_id) not in metrics.guilds:
+                await interaction.followup.send(
+                    f"No track changes recorded in guild `{guild_id}`.", ephemeral=True
+                )
+                return
+
+            phases = metrics.guilds[int(guild_id)]
+            lines = [f"**Track changes in {guild_id}** (ms)"]
+        else:
+            phases = metrics.phases
+            lines = ["**Track changes** (ms)"]
+
+        for phase, description in TRANSITION_PHASES.items():
+            histogram = phases.get(phase)
+            if histogram is None or not histogram.count:
+                lines.append(f"{description}: no data")
+                continue
+
+            lines.append(
+                f"{description}: p50 {histogram.quantile(0.5):.0f} "
+                f"| p95 {histogram.quantile(0.95):.0f} | p99 {histogram.quantile(0.99):.0f} "
+                f"| max {histogram.max:.0f} | n {histogram.count}"
+            )
+
+        if guild_id is None and metrics.nodes:
+            lines += ["", "**Play requests per node** (ms)"]
+            for node, histogram in sorted(metrics.nodes.items()):
+                lines.append(
+                    f"`{node}` p50 {histogram.quantile(0.5):.0f} "
+                    f"| p95 {histogram.quantile(0.95):.0f} | max {histogram.max:.0f} "
+                    f"| n {histogram.count}"
+                )
+
+        if export:
+            exported = discord.File(
+                io.BytesIO(metrics.expose().encode()), filename="transitions.prom"
+            )
+            await interaction.followup.send(
+                "\n".join(lines), file=exported, ephemeral=True
+            )
+        else:
+            await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+    @app_commands.check(is_bot_owner)
+    @app_commands.command(
+        name="shards", description="Show the status of this process' shards."
+    )
+    async def shards(self, interaction: discord.Interaction) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        guilds: dict[int, int] = {}
+        players: dict[int, int] = {}
+        for guild in self.bot.guilds:
+            guilds[guild.shard_id] = guilds.get(guild.shard_id, 0) + 1
+            if guild.voice_client is not None:
+                players[guild.shard_id] = players.get(guild.shard_id, 0) + 1
+
+        header = f"**Shards** ({len(self.bot.shards)} of {self.bot.shard_count})"
+        if self.bot.cluster_id:
+            header += f" | Cluster {self.bot.cluster_id}"
+
+        lines = [header]
+        for shard_id, shard in sorted(self.bot.shards.items()):
+            if shard.is_closed():
+                status = "CLOSED"
+            elif shard.is_ws_ratelimited():
+                status = "RATELIMITED"
+            else:
+                status = "CONNECTED"
+
+            lines.append(
+                f"`{shard_id}` {status} | Latency: {shard.latency * 1000:.0f} ms "
+                f"| Guilds: {guilds.get(shard_id, 0)} | Players: {players.get(shard_id, 0)}"
+            )
+
+        if interaction.guild is not None:
+            lines += ["", f"This server is on shard {interaction.guild.shard_id}."]
+
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
 
     async def cog_app_command_error(
         self, interaction: discord.Interaction, error: app_commands.AppCommandError
@@ -72,5 +286,5 @@ class Owner(commands.Cog):
             await interaction.response.send_message(message, ephemeral=True)
 
 
-async def setup(bot: commands.Bot) -> None:
+async def setup(bot: BeatBob) -> None:
     await bot.add_cog(Owner(bot))
@@ -0,0 +1,139 @@
+"""Runs BeatBob as several worker processes that each handle a range of shards.
+
+Every worker is a normal ``bot.py`` process with its own event loop and
+Lavalink connections. The launcher only assigns shards, restarts workers
+that exit and stops them all on shutdown.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import signal
+import sys
+
+from dotenv import load_dotenv
+
+from utils.sharding import fetch_gateway_limits, format_shard_ids, split_shards
+
+load_dotenv()
+
+DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "")
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", "2"))
+# Total shards across all workers. Empty uses Discord's recommendation
+SHARD_COUNT = os.getenv("SHARD_COUNT", "")
+CLUSTER_RESTART_DELAY = float(os.getenv("CLUSTER_RESTART_DELAY", "5"))
+
+# Discord allows one identify per 5 seconds for each concurrency bucket
+IDENTIFY_INTERVAL = 5.0
+
+BOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+
+logger = logging.getLogger("beatbob.launcher")
+
+
+class Worker:
+    """One bot process and the shards it runs."""
+
+    def __init__(self, cluster_id: int, shard_ids: list[int], shard_count: int):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+
+        self.restarts = 0
+        self.process: asyncio.subprocess.Process | None = None
+
+    @property
+    def name(self) -> str:
+        return f"cluster {self.cluster_id} (shards {format_shard_ids(self.shard_ids)})"
+
+    async def run(self, stopping: asyncio.Event, start_delay: float) -> None:
+        """Runs the worker process, restarting it until the launcher stops.
+
+        Args:
+            stopping (asyncio.Event): Set when the launcher shuts down.
+            start_delay (float): Seconds to wait before the first start, so
+                workers don't identify all at once.
+        """
+        await asyncio.sleep(start_delay)
+
+        while not stopping.is_set():
+            env = {
+                **os.environ,
+                "CLUSTER_ID": str(self.cluster_id),
+                "SHARD_IDS": format_shard_ids(self.shard_ids),
+                "SHARD_COUNT": str(self.shard_count),
+            }
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, BOT_PATH, env=env
+            )
+            logger.info(f"Started {self.name}, pid {self.process.pid}.")
+
+            code = await self.process.wait()
+            if stopping.is_set():
+                logger.info(f"Stopped {self.name}.")
+                return
+
+            self.restarts += 1
+            logger.warning(
+                f"{self.name} exited with code {code}, restarting in "
+                f"{CLUSTER_RESTART_DELAY:.0f}s (restart {self.restarts})."
+            )
+            try:
+                await asyncio.wait_for(stopping.wait(), CLUSTER_RESTART_DELAY)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.returncode is None:
+            # The bot only shuts down cleanly, saving its players, on SIGINT
+            self.process.send_signal(signal.SIGINT)
+
+
+async def main() -> None:
+    if not DISCORD_TOKEN:
+        raise RuntimeError("Missing required environment variable: DISCORD_TOKEN")
+
+    recommended, max_concurrency = await fetch_gateway_limits(DISCORD_TOKEN)
+    shard_count = int(SHARD_COUNT) if SHARD_COUNT else recommended
+
+    workers = [
+        Worker(cluster_id, shard_ids, shard_count)
+        for cluster_id, shard_ids in enumerate(split_shards(shard_count, CLUSTER_COUNT))
+    ]
+    logger.info(
+        f"Running {shard_count} shards in {len(workers)} clusters "
+        f"(Discord recommends {recommended})."
+    )
+
+    stopping = asyncio.Event()
+
+    def stop() -> None:
+        stopping.set()
+        for worker in workers:
+            worker.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+
+    # Each worker identifies its shards one bucket at a time, so the next
+    # worker waits until the previous ones are done.
+    tasks: list[asyncio.Task[None]] = []
+    start_delay = 0.0
+    for worker in workers:
+        tasks.append(asyncio.create_task(worker.run(stopping, start_delay)))
+        start_delay += (
+            math.ceil(len(worker.shard_ids) / max_concurrency) * IDENTIFY_INTERVAL
+        )
+
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s :: %(levelname)-7s :: launcher :: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    asyncio.run(main())
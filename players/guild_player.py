@@ -1,27 +1,127 @@
+from __future__ import annotations
+
 import asyncio
+import contextlib
+import contextvars
 import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, cast
 
 import wavelink
 
-from utils.enums import AutoPlayMode, LoopMode
+from players.queue import TrackQueue, track_key
+from utils import compat
+from utils.enums import AutoPlayMode, FilterPreset, LoopMode
+from utils.filters import FILTER_PRESETS
+from utils.metrics import TransitionMetrics
+from utils.player_store import PlayerSnapshot, load_track, save_track
+from utils.tracing import traced
+from utils.views import QueuePages
 
 logger = logging.getLogger("beatbob")
 
 
+@dataclass
+class PlaylistIngest:
+    """A playlist being added to a queue a chunk at a time."""
+
+    playlist: wavelink.Playlist
+
+    # Tracks of the playlist that are in the queue so far, and that were
+    # left out as duplicates
+    added: int = 0
+    skipped: int = 0
+    cancelled: bool = False
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    # Called whenever tracks were added, and once more when it's done
+    on_progress: Callable[[PlaylistIngest], None] | None = None
+
+    @property
+    def total(self) -> int:
+        return len(self.playlist.tracks)
+
+    @property
+    def handled(self) -> int:
+        return self.added + self.skipped
+
+    @property
+    def finished(self) -> bool:
+        return self.done.is_set()
+
+    def _progressed(self) -> None:
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def _finish(self, cancelled: bool = False) -> None:
+        self.cancelled = cancelled
+        self.done.set()
+        self._progressed()
+
+
 class GuildPlayer:
     """Keeps track of single player's state in a guild."""
 
     def __init__(self, player: wavelink.Player):
         self.player = player
+        # Players are new when a guild player is created, nothing to carry over
+        self.player.queue = TrackQueue()
+        self.queue_pages = QueuePages(self.get_queue())
 
         self._lock = asyncio.Lock()
 
         self.volume = 10
 
+        # Seconds to wait for more filter changes before sending them, and
+        # the longest a change may be held back while more keep coming
+        self.filter_debounce = 0.3
+        self.filter_max_delay = 1.0
+        self.filter_updates = 0
+
+        self._pending_filters: wavelink.Filters | None = None
+        self._filters_first: float | None = None
+        self._filters_due = 0.0
+        self._filters_task: asyncio.Task[None] | None = None
+
+        # Playlists go into the queue this many tracks at a time, and wait
+        # while the queue holds max_queue_length tracks
+        self.playlist_chunk_size = 100
+        self.max_queue_length = 5000
+
+        # Leave out tracks that are queued or playing already
+        self.reject_duplicates = False
+
+        self._ingests: deque[PlaylistIngest] = deque()
+        self._ingest_task: asyncio.Task[None] | None = None
+        self._queue_room = asyncio.Event()
+
+        # Start the next track this many ms before the current one ends,
+        # instead of waiting for Lavalink to report the end. 0 disables it
+        self.handoff_ms = 0
+        self._handoff_task: asyncio.Task[None] | None = None
+
+        # Latency of advancing to the next track goes here, if set. When the
+        # last play request finished, to time how long the track takes to start
+        self.transitions: TransitionMetrics | None = None
+        self.play_sent: float | None = None
+
+        # Called after every change to state that is worth persisting
+        self.on_change: Callable[[GuildPlayer], None] | None = None
+
+    def _changed(self) -> None:
+        if self._ingests and self.get_queue_size() < self.max_queue_length:
+            self._queue_room.set()
+
+        if self.on_change is not None:
+            self.on_change(self)
+
     @property
     def current(self) -> wavelink.Playable | None:
         return self.player.current
 
+    @traced("queue")
     def set_loop_mode(self, mode: LoopMode) -> None:
         if mode == LoopMode.OFF:
             self.player.queue.mode = wavelink.QueueMode.normal
@@ -30,36 +130,307 @@ class GuildPlayer:
         elif mode == LoopMode.QUEUE:
             self.player.queue.mode = wavelink.QueueMode.loop_all
 
+        self._changed()
+
+    @traced("queue")
     def shuffle(self) -> None:
         self.player.queue.shuffle()
+        self._changed()
+
+    @traced("queue")
+    def remove(self, index: int) -> wavelink.Playable:
+        """Removes a single queued track.
+
+        Args:
+            index (int): Position in the queue, 0 being the next track.
+
+        Raises:
+            IndexError: If there is no track at ``index``.
+
+        Returns:
+            wavelink.Playable: The removed track.
+        """
+        queue = self.get_queue()
+        track = queue[index]
+        queue.delete(index)
+        self._changed()
+        return track
+
+    @traced("queue")
+    def remove_range(self, start: int, stop: int) -> int:
+        """Removes the queued tracks from ``start`` up to, not including, ``stop``.
+
+        Returns:
+            int: Amount of tracks removed.
+        """
+        removed = self.get_queue().delete_range(start, stop)
+        self._changed()
+        return removed
+
+    @traced("queue")
+    def move(self, index: int, to: int) -> wavelink.Playable:
+        """Moves a queued track to another position.
+
+        Args:
+            index (int): Position of the track, 0 being the next track.
+            to (int): Position it should end up at.
+
+        Raises:
+            IndexError: If either position is outside the queue.
+
+        Returns:
+            wavelink.Playable: The moved track.
+        """
+        track = self.get_queue().move(index, to)
+        self._changed()
+        return track
+
+    @traced("queue")
+    async def jump(self, index: int) -> wavelink.Playable:
+        """Plays a queued track right away, skipping every track before it.
+
+        With the whole queue on loop, the skipped tracks go to history as if
+        they were played, so they come around again in the same order. Unlike
+        removing them, that builds each skipped track.
+
+        Args:
+            index (int): Position of the track, 0 being the next track.
+
+        Raises:
+            IndexError: If there is no track at ``index``.
+
+        Returns:
+            wavelink.Playable: The track now playing.
+        """
+        self._cancel_handoff()
+        queue = self.get_queue()
+
+        try:
+            async with self._lock:
+                if not 0 <= index < len(queue):
+                    raise IndexError(f"No track at position {index} in the queue.")
+
+                track = queue[index]
+                await self.player.play(track, volume=self.volume)
+                self.play_sent = time.perf_counter()
+
+                # Only dropped once the track plays, a failed jump keeps them
+                if (
+                    index
+                    and queue.mode is wavelink.QueueMode.loop_all
+                    and queue.history is not None
+                ):
+                    queue.history.put(queue.page(0, index))
+
+                queue.delete_range(0, index)
+                # Also loads it for looping, like the queue does for get()
+                queue.get_at(0)
+        finally:
+            self._changed()
+
+        return track
 
     async def set_volume(self, volume: int) -> None:
         self.volume = max(0, min(volume, 100))
         await self.player.set_volume(self.volume)
+        self._changed()
+
+    def is_duplicate(self, track: wavelink.Playable) -> bool:
+        """Whether the same song is queued or playing already, see ``track_key``."""
+        current = self.player.current
+        if current is not None and track_key(current) == track_key(track):
+            return True
 
-    async def add_track(self, track: wavelink.Playable) -> None:
+        return self.get_queue().is_queued(track)
+
+    def set_reject_duplicates(self, reject: bool) -> None:
+        self.reject_duplicates = reject
+        self._changed()
+
+    @traced("queue")
+    def dedupe(self) -> int:
+        """Removes queued tracks that repeat an earlier one, keeping the first.
+
+        Returns:
+            int: Amount of tracks removed.
+        """
+        removed = self.get_queue().dedupe()
+        self._changed()
+        return removed
+
+    @traced("queue")
+    async def add_track(self, track: wavelink.Playable) -> bool:
         """Adds a single track to the queue.
 
         Args:
             track (wavelink.Playable):
+
+        Returns:
+            bool: Whether the track was added, duplicates aren't while
+                ``reject_duplicates`` is set.
         """
+        if self.reject_duplicates and self.is_duplicate(track):
+            return False
+
         await self.player.queue.put_wait(track)
+        self._changed()
 
         # Start playing music if nothing's playing
         if not self.player.playing:
             await self.advance()
 
-    async def add_playlist(self, playlist: wavelink.Playlist) -> int:
-        """Adds a playlist to the queue, i.e. multiple tracks."""
-        amount_added = await self.player.queue.put_wait(playlist)
+        return True
 
-        # Start playing music if nothing's playing
-        if not self.player.playing:
-            await self.advance()
+    @traced("queue")
+    async def add_playlist(self, playlist: wavelink.Playlist) -> PlaylistIngest:
+        """Starts adding a playlist to the queue, i.e. multiple tracks.
+
+        Unless other playlists are still being added, the first track is
+        queued and playing before this returns. The rest follows in the
+        background, after the playlists before it.
+
+        Args:
+            playlist (wavelink.Playlist): Playlist to add.
+
+        Returns:
+            PlaylistIngest: Progress of adding the playlist.
+        """
+        ingest = PlaylistIngest(playlist)
+
+        if not self._ingests:
+            # Duplicates are skipped until a track was queued
+            while (
+                not ingest.added
+                and ingest.handled < ingest.total
+                and self.get_queue_size() < self.max_queue_length
+            ):
+                self._feed(ingest, 1)
+
+            # Start playing music if nothing's playing
+            if not self.player.playing:
+                await self.advance()
+
+        if ingest.handled == ingest.total:
+            ingest._finish()
+            return ingest
+
+        self._ingests.append(ingest)
+        if self._ingest_task is None:
+            # Outlives the command that started it, so it's left out of its trace
+            self._ingest_task = asyncio.create_task(
+                self._ingest(), context=contextvars.Context()
+            )
+
+        return ingest
+
+    def cancel_ingests(self) -> None:
+        """Stops adding playlists, tracks already queued stay."""
+        if self._ingest_task is not None:
+            self._ingest_task.cancel()
+            self._ingest_task = None
+
+        while self._ingests:
+            self._ingests.popleft()._finish(cancelled=True)
+
+    def _feed(self, ingest: PlaylistIngest, amount: int) -> None:
+        amount = min(amount, self.max_queue_length - self.get_queue_size())
+        tracks = ingest.playlist.tracks[ingest.handled : ingest.handled + amount]
+        if not tracks:
+            return
+
+        if self.reject_duplicates:
+            handled = len(tracks)
+            tracks = self._without_duplicates(tracks)
+            ingest.skipped += handled - len(tracks)
+
+        self.player.queue.put(tracks)
+        ingest.added += len(tracks)
+
+        self._changed()
+        ingest._progressed()
+
+    def _without_duplicates(
+        self, tracks: list[wavelink.Playable]
+    ) -> list[wavelink.Playable]:
+        # Also leaves out repeats within the tracks themselves
+        seen: set[str] = set()
+        kept: list[wavelink.Playable] = []
+        for track in tracks:
+            key = track_key(track)
+            if key not in seen and not self.is_duplicate(track):
+                kept.append(track)
+            seen.add(key)
+
+        return kept
+
+    async def _ingest(self) -> None:
+        try:
+            while self._ingests:
+                ingest = self._ingests[0]
+
+                while ingest.handled < ingest.total:
+                    # Back pressure, a full queue makes room as tracks are played
+                    while self.get_queue_size() >= self.max_queue_length:
+                        self._queue_room.clear()
+                        await self._queue_room.wait()
+
+                    self._feed(ingest, self.playlist_chunk_size)
+
+                    # Other guilds and commands get their turn between chunks
+                    await asyncio.sleep(0)
+
+                self._ingests.popleft()
+                ingest._finish()
+        except Exception:
+            logger.exception("Failed to add playlist to the queue.")
+            self._ingest_task = None
+            self.cancel_ingests()
+        finally:
+            if self._ingest_task is asyncio.current_task():
+                self._ingest_task = None
+
+    def _find_upcoming(self, track: wavelink.Playable, within: int) -> int | None:
+        # Compared by identity, equal tracks elsewhere in the queue stay untouched
+        for index, queued in enumerate(self.get_queue().page(0, within)):
+            if queued is track:
+                return index
+
+        return None
+
+    def attach_playback(
+        self, track: wavelink.Playable, playback: str, within: int
+    ) -> bool:
+        """Makes a track near the front of the queue play a copy found for it.
 
-        return amount_added
+        Args:
+            track (wavelink.Playable): Queued mirrored track.
+            playback (str): Encoded copy to play instead, see ``MirroredPlayable``.
+            within (int): How many tracks from the front to look for it.
+
+        Returns:
+            bool: Whether the track was still queued.
+        """
+        index = self._find_upcoming(track, within)
+        if index is None:
+            return False
+
+        # Shown and saved as before, so nothing to save or redraw
+        self.get_queue().attach_playback(index, playback)
+        return True
+
+    def drop_upcoming(self, track: wavelink.Playable, within: int) -> bool:
+        index = self._find_upcoming(track, within)
+        if index is None:
+            return False
+
+        self.player.queue.delete(index)
+        self._changed()
+        return True
 
     async def get_progress(self) -> dict[str, int]:
+        return self.progress()
+
+    def progress(self) -> dict[str, int]:
         if self.player.current:
             return {
                 "position": self.player.position,
@@ -80,14 +451,36 @@ class GuildPlayer:
         await self.player.play(next_song, volume=self.volume)
 
     async def advance(self) -> None:
+        try:
+            await self._advance()
+        finally:
+            self._changed()
+
+    def _observe(self, phase: str, started: float, node: str | None = None) -> None:
+        if self.transitions is not None and self.player.guild is not None:
+            self.transitions.observe(
+                phase,
+                self.player.guild.id,
+                (time.perf_counter() - started) * 1000,
+                node,
+            )
+
+    async def _advance(self) -> None:
+        waiting = time.perf_counter()
         async with self._lock:
+            self._observe("lock_wait", waiting)
+
             if (
                 not self.player.queue.is_empty
                 or self.player.queue.mode is not wavelink.QueueMode.normal
             ):
                 try:
                     track = self.player.queue.get()
+
+                    requested = time.perf_counter()
                     await self.player.play(track, volume=self.volume)
+                    self._observe("play", requested, self.player.node.identifier)
+                    self.play_sent = time.perf_counter()
                     return
                 except wavelink.QueueEmpty:
                     pass
@@ -101,21 +494,126 @@ class GuildPlayer:
             # Stop playback completely
             await self.player.stop()
 
+    async def migrate(self, node: wavelink.Node, position: int) -> None:
+        """Moves playback to another node after the current one was lost.
+
+        The node may also be the lost node itself, once it has come back
+        without its old session. Current track, volume, filters, pause state
+        and queue are kept.
+
+        Args:
+            node (wavelink.Node): Node to continue playback on.
+            position (int): Position in ms to restart the current track at.
+
+        Raises:
+            RuntimeError: If the voice connection could not be moved, or the
+                installed wavelink can't move players, see ``utils.compat``.
+        """
+        async with self._lock:
+            # Player.switch_node would re-add the current track to history,
+            # which breaks loop_all order
+            await compat.move_player(self.player, node)
+            self._changed()
+
+            current = self.player.current
+            if current is None:
+                await self.player.set_filters(self.player.filters)
+                await self.player.set_volume(self.volume)
+                return
+
+            await self.player.play(
+                current,
+                replace=True,
+                start=position,
+                volume=self.volume,
+                filters=self.player.filters,
+                paused=self.player.paused,
+                add_history=False,
+            )
+
+    @traced("queue")
     async def skip(self, *, force: bool = False) -> wavelink.Playable | None:
-        return await self.player.skip(force=force)
+        self._cancel_handoff()
+        track = await self.player.skip(force=force)
+        self._changed()
+        return track
 
+    @traced("queue")
     async def stop(self) -> None:
+        self.cancel_ingests()
         self.player.queue.clear()
         await self.skip(force=True)
 
     async def pause(self) -> None:
         await self.player.pause(True)
+        self.schedule_handoff()
+        self._changed()
 
     async def resume(self) -> None:
         await self.player.pause(False)
+        self.schedule_handoff()
+        self._changed()
 
     async def seek(self, position_s: int) -> None:
         await self.player.seek(position_s * 1000)
+        self.schedule_handoff()
+        self._changed()
+
+    def schedule_handoff(self) -> None:
+        """Plans starting the next track shortly before the current one ends.
+
+        Called whenever the current track, its position or its speed may have
+        changed, which replaces the previous plan.
+        """
+        self._cancel_handoff()
+
+        track = self.player.current
+        if (
+            self.handoff_ms <= 0
+            or track is None
+            or track.is_stream
+            or self.player.paused
+            or not self.player.playing
+        ):
+            return
+
+        # Positions are reported in track time, sped up tracks end sooner
+        timescale = self.player.filters.timescale.payload
+        if timescale.get("speed", 1.0) != 1.0 or timescale.get("rate", 1.0) != 1.0:
+            return
+
+        self._handoff_task = asyncio.create_task(self._hand_off(track))
+
+    def _cancel_handoff(self) -> None:
+        if self._handoff_task is not None:
+            self._handoff_task.cancel()
+            self._handoff_task = None
+
+    async def _hand_off(self, track: wavelink.Playable) -> None:
+        remaining = track.length - self.player.position
+        await asyncio.sleep(max(0, remaining - self.handoff_ms) / 1000)
+
+        # Skipped, paused or seeked meanwhile, those reschedule themselves
+        if self.player.current is not track or self.player.paused:
+            return
+
+        # Position updates can move the end, wait for the corrected time
+        if track.length - self.player.position > self.handoff_ms + 100:
+            self._handoff_task = asyncio.create_task(self._hand_off(track))
+            return
+
+        # Nothing to hand off to, let the track end and autoplay take over
+        if (
+            self.player.queue.is_empty
+            and self.player.queue.mode is wavelink.QueueMode.normal
+        ):
+            return
+
+        self._handoff_task = None
+        try:
+            await self.advance()
+        except Exception:
+            logger.exception("Failed to hand off to the next track.")
 
     def is_playing(self) -> bool:
         return self.player.playing
@@ -126,36 +624,163 @@ class GuildPlayer:
         elif mode == AutoPlayMode.OFF:
             self.player.autoplay = wavelink.AutoPlayMode.disabled
 
-    async def nightcore(self, value: float) -> None:
-        filters: wavelink.Filters = self.player.filters
-        filters.timescale.set(
-            pitch=1.2 if value else 1, speed=1.2 if value else 1, rate=1
+        self._changed()
+
+    @contextlib.asynccontextmanager
+    async def filter_transaction(self) -> AsyncIterator[wavelink.Filters]:
+        """Groups filter changes into a single update to Lavalink.
+
+        Changes are made on a copy, which is dropped if the block raises.
+        Transactions that end within ``filter_debounce`` seconds of each other
+        are sent as one update, so only their combined, latest values reach
+        Lavalink. Waits until the update was sent.
+
+        Yields:
+            wavelink.Filters: Filters to change.
+        """
+        base = self._pending_filters or self.player.filters
+        filters = wavelink.Filters(data=base())
+
+        yield filters
+
+        self._pending_filters = filters
+
+        now = time.monotonic()
+        if self._filters_first is None:
+            self._filters_first = now
+        self._filters_due = min(
+            now + self.filter_debounce, self._filters_first + self.filter_max_delay
         )
-        await self.player.set_filters(filters)
+
+        if self._filters_task is None or self._filters_task.done():
+            self._filters_task = asyncio.create_task(self._send_filters())
+
+        await asyncio.shield(self._filters_task)
+
+    async def _send_filters(self) -> None:
+        while self._pending_filters is not None:
+            delay = self._filters_due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            filters, self._pending_filters = self._pending_filters, None
+            self._filters_first = None
+
+            await self.player.set_filters(filters)
+            self.filter_updates += 1
+            self.schedule_handoff()
+            self._changed()
+
+    async def apply_preset(self, preset: FilterPreset) -> None:
+        async with self.filter_transaction() as filters:
+            filters.reset()
+            FILTER_PRESETS[preset](filters)
+
+    async def nightcore(self, value: float) -> None:
+        async with self.filter_transaction() as filters:
+            filters.timescale.set(
+                pitch=1.2 if value else 1, speed=1.2 if value else 1, rate=1
+            )
 
     async def pitch(self, value: float) -> None:
-        filters: wavelink.Filters = self.player.filters
-        filters.timescale.set(pitch=value)
-        await self.player.set_filters(filters)
+        async with self.filter_transaction() as filters:
+            filters.timescale.set(pitch=value)
 
     async def speed(self, value: float) -> None:
-        filters: wavelink.Filters = self.player.filters
-        filters.timescale.set(speed=value)
-        await self.player.set_filters(filters)
+        async with self.filter_transaction() as filters:
+            filters.timescale.set(speed=value)
 
     async def rate(self, value: float) -> None:
-        filters: wavelink.Filters = self.player.filters
-        filters.timescale.set(rate=value)
-        await self.player.set_filters(filters)
+        async with self.filter_transaction() as filters:
+            filters.timescale.set(rate=value)
+
+    def snapshot(self, full: bool = True) -> PlayerSnapshot:
+        """Captures the player's state so it can be restored after a restart.
 
-    def get_queue(self) -> wavelink.Queue:
-        return self.player.queue
+        Args:
+            full (bool, optional): Whether to include the whole queue.
+                Otherwise only its changes since the last snapshot are
+                included, where they can be told by position. Defaults to True.
+        """
+        guild = self.player.guild
+        assert guild is not None
+
+        current = self.player.current
+        changes = self.get_queue().take_changes()
+        if full:
+            changes = None
+
+        return PlayerSnapshot(
+            guild_id=guild.id,
+            channel_id=self.player.channel.id,
+            node_id=self.player.node.identifier,
+            current=save_track(current) if current else None,
+            position=self.player.position,
+            queue=self.get_queue().saved() if changes is None else [],
+            changes=changes,
+            queue_mode=self.player.queue.mode.value,
+            autoplay=self.player.autoplay.value,
+            volume=self.volume,
+            paused=self.player.paused,
+            filters=self.player.filters(),
+        )
+
+    async def restore(
+        self,
+        snapshot: PlayerSnapshot,
+        resumed: wavelink.PlayerResponsePayload | None = None,
+    ) -> None:
+        """Rebuilds queue and settings from a snapshot.
+
+        Args:
+            snapshot (PlayerSnapshot): State saved before the restart.
+            resumed (wavelink.PlayerResponsePayload | None, optional): State of
+                the player Lavalink kept alive through a resumed session. If
+                given, playback is adopted as is. Otherwise the saved track is
+                restarted at the saved position. Defaults to None.
+        """
+        self.volume = snapshot.volume
+        self.get_queue().load_saved(snapshot.queue)
+        self.player.queue.mode = wavelink.QueueMode(snapshot.queue_mode)
+        self.player.autoplay = wavelink.AutoPlayMode(snapshot.autoplay)
+
+        if resumed is not None and resumed.track is not None:
+            compat.adopt_playback(self.player, resumed)
+            self._changed()
+            return
+
+        filters = wavelink.Filters(data=snapshot.filters)
+
+        if snapshot.current is None:
+            await self.player.set_filters(filters)
+            await self.advance()
+            return
+
+        await self.player.play(
+            load_track(snapshot.current),
+            start=snapshot.position,
+            volume=self.volume,
+            filters=filters,
+            paused=snapshot.paused,
+            add_history=False,
+        )
+        self._changed()
+
+    def get_queue(self) -> TrackQueue:
+        return cast(TrackQueue, self.player.queue)
 
     def get_queue_size(self) -> int:
         return self.player.queue.count
 
+    def release(self) -> None:
+        """Stops all background work of this player, without touching Lavalink."""
+        self.cancel_ingests()
+        self._cancel_handoff()
+
     async def cleanup(self) -> None:
-        # Clear queue
+        # Clear queue, including playlists still being added
+        self.release()
         self.player.queue.clear()
 
         # Stop playback
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import wavelink
+
+from players.queue import MirroredPlayable
+from utils.search import TrackResolver
+
+if TYPE_CHECKING:
+    from players.guild_player import GuildPlayer
+
+logger = logging.getLogger("beatbob")
+
+# Sources Lavalink only has metadata for. lavasrc finds a playable copy
+# through its providers when the track is played, see application.example.yml.
+MIRRORED_SOURCES = {"spotify", "applemusic", "deezer", "yandexmusic", "vkmusic"}
+
+# lavasrc's default providers, the same as in application.example.yml
+DEFAULT_PROVIDERS = ['ytsearch:"%ISRC%"', "ytsearch:%QUERY%"]
+
+
+def parse_providers(value: str) -> list[str]:
+    """Parses comma separated provider queries, like lavasrc's ``providers``.
+
+    Args:
+        value (str): E.g. ``ytsearch:"%ISRC%",ytsearch:%QUERY%``. Empty gives
+            the defaults.
+
+    Returns:
+        list[str]: Provider queries in order.
+    """
+    providers = [provider.strip() for provider in value.split(",")]
+    return [provider for provider in providers if provider] or DEFAULT_PROVIDERS
+
+
+def needs_resolving(track: wavelink.Playable) -> bool:
+    return track.source in MIRRORED_SOURCES and not isinstance(track, MirroredPlayable)
+
+
+def provider_queries(track: wavelink.Playable, providers: list[str]) -> list[str]:
+    """Queries lavasrc would try for a mirrored track, in the same order.
+
+    ``%ISRC%`` is replaced by the track's ISRC, providers using it are
+    skipped for tracks without one. ``%QUERY%`` is replaced by title and
+    author. Providers with neither aren't searches and are skipped.
+    """
+    queries: list[str] = []
+    for provider in providers:
+        if "%ISRC%" in provider:
+            if track.isrc:
+                queries.append(provider.replace("%ISRC%", track.isrc))
+        elif "%QUERY%" in provider:
+            queries.append(provider.replace("%QUERY%", f"{track.title} {track.author}"))
+
+    return queries
+
+
+@dataclass
+class PrefetchStats:
+    resolved: int = 0
+    dropped: int = 0
+    failed: int = 0
+
+
+class Prefetcher:
+    """Resolves the next few queued tracks while the current one plays.
+
+    Mirrored tracks (e.g. Spotify) get the playable copy Lavalink would have
+    searched for on play attached, so starting them needs no search. They
+    are still shown and saved as the mirrored track. Tracks nothing is found
+    for are dropped from the queue before their turn. Searches go through the
+    bot's ``TrackResolver``, so songs queued again are served from its cache.
+    Each guild is worked on by one task at a time, and at most ``per_node``
+    searches run on a Lavalink node at once.
+    """
+
+    def __init__(
+        self,
+        resolver: TrackResolver,
+        providers: list[str] = DEFAULT_PROVIDERS,
+        depth: int = 3,
+        per_node: int = 2,
+    ) -> None:
+        self.resolver = resolver
+        self.providers = providers
+        self.depth = depth
+        self.per_node = per_node
+
+        self.stats = PrefetchStats()
+
+        self._limits: dict[str, asyncio.Semaphore] = {}
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+        self._rerun: set[int] = set()
+
+    def schedule(self, guild_id: int, guild_player: GuildPlayer) -> None:
+        """Looks ahead in a guild's queue, now or after the running look-ahead."""
+        if self.depth <= 0:
+            return
+
+        if guild_id in self._tasks:
+            self._rerun.add(guild_id)
+            return
+
+        # Outlives the command that started it, so it's left out of its trace
+        self._tasks[guild_id] = asyncio.create_task(
+            self._run(guild_id, guild_player), context=contextvars.Context()
+        )
+
+    def cancel(self, guild_id: int) -> None:
+        task = self._tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+
+        self._rerun.discard(guild_id)
+
+    def close(self) -> None:
+        for guild_id in list(self._tasks):
+            self.cancel(guild_id)
+
+    async def _run(self, guild_id: int, guild_player: GuildPlayer) -> None:
+        try:
+            while True:
+                self._rerun.discard(guild_id)
+                await self._look_ahead(guild_player)
+
+                if guild_id not in self._rerun:
+                    return
+        except Exception:
+            logger.exception(f"Look-ahead failed in guild {guild_id}.")
+        finally:
+            if self._tasks.get(guild_id) is asyncio.current_task():
+                del self._tasks[guild_id]
+
+    async def _look_ahead(self, guild_player: GuildPlayer) -> None:
+        upcoming = guild_player.get_queue().page(0, self.depth)
+
+        for track in upcoming:
+            if not needs_resolving(track):
+                continue
+
+            node = guild_player.player.node
+            limit = self._limits.setdefault(
+                node.identifier, asyncio.Semaphore(self.per_node)
+            )
+
+            try:
+                async with limit:
+                    resolved = await self._resolve(track, node)
+            except Exception:
+                # Left for Lavalink to resolve on play
+                self.stats.failed += 1
+                logger.warning(f"Failed to look ahead at '{track.title}'.")
+                continue
+
+            if resolved is None:
+                if guild_player.drop_upcoming(track, within=self.depth * 2):
+                    self.stats.dropped += 1
+                    logger.info(f"Dropped unplayable track '{track.title}'.")
+                continue
+
+            if guild_player.attach_playback(track, resolved, within=self.depth * 2):
+                self.stats.resolved += 1
+
+    async def _resolve(
+        self, track: wavelink.Playable, node: wavelink.Node
+    ) -> str | None:
+        """Encoded copy lavasrc would play for a mirrored track, if any."""
+        for query in provider_queries(track, self.providers):
+            result = await self.resolver.search(query, prefixed=True, node=node)
+            tracks = result.tracks if isinstance(result, wavelink.Playlist) else result
+
+            for candidate in tracks:
+                if not candidate.is_stream:
+                    return candidate.encoded
+
+        return None
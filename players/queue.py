@@ -0,0 +1,557 @@
+from __future__ import annotations
+
+import copy
+import sys
+import weakref
+from collections.abc import Iterable, Iterator, MutableSequence
+from typing import Any, cast, overload
+
+import wavelink
+from wavelink.types.tracks import TrackPayload
+
+from utils.chunked_list import ChunkedList
+from utils.player_store import QueueChange, SavedQueuedTrack, load_track
+from utils.track_codec import decode_track
+
+# Changes kept for the player store before it's cheaper to save the whole queue
+MAX_CHANGES = 1_000
+
+
+def track_length(track: wavelink.Playable) -> int:
+    """Length of a track in ms, where live streams count as 0."""
+    return 0 if track.is_stream else track.length
+
+
+def track_key(track: wavelink.Playable) -> str:
+    """What makes two tracks the same song, for finding duplicates.
+
+    The ISRC where there is one, which also matches the same recording
+    found through another source. Otherwise source and identifier.
+    """
+    return track.isrc or f"{track.source}:{track.identifier}"
+
+
+def saved_encoded(track: wavelink.Playable) -> str:
+    """Encoded track that ``track`` is saved and compared as.
+
+    The one it was built from, which for a ``MirroredPlayable`` is the
+    mirrored track rather than the copy that's played.
+    """
+    return track.raw_data["encoded"]
+
+
+class MirroredPlayable(wavelink.Playable):
+    """A mirrored track, e.g. from Spotify, with a playable copy found for it.
+
+    Lavalink is sent the copy, so it doesn't have to search for one when the
+    track starts. Everything else is the mirrored track's, so it's shown,
+    saved and found as duplicate as that.
+    """
+
+    def __init__(
+        self,
+        data: TrackPayload,
+        playback: str,
+        *,
+        playlist: wavelink.PlaylistInfo | None = None,
+    ) -> None:
+        super().__init__(data, playlist=playlist)
+        self.playback = playback
+
+    @property
+    def encoded(self) -> str:
+        """Encoded copy, which is what Lavalink plays."""
+        return self.playback
+
+
+class QueuedTrack:
+    """A queued track, kept as its encoded string until it's about to be used.
+
+    Everything else a ``wavelink.Playable`` holds can be decoded from the
+    encoded string, except its extras and playlist. Requesters are interned,
+    so every track a user queued shares one string. Source specific plugin
+    info is not kept, as in the player store. ``key`` is kept to find
+    duplicates, see ``track_key``. ``playback`` is the copy found for a
+    mirrored track, see ``MirroredPlayable``.
+    """
+
+    __slots__ = (
+        "encoded",
+        "length",
+        "key",
+        "requester",
+        "extras",
+        "playlist",
+        "playback",
+    )
+
+    def __init__(self, track: wavelink.Playable) -> None:
+        self.encoded = saved_encoded(track)
+        self.length = track_length(track)
+        self.key = track_key(track)
+        self.playlist = track.playlist
+        self.playback = track.playback if isinstance(track, MirroredPlayable) else None
+        self._set_user_data(dict(track.extras))
+
+    @classmethod
+    def from_saved(cls, saved: SavedQueuedTrack) -> QueuedTrack:
+        """Rebuilds a record the player store saved, decoding it only if it
+        was saved without its length and key."""
+        encoded, user_data, length, key = saved
+        if length is None or key is None:
+            return cls(load_track((encoded, user_data)))
+
+        record = cls.__new__(cls)
+        record.encoded = encoded
+        record.length = length
+        record.key = key
+        record.playlist = None
+        record.playback = None
+        record._set_user_data(user_data)
+        return record
+
+    def with_playback(self, playback: str) -> QueuedTrack:
+        """Copy of the record that plays ``playback`` instead."""
+        record = copy.copy(self)
+        record.playback = playback
+        return record
+
+    def _set_user_data(self, extras: dict[str, Any]) -> None:
+        requester = extras.get("requested_by")
+        self.requester: str | None = None
+        self.extras: dict[str, Any] | None = None
+        if isinstance(requester, str) and len(extras) == 1:
+            self.requester = sys.intern(requester)
+        elif extras:
+            self.extras = extras
+
+    def saved(self) -> SavedQueuedTrack:
+        return self.encoded, self.user_data(), self.length, self.key
+
+    def user_data(self) -> dict[str, Any]:
+        if self.requester is not None:
+            return {"requested_by": self.requester}
+
+        return dict(self.extras) if self.extras is not None else {}
+
+    def playable(self) -> wavelink.Playable:
+        payload = decode_track(self.encoded)
+        payload["userData"] = self.user_data()
+
+        if self.playback is not None:
+            return MirroredPlayable(payload, self.playback, playlist=self.playlist)
+
+        return wavelink.Playable(payload, playlist=self.playlist)
+
+
+class TrackList(MutableSequence[wavelink.Playable]):
+    """List of tracks stored as compact ``QueuedTrack`` records.
+
+    Tracks are turned back into ``wavelink.Playable`` only when read, so
+    reading a page or the next track only builds those. Records are kept in a
+    ``ChunkedList``, so removing, inserting or moving a track anywhere in a
+    long queue takes O(log n) rather than shifting every track behind it.
+    Every change adjusts ``total_length`` and the count of tracks per
+    ``track_key`` by the tracks involved only, so neither has to be
+    recounted, and bumps ``version``. Changes are also noted by position,
+    so the player store can save only those, see ``take_changes``.
+    """
+
+    def __init__(self, tracks: Iterable[wavelink.Playable] = ()) -> None:
+        # Tracks built from records, or put in, for as long as something uses
+        # them. Reading a track twice gives the same Playable
+        self._built: weakref.WeakValueDictionary[QueuedTrack, wavelink.Playable] = (
+            weakref.WeakValueDictionary()
+        )
+        self._records: ChunkedList[QueuedTrack] = ChunkedList(
+            self._record(track) for track in tracks
+        )
+        # Track key -> how many queued tracks have it
+        self._keys: dict[str, int] = {}
+        self.total_length = 0
+        self._added(self._records)
+        self.version = 0
+        # Changes since take_changes was last called, or None if the whole
+        # list has to be saved again
+        self._changes: list[tuple[str, int, int, list[QueuedTrack]]] | None = []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[wavelink.Playable]:
+        return (self._build(record) for record in self._records)
+
+    def __reversed__(self) -> Iterator[wavelink.Playable]:
+        return (self._build(record) for record in reversed(self._records))
+
+    def __contains__(self, track: object) -> bool:
+        if not isinstance(track, wavelink.Playable):
+            return False
+
+        # Compared by encoded track, without building every queued track
+        encoded = saved_encoded(track)
+        return any(record.encoded == encoded for record in self._records)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, TrackList):
+            return [record.encoded for record in self._records] == [
+                record.encoded for record in other._records
+            ]
+
+        return list(self) == other
+
+    def __repr__(self) -> str:
+        return f"TrackList({len(self._records)} tracks)"
+
+    @overload
+    def __getitem__(self, index: int) -> wavelink.Playable: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[wavelink.Playable]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> wavelink.Playable | list[wavelink.Playable]:
+        if isinstance(index, slice):
+            return [self._build(record) for record in self._records[index]]
+
+        return self._build(self._records[index])
+
+    @overload
+    def __setitem__(self, index: int, value: wavelink.Playable) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[wavelink.Playable]) -> None: ...
+
+    def __setitem__(
+        self,
+        index: int | slice,
+        value: wavelink.Playable | Iterable[wavelink.Playable],
+    ) -> None:
+        self.version += 1
+
+        if isinstance(index, slice):
+            assert not isinstance(value, wavelink.Playable)
+            records = self._compact(value)
+            self._removed(self._records[index])
+            self._records[index] = records
+            self._added(records)
+            self._changes = None
+            return
+
+        assert isinstance(value, wavelink.Playable)
+        record = self._record(value)
+        self._removed((self._records[index],))
+        self._records[index] = record
+        self._added((record,))
+        self._note("replace", self._position(index), 0, [record])
+
+    def __delitem__(self, index: int | slice) -> None:
+        self.version += 1
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._records))
+            self._removed(self._records[index])
+            if step == 1:
+                self._note("delete", start, max(start, stop), [])
+            else:
+                self._changes = None
+        else:
+            position = self._position(index)
+            self._removed((self._records[position],))
+            self._note("delete", position, position + 1, [])
+
+        del self._records[index]
+
+    def _position(self, index: int) -> int:
+        return index + len(self._records) if index < 0 else index
+
+    def _note(
+        self, kind: str, first: int, second: int, records: list[QueuedTrack]
+    ) -> None:
+        changes = self._changes
+        if changes is None:
+            return
+
+        # Runs of appends, or of removals at one position, make one change
+        if changes:
+            last_kind, last_first, last_second, last_records = changes[-1]
+            if kind == last_kind == "insert" and first == last_first + len(
+                last_records
+            ):
+                last_records.extend(records)
+                return
+
+            if kind == last_kind == "delete" and first == last_first:
+                changes[-1] = (kind, first, last_second + second - first, [])
+                return
+
+        if len(changes) >= MAX_CHANGES:
+            self._changes = None
+            return
+
+        changes.append((kind, first, second, list(records)))
+
+    def _added(self, records: Iterable[QueuedTrack]) -> None:
+        keys = self._keys
+        for record in records:
+            self.total_length += record.length
+            keys[record.key] = keys.get(record.key, 0) + 1
+
+    def _removed(self, records: Iterable[QueuedTrack]) -> None:
+        keys = self._keys
+        for record in records:
+            self.total_length -= record.length
+            if keys[record.key] == 1:
+                del keys[record.key]
+            else:
+                keys[record.key] -= 1
+
+    def _record(self, track: wavelink.Playable) -> QueuedTrack:
+        record = QueuedTrack(track)
+        self._built[record] = track
+        return record
+
+    def _build(self, record: QueuedTrack) -> wavelink.Playable:
+        track = self._built.get(record)
+        if track is None:
+            track = self._built[record] = record.playable()
+
+        return track
+
+    def _compact(self, tracks: Iterable[wavelink.Playable]) -> list[QueuedTrack]:
+        if isinstance(tracks, TrackList):
+            # Records are never changed, so lists can share them
+            return list(tracks._records)
+
+        return [self._record(track) for track in tracks]
+
+    def insert(self, index: int, track: wavelink.Playable) -> None:
+        self.version += 1
+        record = self._record(track)
+        position = min(max(self._position(index), 0), len(self._records))
+        self._records.insert(index, record)
+        self._added((record,))
+        self._note("insert", position, 0, [record])
+
+    def append(self, track: wavelink.Playable) -> None:
+        self.version += 1
+        record = self._record(track)
+        self._records.append(record)
+        self._added((record,))
+        self._note("insert", len(self._records) - 1, 0, [record])
+
+    def extend(self, tracks: Iterable[wavelink.Playable]) -> None:
+        self.version += 1
+        records = self._compact(tracks)
+        self._note("insert", len(self._records), 0, records)
+        self._records.extend(records)
+        self._added(records)
+
+    def pop(self, index: int = -1) -> wavelink.Playable:
+        self.version += 1
+        position = self._position(index)
+        record = self._records.pop(index)
+        self._removed((record,))
+        self._note("delete", position, position + 1, [])
+        return self._build(record)
+
+    def index(self, track: object, start: int = 0, stop: int = sys.maxsize) -> int:
+        if isinstance(track, wavelink.Playable):
+            encoded = saved_encoded(track)
+            for index, record in enumerate(self._records[start:stop], start):
+                if record.encoded == encoded:
+                    return index
+
+        raise ValueError(f"{track!r} is not in the queue.")
+
+    def clear(self) -> None:
+        self.version += 1
+        self._note("delete", 0, len(self._records), [])
+        self._records.clear()
+        self._built.clear()
+        self._keys.clear()
+        self.total_length = 0
+
+    def move(self, index: int, to: int) -> wavelink.Playable:
+        """Moves the track at ``index`` to position ``to`` and returns it."""
+        record = self._records[index]
+        self._records.move(index, to)
+        self.version += 1
+        self._note("move", self._position(index), self._position(to), [])
+        return self._build(record)
+
+    def attach_playback(self, index: int, playback: str) -> wavelink.Playable:
+        """Makes the track at ``index`` play ``playback``, see ``MirroredPlayable``.
+
+        Not a change to save, the store keeps the mirrored track.
+
+        Returns:
+            wavelink.Playable: The track as it's queued now.
+        """
+        record = self._records[index].with_playback(playback)
+        self._records[index] = record
+        return self._build(record)
+
+    def shuffle(self) -> None:
+        # Moves records, not tracks, which would be built and compacted again
+        self.version += 1
+        self._records.shuffle()
+        self._changes = None
+
+    def count_key(self, key: str) -> int:
+        """How many tracks with this ``track_key`` are in the list."""
+        return self._keys.get(key, 0)
+
+    @property
+    def duplicates(self) -> int:
+        """Tracks that repeat an earlier track with the same key."""
+        return len(self._records) - len(self._keys)
+
+    def dedupe(self) -> int:
+        """Removes every track repeating an earlier one, in a single pass.
+
+        Returns:
+            int: Amount of tracks removed.
+        """
+        if not self.duplicates:
+            return 0
+
+        seen: set[str] = set()
+        kept: list[QueuedTrack] = []
+        removed: list[QueuedTrack] = []
+        for record in self._records:
+            if record.key in seen:
+                removed.append(record)
+            else:
+                seen.add(record.key)
+                kept.append(record)
+
+        self.version += 1
+        self._records = ChunkedList(kept)
+        self._removed(removed)
+        self._changes = None
+        return len(removed)
+
+    def saved(self) -> list[SavedQueuedTrack]:
+        """Every track as the player store saves it."""
+        return [record.saved() for record in self._records]
+
+    def load_saved(self, tracks: list[SavedQueuedTrack]) -> None:
+        """Appends tracks read from the player store, without decoding them.
+
+        Not noted as a change, as the store has them already.
+        """
+        self.version += 1
+        records = [QueuedTrack.from_saved(track) for track in tracks]
+        self._records.extend(records)
+        self._added(records)
+
+    def take_changes(self) -> list[QueueChange] | None:
+        """Changes since this was last called, as the player store saves them.
+
+        Returns:
+            list[QueueChange] | None: The changes in order, or None if the
+                whole list has to be saved again.
+        """
+        changes, self._changes = self._changes, []
+        if changes is None:
+            return None
+
+        return [
+            (kind, first, second, [record.saved() for record in records])
+            for kind, first, second, records in changes
+        ]
+
+    def copy(self) -> TrackList:
+        copied = TrackList()
+        copied._records = self._records.copy()
+        copied._keys = self._keys.copy()
+        copied.total_length = self.total_length
+        copied.version = self.version
+        copied._changes = None
+        return copied
+
+
+class TrackQueue(wavelink.Queue):
+    """Wavelink queue that keeps aggregates of its tracks and can be read a page at a time.
+
+    Queued tracks are stored compactly, see ``TrackList``. History keeps the
+    played tracks as they are.
+    """
+
+    def __init__(self, *, history: bool = True) -> None:
+        super().__init__(history=history)
+
+        # Queue only uses list operations that TrackList has as well
+        self._tracks = TrackList()
+        self._items = cast(list[wavelink.Playable], self._tracks)
+
+    @property
+    def total_length(self) -> int:
+        """Combined length in ms of every queued track, not counting live streams."""
+        return self._tracks.total_length
+
+    @property
+    def version(self) -> int:
+        """Changes whenever tracks are added, removed or moved."""
+        return self._tracks.version
+
+    def page(self, start: int, size: int) -> list[wavelink.Playable]:
+        """Returns up to ``size`` tracks from ``start`` on, without copying the rest."""
+        return self._tracks[start : start + size]
+
+    def delete_range(self, start: int, stop: int) -> int:
+        """Removes the tracks from ``start`` up to ``stop``.
+
+        Returns:
+            int: Amount of tracks removed.
+        """
+        removed = len(self._tracks)
+        del self._tracks[start:stop]
+        return removed - len(self._tracks)
+
+    def move(self, index: int, to: int) -> wavelink.Playable:
+        """Moves the track at ``index`` to position ``to`` and returns it.
+
+        Raises:
+            IndexError: Either position is outside the queue.
+        """
+        return self._tracks.move(index, to)
+
+    def attach_playback(self, index: int, playback: str) -> wavelink.Playable:
+        """Makes the track at ``index`` play ``playback``, see ``MirroredPlayable``."""
+        return self._tracks.attach_playback(index, playback)
+
+    def shuffle(self) -> None:
+        self._tracks.shuffle()
+
+    def is_queued(self, track: wavelink.Playable) -> bool:
+        """Whether the same song is queued already, see ``track_key``. Takes O(1)."""
+        return self._tracks.count_key(track_key(track)) > 0
+
+    @property
+    def duplicates(self) -> int:
+        """Queued tracks that repeat an earlier one."""
+        return self._tracks.duplicates
+
+    def dedupe(self) -> int:
+        """Removes every track repeating an earlier one, keeping the first.
+
+        Returns:
+            int: Amount of tracks removed.
+        """
+        return self._tracks.dedupe()
+
+    def saved(self) -> list[SavedQueuedTrack]:
+        """Every queued track as the player store saves it, without building them."""
+        return self._tracks.saved()
+
+    def load_saved(self, tracks: list[SavedQueuedTrack]) -> None:
+        """Appends tracks read from the player store, without decoding them."""
+        self._tracks.load_saved(tracks)
+        self._wakeup_next()
+
+    def take_changes(self) -> list[QueueChange] | None:
+        """Changes to the queue since this was last called, see ``TrackList.take_changes``."""
+        return self._tracks.take_changes()
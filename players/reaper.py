@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+logger = logging.getLogger("beatbob")
+
+# Why a player was reclaimed
+REAP_REASONS = {
+    "alone": "No listeners left in the voice channel",
+    "idle": "Nothing played for too long",
+    "disconnected": "The bot was disconnected from voice",
+}
+
+
+@dataclass
+class ReaperStats:
+    # Reason -> players reclaimed for it
+    reclaimed: dict[str, int] = field(
+        default_factory=lambda: {reason: 0 for reason in REAP_REASONS}
+    )
+    failed: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.reclaimed.values())
+
+
+class IdleReaper:
+    """Times players nobody is listening to, so they can be disconnected.
+
+    A player is reaped ``alone_timeout`` seconds after the last listener left
+    its voice channel, or ``idle_timeout`` seconds after it stopped playing.
+    While more than ``soft_limit`` players are active, both timeouts shrink
+    in proportion, down to ``min_timeout``, so idle players are reclaimed
+    sooner when resources are tight. A ``soft_limit`` of 0 keeps them fixed.
+    """
+
+    def __init__(
+        self,
+        alone_timeout: float = 60.0,
+        idle_timeout: float = 300.0,
+        soft_limit: int = 0,
+        min_timeout: float = 10.0,
+    ) -> None:
+        self.alone_timeout = alone_timeout
+        self.idle_timeout = idle_timeout
+        self.soft_limit = soft_limit
+        self.min_timeout = min_timeout
+
+        self.stats = ReaperStats()
+
+        self._timers: dict[int, asyncio.Task[None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def timeout(self, base: float, players: int) -> float:
+        """Seconds to wait before reaping, given the amount of active players.
+
+        Args:
+            base (float): Configured timeout, ``alone_timeout`` or ``idle_timeout``.
+            players (int): Active players in this process.
+
+        Returns:
+            float: Timeout to use. Zero or less disables reaping.
+        """
+        if base <= 0 or self.soft_limit <= 0 or players <= self.soft_limit:
+            return base
+
+        return max(min(self.min_timeout, base), base * self.soft_limit / players)
+
+    def schedule(
+        self, guild_id: int, delay: float, reap: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Calls ``reap`` after ``delay`` seconds, unless cancelled before.
+
+        A guild that is already waiting keeps its earlier deadline.
+        """
+        if delay <= 0 or guild_id in self._timers:
+            return
+
+        self._timers[guild_id] = asyncio.create_task(self._wait(guild_id, delay, reap))
+
+    def cancel(self, guild_id: int) -> bool:
+        task = self._timers.pop(guild_id, None)
+        if task is None:
+            return False
+
+        # The reap itself cancels the timer, don't interrupt it
+        if task is not asyncio.current_task():
+            task.cancel()
+
+        return True
+
+    def close(self) -> None:
+        for guild_id in list(self._timers):
+            self.cancel(guild_id)
+
+    def record(self, reason: str) -> None:
+        self.stats.reclaimed[reason] = self.stats.reclaimed.get(reason, 0) + 1
+
+    async def _wait(
+        self, guild_id: int, delay: float, reap: Callable[[], Awaitable[None]]
+    ) -> None:
+        await asyncio.sleep(delay)
+
+        try:
+            await reap()
+        except Exception:
+            self.stats.failed += 1
+            logger.exception(f"Failed to reclaim player in guild {guild_id}.")
+        finally:
+            if self._timers.get(guild_id) is asyncio.current_task():
+                del self._timers[guild_id]
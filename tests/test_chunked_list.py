@@ -0,0 +1,186 @@
+import random
+import unittest
+
+from utils.chunked_list import ChunkedList
+
+# Small chunks, so a few items already split and merge them
+LOAD = 4
+
+
+class TestChunkedList(unittest.TestCase):
+    def assertMatches(self, items: ChunkedList[int], expected: list[int]) -> None:
+        self.assertEqual(list(items), expected)
+        self.assertEqual(len(items), len(expected))
+        self.assertEqual(list(reversed(items)), expected[::-1])
+        for index in range(-len(expected), len(expected)):
+            self.assertEqual(items[index], expected[index])
+
+        # The tree has to agree with the chunks it counts
+        for chunk, values in enumerate(items._chunks):
+            self.assertTrue(0 < len(values) <= 2 * LOAD)
+            self.assertEqual(
+                items._prefix(chunk + 1) - items._prefix(chunk), len(values)
+            )
+
+    def test_extend_fills_chunks(self) -> None:
+        items = ChunkedList(range(10), load=LOAD)
+
+        self.assertMatches(items, list(range(10)))
+        self.assertEqual([len(chunk) for chunk in items._chunks], [4, 4, 2])
+
+    def test_insert_splits_chunk(self) -> None:
+        items = ChunkedList(range(8), load=LOAD)
+        expected = list(range(8))
+
+        for value in range(100, 106):
+            items.insert(1, value)
+            expected.insert(1, value)
+            self.assertMatches(items, expected)
+
+        self.assertGreater(len(items._chunks), 2)
+
+    def test_insert_out_of_range(self) -> None:
+        items = ChunkedList(range(5), load=LOAD)
+        expected = list(range(5))
+
+        for index, value in ((100, 5), (-100, 6), (-1, 7), (0, 8)):
+            items.insert(index, value)
+            expected.insert(index, value)
+
+        self.assertMatches(items, expected)
+
+    def test_pop_merges_chunks(self) -> None:
+        items = ChunkedList(range(20), load=LOAD)
+        expected = list(range(20))
+
+        while expected:
+            index = len(expected) // 3
+            self.assertEqual(items.pop(index), expected.pop(index))
+            self.assertMatches(items, expected)
+
+        with self.assertRaises(IndexError):
+            items.pop()
+
+    def test_getitem_out_of_range(self) -> None:
+        items = ChunkedList(range(5), load=LOAD)
+
+        with self.assertRaises(IndexError):
+            items[5]
+        with self.assertRaises(IndexError):
+            items[-6]
+
+    def test_slicing(self) -> None:
+        items = ChunkedList(range(30), load=LOAD)
+        expected = list(range(30))
+
+        for start in range(-32, 33, 3):
+            for stop in range(-32, 33, 5):
+                self.assertEqual(items[start:stop], expected[start:stop])
+
+        self.assertEqual(items[::3], expected[::3])
+        self.assertEqual(items[::-2], expected[::-2])
+
+    def test_setitem(self) -> None:
+        items = ChunkedList(range(12), load=LOAD)
+        expected = list(range(12))
+
+        items[5] = 50
+        expected[5] = 50
+        items[2:9] = [1, 2]
+        expected[2:9] = [1, 2]
+        self.assertMatches(items, expected)
+
+    def test_delete_range(self) -> None:
+        for start in range(0, 26, 3):
+            for stop in range(start, 27, 2):
+                items = ChunkedList(range(25), load=LOAD)
+                expected = list(range(25))
+
+                items.delete_range(start, stop)
+                del expected[start:stop]
+                self.assertMatches(items, expected)
+
+    def test_delete_range_between_two_chunks(self) -> None:
+        items = ChunkedList(range(8), load=LOAD)
+        expected = list(range(8))
+
+        items.delete_range(3, 5)
+        del expected[3:5]
+        self.assertMatches(items, expected)
+
+    def test_delitem(self) -> None:
+        items = ChunkedList(range(20), load=LOAD)
+        expected = list(range(20))
+
+        del items[-1]
+        del expected[-1]
+        del items[3:-3]
+        del expected[3:-3]
+        del items[::2]
+        del expected[::2]
+        self.assertMatches(items, expected)
+
+    def test_move(self) -> None:
+        for index in range(-10, 10):
+            for to in range(-10, 10):
+                items = ChunkedList(range(10), load=LOAD)
+                expected = list(range(10))
+
+                items.move(index, to)
+                expected.insert(to % 10, expected.pop(index))
+                self.assertMatches(items, expected)
+
+        with self.assertRaises(IndexError):
+            ChunkedList(range(3), load=LOAD).move(0, 3)
+
+    def test_copy_is_independent(self) -> None:
+        items = ChunkedList(range(10), load=LOAD)
+        copied = items.copy()
+
+        copied.insert(0, -1)
+        del copied[5:]
+
+        self.assertMatches(items, list(range(10)))
+        self.assertMatches(copied, [-1, 0, 1, 2, 3])
+
+    def test_random_operations_match_list(self) -> None:
+        rng = random.Random(1)
+        items: ChunkedList[int] = ChunkedList(load=LOAD)
+        expected: list[int] = []
+
+        for value in range(3000):
+            operation = rng.randrange(7)
+            size = len(expected)
+
+            if operation == 0 or not size:
+                index = rng.randint(-size - 2, size + 2)
+                items.insert(index, value)
+                expected.insert(index, value)
+            elif operation == 1:
+                values = list(range(value, value + rng.randrange(10)))
+                items.extend(values)
+                expected.extend(values)
+            elif operation == 2:
+                index = rng.randrange(-size, size)
+                self.assertEqual(items.pop(index), expected.pop(index))
+            elif operation == 3:
+                start = rng.randint(-size, size)
+                stop = rng.randint(-size, size)
+                items.delete_range(start, stop)
+                del expected[start:stop]
+            elif operation == 4:
+                index, to = rng.randrange(size), rng.randrange(size)
+                items.move(index, to)
+                expected.insert(to, expected.pop(index))
+            elif operation == 5:
+                start = rng.randint(-size, size)
+                self.assertEqual(items[start : start + 7], expected[start : start + 7])
+            else:
+                items.append(value)
+                expected.append(value)
+
+            self.assertMatches(items, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
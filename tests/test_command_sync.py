@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from typing import TYPE_CHECKING, Any, cast
+from unittest import mock
+
+import discord
+from discord import app_commands
+
+from utils.command_sync import CommandSyncer, hash_payloads
+from utils.player_store import PlayerStore
+
+if TYPE_CHECKING:
+    from discord.types.command import ApplicationCommand
+
+
+class TestCommandSyncer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.store = PlayerStore(os.path.join(directory.name, "players.db"))
+        self.store.open()
+
+        self.client = discord.Client(intents=discord.Intents.none())
+        self.tree: app_commands.CommandTree[discord.Client] = app_commands.CommandTree(
+            self.client
+        )
+
+        @self.tree.command(description="Plays a song")
+        @app_commands.describe(query="What to play")
+        async def play(interaction: discord.Interaction, query: str) -> None:
+            pass
+
+        self.syncer = CommandSyncer(self.tree, self.store)
+        self.payloads = await self.syncer.payloads()
+        # What Discord has, the same commands unless a test changes them
+        self.remote = [dict(payload) for payload in self.payloads]
+
+        self.sync = mock.AsyncMock(side_effect=self.synced)
+        self.fetch = mock.AsyncMock(side_effect=self.fetched)
+        for name, patched in (("sync", self.sync), ("fetch_commands", self.fetch)):
+            patcher = mock.patch.object(self.tree, name, patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self) -> None:
+        await self.store.close()
+
+    async def synced(self, **kwargs: Any) -> list[app_commands.AppCommand]:
+        self.remote = [dict(payload) for payload in self.payloads]
+        return await self.fetched()
+
+    async def fetched(self, **kwargs: Any) -> list[app_commands.AppCommand]:
+        # Discord fills in ids and defaults the local payloads leave out
+        return [
+            app_commands.AppCommand(
+                data=cast(
+                    "ApplicationCommand",
+                    {**payload, "id": "1", "application_id": "2", "version": "3"},
+                ),
+                state=self.client._connection,
+            )
+            for payload in self.remote
+        ]
+
+    async def test_first_run_with_commands_on_discord(self) -> None:
+        result = await self.syncer.sync()
+
+        self.assertFalse(result.synced)
+        self.assertEqual(result.reason, "already on Discord")
+        self.sync.assert_not_awaited()
+        self.assertEqual(
+            self.store.command_hash("global"), hash_payloads(self.payloads)
+        )
+
+    async def test_first_run_without_commands_on_discord(self) -> None:
+        self.remote = []
+
+        result = await self.syncer.sync()
+
+        self.assertTrue(result.synced)
+        self.assertEqual(result.reason, "changed")
+        self.assertEqual(
+            self.store.command_hash("global"), hash_payloads(self.payloads)
+        )
+
+    async def test_hash_equal_and_discord_unchanged(self) -> None:
+        await self.store.save_command_hash("global", hash_payloads(self.payloads))
+
+        result = await self.syncer.sync()
+
+        self.assertFalse(result.synced)
+        self.assertEqual(result.reason, "unchanged since last sync")
+        self.fetch.assert_awaited_once()
+        self.sync.assert_not_awaited()
+
+    async def test_hash_equal_and_discord_changed(self) -> None:
+        await self.store.save_command_hash("global", hash_payloads(self.payloads))
+        self.remote[0]["description"] = "Edited from somewhere else"
+
+        result = await self.syncer.sync()
+
+        self.assertTrue(result.synced)
+        self.assertEqual(result.reason, "changed on Discord")
+        self.sync.assert_awaited_once_with(guild=None)
+
+        # Discord has the local commands again
+        self.assertFalse((await self.syncer.sync()).synced)
+        self.sync.assert_awaited_once()
+
+    async def test_hash_equal_and_command_deleted_on_discord(self) -> None:
+        await self.store.save_command_hash("global", hash_payloads(self.payloads))
+        self.remote = []
+
+        result = await self.syncer.sync()
+
+        self.assertTrue(result.synced)
+        self.assertEqual(result.reason, "changed on Discord")
+
+    async def test_hash_changed(self) -> None:
+        await self.store.save_command_hash("global", "outdated")
+
+        result = await self.syncer.sync()
+
+        self.assertTrue(result.synced)
+        self.assertEqual(result.reason, "changed")
+        # No need to ask Discord when the commands changed locally
+        self.fetch.assert_not_awaited()
+        self.assertEqual(
+            self.store.command_hash("global"), hash_payloads(self.payloads)
+        )
+
+    async def test_forced(self) -> None:
+        await self.store.save_command_hash("global", hash_payloads(self.payloads))
+
+        result = await self.syncer.sync(force=True)
+
+        self.assertTrue(result.synced)
+        self.assertEqual(result.reason, "forced")
+        self.fetch.assert_not_awaited()
+
+    async def test_guild_has_its_own_hash(self) -> None:
+        await self.store.save_command_hash("global", hash_payloads(self.payloads))
+        guild = discord.Object(id=5)
+        self.tree.copy_global_to(guild=guild)
+
+        result = await self.syncer.sync(guild=guild)
+
+        self.assertEqual(result.reason, "already on Discord")
+        self.fetch.assert_awaited_once_with(guild=guild)
+        self.assertIsNotNone(self.store.command_hash("5"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+from types import SimpleNamespace
+from typing import cast
+from unittest import mock
+
+import aiohttp
+import discord
+import wavelink
+
+from utils import compat
+
+
+def make_node(identifier: str) -> wavelink.Node:
+    client = cast(discord.Client, SimpleNamespace(user=SimpleNamespace(id=1)))
+    return wavelink.Node(
+        identifier=identifier,
+        uri=f"http://{identifier}:2333",
+        password="",
+        client=client,
+        session=cast(aiohttp.ClientSession, mock.Mock()),
+    )
+
+
+def make_player(node: wavelink.Node, guild_id: int = 1) -> wavelink.Player:
+    client = mock.Mock()
+    channel = mock.Mock()
+    channel._get_voice_client_key.return_value = (guild_id, "guild_id")
+
+    player = wavelink.Player(client, channel, nodes=[node])
+    player._guild = cast(discord.Guild, SimpleNamespace(id=guild_id))
+    node._players[guild_id] = player
+    return player
+
+
+@unittest.skipUnless(compat.SUPPORTED, "needs the pinned discord.py and wavelink")
+class TestCompat(unittest.TestCase):
+    def test_set_session_id(self) -> None:
+        node = make_node("a")
+
+        compat.set_session_id(node, "session")
+
+        self.assertEqual(node.session_id, "session")
+
+    def test_detach_player(self) -> None:
+        node = make_node("a")
+        player = make_player(node)
+
+        compat.detach_player(player)
+
+        self.assertEqual(node.players, {})
+        remove = cast(mock.Mock, player.client)._connection._remove_voice_client
+        remove.assert_called_once_with(1)
+
+
+@unittest.skipUnless(compat.SUPPORTED, "needs the pinned discord.py and wavelink")
+class TestMovePlayer(unittest.IsolatedAsyncioTestCase):
+    def make_player(self, node: wavelink.Node) -> wavelink.Player:
+        player = make_player(node)
+        player._voice_state = {
+            "voice": {"session_id": "voice", "token": "token", "endpoint": "endpoint"},
+            "channel_id": "2",
+        }
+        return player
+
+    async def test_to_other_node(self) -> None:
+        lost, target = make_node("lost"), make_node("target")
+        player = self.make_player(lost)
+
+        with (
+            mock.patch.object(lost, "_destroy_player") as destroy,
+            mock.patch.object(target, "_update_player") as update,
+        ):
+            await compat.move_player(player, target)
+
+        destroy.assert_awaited_once_with(1)
+        update.assert_awaited_once_with(
+            1,
+            data={
+                "voice": {
+                    "sessionId": "voice",
+                    "token": "token",
+                    "endpoint": "endpoint",
+                    "channelId": "2",
+                }
+            },
+        )
+        self.assertIs(player.node, target)
+        self.assertEqual(lost.players, {})
+        self.assertEqual(target.players, {1: player})
+        self.assertTrue(player.connected)
+
+    async def test_to_same_node(self) -> None:
+        node = make_node("node")
+        player = self.make_player(node)
+
+        with (
+            mock.patch.object(node, "_destroy_player") as destroy,
+            mock.patch.object(node, "_update_player") as update,
+        ):
+            await compat.move_player(player, node)
+
+        destroy.assert_not_awaited()
+        update.assert_awaited_once()
+        self.assertEqual(node.players, {1: player})
+
+    async def test_voice_not_moved(self) -> None:
+        lost, target = make_node("lost"), make_node("target")
+        player = make_player(lost)
+
+        with mock.patch.object(lost, "_destroy_player"):
+            with self.assertRaises(RuntimeError):
+                await compat.move_player(player, target)
+
+
+class TestUnsupported(unittest.TestCase):
+    def test_helpers_refuse_other_versions(self) -> None:
+        node = make_node("a")
+
+        with mock.patch.object(compat, "SUPPORTED", False):
+            with self.assertRaises(compat.UnsupportedVersion):
+                compat.set_session_id(node, "session")
+
+        self.assertIsNone(node.session_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from types import SimpleNamespace
+from typing import cast
+from unittest import mock
+
+import wavelink
+from wavelink.types.tracks import TrackPayload
+
+from players.guild_player import GuildPlayer
+from utils.track_codec import encode_track
+
+
+def track(index: int) -> wavelink.Playable:
+    payload: TrackPayload = {
+        "encoded": "",
+        "info": {
+            "identifier": f"video{index}",
+            "isSeekable": True,
+            "author": "Artist",
+            "length": 180_000,
+            "isStream": False,
+            "position": 0,
+            "title": f"Track {index}",
+            "uri": f"https://www.youtube.com/watch?v=video{index}",
+            "sourceName": "youtube",
+        },
+        "pluginInfo": {},
+        "userData": {},
+    }
+    payload["encoded"] = encode_track(payload)
+    return wavelink.Playable(payload)
+
+
+class TestJump(unittest.IsolatedAsyncioTestCase):
+    def make_player(self, play: mock.AsyncMock) -> GuildPlayer:
+        player = cast(wavelink.Player, SimpleNamespace(queue=None, play=play))
+        guild_player = GuildPlayer(player)
+        guild_player.get_queue().put([track(index) for index in range(5)])
+        return guild_player
+
+    async def test_skips_tracks_before(self) -> None:
+        play = mock.AsyncMock()
+        guild_player = self.make_player(play)
+
+        played = await guild_player.jump(2)
+
+        self.assertEqual(played, track(2))
+        play.assert_awaited_once()
+        self.assertEqual(list(guild_player.get_queue()), [track(3), track(4)])
+
+    async def test_failed_play_keeps_queue(self) -> None:
+        guild_player = self.make_player(mock.AsyncMock(side_effect=RuntimeError))
+
+        with self.assertRaises(RuntimeError):
+            await guild_player.jump(2)
+
+        self.assertEqual(
+            list(guild_player.get_queue()), [track(index) for index in range(5)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
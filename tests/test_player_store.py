@@ -0,0 +1,160 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import wavelink
+
+from benchmarks.common import fake_playable
+from players.queue import TrackQueue
+from utils.player_store import PlayerSnapshot, PlayerStore
+
+GUILD_ID = 1
+
+
+def snapshot(queue: TrackQueue, full: bool) -> PlayerSnapshot:
+    changes = queue.take_changes()
+    return PlayerSnapshot(
+        guild_id=GUILD_ID,
+        channel_id=GUILD_ID,
+        node_id="http://localhost:2333",
+        queue=queue.saved() if full or changes is None else [],
+        changes=None if full else changes,
+    )
+
+
+class TestQueueChanges(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "players.db")
+
+        self.store = PlayerStore(self.path)
+        self.store.open()
+        self.queue = TrackQueue()
+        self.random = random.Random(6)
+        self.added = 0
+
+    async def asyncTearDown(self) -> None:
+        await self.store.close()
+
+    def tracks(self, count: int) -> list[wavelink.Playable]:
+        tracks = [fake_playable(self.added + index) for index in range(count)]
+        self.added += count
+        return tracks
+
+    async def flush(self) -> PlayerSnapshot:
+        written: list[PlayerSnapshot] = []
+
+        def factory(full: bool) -> PlayerSnapshot:
+            written.append(snapshot(self.queue, full))
+            return written[-1]
+
+        self.store.mark_dirty(GUILD_ID, factory)
+        await self.store.flush()
+        return written[0]
+
+    async def assertSaved(self) -> None:
+        # A fresh store, so nothing comes from memory
+        store = PlayerStore(self.path)
+        store.open()
+        self.addAsyncCleanup(store.close)
+
+        loaded = await store.load(GUILD_ID)
+        assert loaded is not None
+
+        restored = TrackQueue()
+        restored.load_saved(loaded.queue)
+        self.assertEqual(
+            [track.encoded for track in restored], [t.encoded for t in self.queue]
+        )
+        self.assertEqual(restored.total_length, self.queue.total_length)
+        self.assertEqual(restored.duplicates, self.queue.duplicates)
+
+    async def test_only_changes_are_written(self) -> None:
+        self.queue.put(self.tracks(50))
+        self.assertIsNone((await self.flush()).changes)
+
+        self.queue.get()
+        self.queue.put(self.tracks(10))
+        written = await self.flush()
+
+        self.assertEqual(written.queue, [])
+        self.assertEqual(
+            [(kind, first, second) for kind, first, second, _ in written.changes or ()],
+            [("delete", 0, 1), ("insert", 49, 0)],
+        )
+        await self.assertSaved()
+
+    async def test_shuffle_rewrites_queue(self) -> None:
+        self.queue.put(self.tracks(20))
+        await self.flush()
+
+        self.queue.shuffle()
+        written = await self.flush()
+
+        self.assertIsNone(written.changes)
+        self.assertEqual(len(written.queue), 20)
+        await self.assertSaved()
+
+    async def test_random_changes(self) -> None:
+        self.queue.put(self.tracks(30))
+        await self.flush()
+
+        for _ in range(40):
+            for _ in range(self.random.randrange(1, 8)):
+                self.change()
+            await self.flush()
+
+        await self.assertSaved()
+
+    async def test_inserts_at_one_position_renumber(self) -> None:
+        self.queue.put(self.tracks(4))
+        await self.flush()
+
+        # Halves the gap between two rows every time, until none is left
+        for _ in range(80):
+            self.queue.put_at(2, self.tracks(1)[0])
+            await self.flush()
+
+        await self.assertSaved()
+
+    async def test_failed_flush_rewrites_queue(self) -> None:
+        self.queue.put(self.tracks(10))
+        await self.flush()
+
+        self.queue.get()
+        self.store.mark_dirty(GUILD_ID, lambda full: snapshot(self.queue, full))
+        with mock.patch.object(self.store, "_write", side_effect=sqlite3.Error):
+            with self.assertRaises(sqlite3.Error):
+                await self.store.flush()
+
+        self.queue.get()
+        self.assertIsNone((await self.flush()).changes)
+        await self.assertSaved()
+
+    def change(self) -> None:
+        size = len(self.queue)
+        choice = self.random.randrange(7)
+
+        if choice == 0 or size < 2:
+            self.queue.put(self.tracks(self.random.randrange(1, 20)))
+        elif choice == 1:
+            self.queue.get()
+        elif choice == 2:
+            self.queue.put_at(self.random.randrange(size + 1), self.tracks(1)[0])
+        elif choice == 3:
+            start = self.random.randrange(size)
+            self.queue.delete_range(start, start + self.random.randrange(1, 10))
+        elif choice == 4:
+            self.queue.move(self.random.randrange(size), self.random.randrange(size))
+        elif choice == 5:
+            self.queue.swap(self.random.randrange(size), self.random.randrange(size))
+        else:
+            self.queue.delete(self.random.randrange(-size, size))
+
+
+if __name__ == "__main__":
+    unittest.main()
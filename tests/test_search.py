@@ -0,0 +1,292 @@
+import asyncio
+import unittest
+from typing import cast
+from unittest import mock
+
+import wavelink
+from wavelink.types.tracks import TrackPayload
+
+from utils.search import SearchCache, SingleFlight, TrackResolver, normalize_query
+from utils.track_codec import encode_track
+
+
+def result(name: str) -> wavelink.Search:
+    return cast(wavelink.Search, [name])
+
+
+def track(identifier: str, is_stream: bool = False) -> wavelink.Playable:
+    payload: TrackPayload = {
+        "encoded": "",
+        "info": {
+            "identifier": identifier,
+            "isSeekable": not is_stream,
+            "author": "Artist",
+            "length": 180_000,
+            "isStream": is_stream,
+            "position": 0,
+            "title": "Title",
+            "sourceName": "youtube",
+        },
+        "pluginInfo": {},
+        "userData": {},
+    }
+    payload["encoded"] = encode_track(payload)
+    return wavelink.Playable(payload)
+
+
+class TestNormalizeQuery(unittest.TestCase):
+    def test_free_text(self) -> None:
+        self.assertEqual(
+            normalize_query("  Never   Gonna\tGIVE "), "search:never gonna give"
+        )
+        self.assertEqual(
+            normalize_query("hello.world is great"), "search:hello.world is great"
+        )
+
+    def test_youtube_forms(self) -> None:
+        for query in (
+            "https://www.youtube.com/watch?v=AbC&t=30",
+            "https://youtu.be/AbC",
+            "https://m.youtube.com/shorts/AbC",
+            "YouTube.com/watch?v=AbC",
+        ):
+            self.assertEqual(normalize_query(query), "youtube:video:AbC", query)
+
+        self.assertEqual(
+            normalize_query("https://www.youtube.com/watch?v=AbC&list=PLx"),
+            "youtube:video:AbC:list:PLx",
+        )
+        self.assertEqual(
+            normalize_query("https://www.youtube.com/playlist?list=PLx"),
+            "youtube:playlist:PLx",
+        )
+
+    def test_spotify_forms(self) -> None:
+        for query in (
+            "https://open.spotify.com/track/AbC?si=123",
+            "https://open.spotify.com/intl-de/track/AbC",
+            "spotify:Track:AbC",
+        ):
+            self.assertEqual(normalize_query(query), "spotify:track:AbC", query)
+
+    def test_only_host_is_case_folded(self) -> None:
+        # Paths and queries of other sites may be case sensitive
+        self.assertEqual(
+            normalize_query("https://Example.COM/Path/X?Q=1#part"),
+            "https://example.com/Path/X?Q=1",
+        )
+        self.assertEqual(
+            normalize_query("Example.com/Path"), "https://example.com/Path"
+        )
+
+    def test_soundcloud_is_case_folded(self) -> None:
+        self.assertEqual(
+            normalize_query("https://SoundCloud.com/Artist/Song"),
+            "soundcloud:artist/song",
+        )
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch("utils.search.time.monotonic", return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_expires_after_ttl(self) -> None:
+        cache = SearchCache(maxsize=4, ttl=10)
+        cache.put("a", result("a"))
+
+        self.clock.return_value = 109.9
+        self.assertEqual(cache.get("a"), result("a"))
+
+        self.clock.return_value = 110.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats.expirations, 1)
+
+    def test_put_again_restarts_ttl(self) -> None:
+        cache = SearchCache(maxsize=4, ttl=10)
+        cache.put("a", result("a"))
+
+        self.clock.return_value = 105.0
+        cache.put("a", result("b"))
+
+        self.clock.return_value = 112.0
+        self.assertEqual(cache.get("a"), result("b"))
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = SearchCache(maxsize=2, ttl=10)
+        cache.put("a", result("a"))
+        cache.put("b", result("b"))
+
+        # Using "a" makes "b" the oldest
+        cache.get("a")
+        cache.put("c", result("c"))
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), result("a"))
+        self.assertEqual(cache.get("c"), result("c"))
+        self.assertEqual(cache.stats.evictions, 1)
+
+    def test_disabled(self) -> None:
+        cache = SearchCache(maxsize=0)
+        cache.put("a", result("a"))
+
+        self.assertIsNone(cache.get("a"))
+
+    def test_hit_rate(self) -> None:
+        cache = SearchCache()
+        cache.put("a", result("a"))
+
+        cache.get("a")
+        cache.get("b")
+
+        self.assertEqual(cache.stats.hit_rate, 0.5)
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_collapses_concurrent_calls(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def call() -> str:
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.create_task(flight.run("key", call)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.assertEqual(len(flight), 1)
+
+        release.set()
+        self.assertEqual(await asyncio.gather(*waiters), ["result"] * 3)
+        self.assertEqual(calls, 1)
+        self.assertEqual((flight.calls, flight.collapsed), (3, 2))
+
+        # Done calls are forgotten, the next one starts anew
+        self.assertEqual(len(flight), 0)
+        await flight.run("key", call)
+        self.assertEqual(calls, 2)
+
+    async def test_different_keys_run_apart(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+
+        async def call(value: str) -> str:
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(
+            flight.run("a", lambda: call("a")), flight.run("b", lambda: call("b"))
+        )
+
+        self.assertEqual(results, ["a", "b"])
+        self.assertEqual(flight.collapsed, 0)
+
+    async def test_error_reaches_every_waiter(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+
+        async def call() -> str:
+            await asyncio.sleep(0)
+            raise RuntimeError("failed")
+
+        results = await asyncio.gather(
+            flight.run("key", call), flight.run("key", call), return_exceptions=True
+        )
+
+        self.assertTrue(all(isinstance(error, RuntimeError) for error in results))
+        self.assertEqual(len(flight), 0)
+
+    async def test_cancelled_waiter_keeps_call_running(self) -> None:
+        flight: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+
+        async def call() -> str:
+            await release.wait()
+            return "result"
+
+        first = asyncio.create_task(flight.run("key", call))
+        second = asyncio.create_task(flight.run("key", call))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        release.set()
+
+        self.assertEqual(await second, "result")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+
+class TestTrackResolver(unittest.IsolatedAsyncioTestCase):
+    async def test_serves_same_query_from_cache(self) -> None:
+        resolver = TrackResolver(SearchCache())
+        node = cast(wavelink.Node, object())
+
+        with mock.patch.object(
+            wavelink.Playable, "search", mock.AsyncMock(return_value=[track("a")])
+        ) as search:
+            first = await resolver.search("https://youtu.be/a")
+            # Any node gives the same result
+            second = await resolver.search("youtube.com/watch?v=a", node=node)
+
+        search.assert_awaited_once()
+        self.assertEqual(first, second)
+        # Every caller gets its own copy
+        self.assertIsNot(first, second)
+        assert isinstance(first, list) and isinstance(second, list)
+        first[0].extras = {"requested_by": "someone"}
+        self.assertEqual(dict(second[0].extras), {})
+
+    async def test_prefixed_query_has_own_key(self) -> None:
+        resolver = TrackResolver(SearchCache())
+
+        with mock.patch.object(
+            wavelink.Playable, "search", mock.AsyncMock(return_value=[track("a")])
+        ) as search:
+            await resolver.search("ytsearch:song")
+            await resolver.search("ytsearch:song", prefixed=True)
+
+        self.assertEqual(
+            [call.kwargs["source"] for call in search.await_args_list],
+            [wavelink.TrackSource.YouTubeMusic, None],
+        )
+
+    async def test_streams_are_not_cached(self) -> None:
+        resolver = TrackResolver(SearchCache())
+        stream = track("live", is_stream=True)
+
+        with mock.patch.object(
+            wavelink.Playable, "search", mock.AsyncMock(return_value=[stream])
+        ) as search:
+            await resolver.search("live radio")
+            await resolver.search("live radio")
+
+        self.assertEqual(search.await_count, 2)
+
+    async def test_concurrent_queries_share_search(self) -> None:
+        resolver = TrackResolver(SearchCache(maxsize=0))
+        release = asyncio.Event()
+
+        async def search(*args: object, **kwargs: object) -> list[wavelink.Playable]:
+            await release.wait()
+            return [track("a")]
+
+        with mock.patch.object(
+            wavelink.Playable, "search", mock.AsyncMock(side_effect=search)
+        ) as mocked:
+            waiters = [
+                asyncio.create_task(resolver.search(query))
+                for query in ("https://youtu.be/a", "youtube.com/watch?v=a")
+            ]
+            await asyncio.sleep(0)
+            release.set()
+            first, second = await asyncio.gather(*waiters)
+
+        mocked.assert_awaited_once()
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
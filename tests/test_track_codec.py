@@ -0,0 +1,120 @@
+import base64
+import unittest
+from typing import cast
+
+from wavelink.types.tracks import TrackInfoPayload, TrackPayload
+
+from utils.track_codec import decode_track, encode_track
+
+# Encoded by Lavalink, version 2 (no artwork or ISRC yet)
+RICK_ROLL = (
+    "QAAAjQIAJVJpY2sgQXN0bGV5IC0gTmV2ZXIgR29ubmEgR2l2ZSBZb3UgVXAADlJpY2tBc3RsZXlWRVZP"
+    "AAAAAAADPCAAC2RRdzR3OVdnWGNRAAEAK2h0dHBzOi8vd3d3LnlvdXR1YmUuY29tL3dhdGNoP3Y9ZFF3"
+    "NHc5V2dYY1EAB3lvdXR1YmUAAAAAAAAAAA=="
+)
+
+
+def payload(**info: object) -> TrackPayload:
+    track_info = {
+        "identifier": "abc",
+        "isSeekable": True,
+        "author": "Artist",
+        "length": 180_000,
+        "isStream": False,
+        "position": 0,
+        "title": "Title",
+        "sourceName": "youtube",
+        **info,
+    }
+    return {
+        "encoded": "",
+        "info": cast(TrackInfoPayload, track_info),
+        "pluginInfo": {},
+        "userData": {},
+    }
+
+
+class TestDecodeTrack(unittest.TestCase):
+    def test_lavalink_track(self) -> None:
+        track = decode_track(RICK_ROLL)
+
+        self.assertEqual(
+            track["info"],
+            {
+                "identifier": "dQw4w9WgXcQ",
+                "isSeekable": True,
+                "author": "RickAstleyVEVO",
+                "length": 212000,
+                "isStream": False,
+                "position": 0,
+                "title": "Rick Astley - Never Gonna Give You Up",
+                "sourceName": "youtube",
+                "uri": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            },
+        )
+        self.assertEqual(track["encoded"], RICK_ROLL)
+        self.assertEqual(encode_track(track, version=2), RICK_ROLL)
+
+    def test_skips_source_specific_data(self) -> None:
+        data = base64.b64decode(encode_track(payload(position=42)))
+        # Plugins write their own fields between the source and the position
+        extra = b"\x00\x05extra"
+        body = data[4:-8] + extra + data[-8:]
+        header = (int.from_bytes(data[:4], "big") & 0xC0000000) | len(body)
+        encoded = base64.b64encode(header.to_bytes(4, "big") + body).decode()
+
+        info = decode_track(encoded)["info"]
+
+        self.assertEqual(info["sourceName"], "youtube")
+        self.assertEqual(info["position"], 42)
+
+    def test_invalid(self) -> None:
+        encoded = encode_track(payload())
+
+        with self.assertRaises(ValueError):
+            decode_track(encoded[:20])
+        with self.assertRaises(ValueError):
+            decode_track("not base64!")
+
+
+class TestRoundTrip(unittest.TestCase):
+    def assertRoundTrip(self, track: TrackPayload, version: int = 3) -> None:
+        encoded = encode_track(track, version=version)
+        decoded = decode_track(encoded)
+
+        self.assertEqual(decoded["info"], track["info"])
+        self.assertEqual(encode_track(decoded, version=version), encoded)
+
+    def test_optional_fields(self) -> None:
+        self.assertRoundTrip(payload())
+        self.assertRoundTrip(payload(uri="https://example.com/track"))
+        self.assertRoundTrip(
+            payload(
+                uri="https://open.spotify.com/track/abc",
+                artworkUrl="https://i.scdn.co/image/abc",
+                isrc="USRC17607839",
+                sourceName="spotify",
+            )
+        )
+
+    def test_versions(self) -> None:
+        self.assertRoundTrip(payload(), version=1)
+        self.assertRoundTrip(payload(uri="https://example.com/track"), version=2)
+
+        # Fields a version didn't have are left out
+        track = payload(uri="https://example.com/track", isrc="USRC17607839")
+        self.assertNotIn("uri", decode_track(encode_track(track, version=1))["info"])
+        self.assertNotIn("isrc", decode_track(encode_track(track, version=2))["info"])
+
+    def test_stream_and_position(self) -> None:
+        self.assertRoundTrip(
+            payload(isStream=True, isSeekable=False, length=2**63 - 1, position=1234)
+        )
+
+    def test_modified_utf8(self) -> None:
+        # NUL and characters outside the BMP are written differently from UTF-8
+        self.assertRoundTrip(payload(title="a\x00b 🎵 ü 日本", author="\U0001f600"))
+
+
+if __name__ == "__main__":
+    unittest.main()
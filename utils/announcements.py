@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import logging
+from dataclasses import dataclass
+
+import discord
+
+from utils.views import Announcement, AnnouncementsView
+
+logger = logging.getLogger("beatbob")
+
+# Guild channels the bot can post announcements in
+AnnouncementChannel = (
+    discord.TextChannel | discord.VoiceChannel | discord.StageChannel | discord.Thread
+)
+
+
+def can_post(channel: AnnouncementChannel, permissions: discord.Permissions) -> bool:
+    """Whether the bot may send messages to a channel, given its permissions there.
+
+    Interaction followups are webhooks and don't need these permissions.
+    """
+    if not permissions.view_channel:
+        return False
+
+    if isinstance(channel, discord.Thread):
+        return permissions.send_messages_in_threads
+
+    return permissions.send_messages
+
+
+@dataclass
+class AnnouncerStats:
+    announced: int = 0
+    messages: int = 0
+    failed: int = 0
+
+
+class Announcer:
+    """Posts announcements to channels, batching bursts into one message.
+
+    The first announcement for a channel waits ``window`` seconds for more to
+    arrive, then all of them are sent as one message of at most ``max_batch``
+    announcements. Messages to a channel are sent one at a time. Replies to
+    interactions, errors included, never wait on this queue.
+    """
+
+    def __init__(self, window: float = 1.5, max_batch: int = 10) -> None:
+        self.window = window
+        self.max_batch = max_batch
+
+        self.stats = AnnouncerStats()
+
+        self._pending: dict[int, list[Announcement]] = {}
+        self._senders: dict[int, asyncio.Task[None]] = {}
+
+    def announce(
+        self, channel: AnnouncementChannel, announcement: Announcement
+    ) -> None:
+        self.stats.announced += 1
+
+        self._pending.setdefault(channel.id, []).append(announcement)
+
+        if channel.id not in self._senders:
+            # Batches announcements of many commands, so it's in none of their traces
+            self._senders[channel.id] = asyncio.create_task(
+                self._send(channel), context=contextvars.Context()
+            )
+
+    def close(self) -> None:
+        for task in self._senders.values():
+            task.cancel()
+
+        self._senders.clear()
+        self._pending.clear()
+
+    async def _send(self, channel: AnnouncementChannel) -> None:
+        channel_id = channel.id
+        try:
+            await asyncio.sleep(self.window)
+
+            while self._pending.get(channel_id):
+                pending = self._pending[channel_id]
+                batch = pending[: self.max_batch]
+                del pending[: self.max_batch]
+
+                try:
+                    await channel.send(view=AnnouncementsView(batch))
+                    self.stats.messages += 1
+                except discord.HTTPException:
+                    self.stats.failed += 1
+                    logger.warning(
+                        f"Failed to post {len(batch)} announcements in channel {channel_id}."
+                    )
+        finally:
+            self._pending.pop(channel_id, None)
+            self._senders.pop(channel_id, None)
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import itertools
+import random
+from collections.abc import Iterable, Iterator, MutableSequence
+from typing import TypeVar, cast, overload
+
+T = TypeVar("T")
+
+
+class ChunkedList(MutableSequence[T]):
+    """List split into chunks of at most ``2 * load`` items.
+
+    A Fenwick tree over the chunk sizes finds the chunk holding a position
+    in O(log n), so getting, inserting or deleting at any position costs that
+    plus shifting items within one chunk, instead of shifting everything
+    behind it like a list does. Chunks are split when they grow too large
+    and merged when they shrink, which rebuilds the tree in O(n / load),
+    at most once every ``load`` changes.
+    """
+
+    def __init__(self, items: Iterable[T] = (), load: int = 512) -> None:
+        self.load = load
+        self._chunks: list[list[T]] = []
+        # 1-based Fenwick tree over len() of each chunk
+        self._tree: list[int] = [0]
+        self._len = 0
+
+        self.extend(items)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[T]:
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __reversed__(self) -> Iterator[T]:
+        for chunk in reversed(self._chunks):
+            yield from reversed(chunk)
+
+    def __repr__(self) -> str:
+        return f"ChunkedList({list(self)!r})"
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[T]: ...
+
+    def __getitem__(self, index: int | slice) -> T | list[T]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+
+            return self._range(start, stop)
+
+        chunk, offset = self._locate(self._position(index))
+        return self._chunks[chunk][offset]
+
+    @overload
+    def __setitem__(self, index: int, value: T) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[T]) -> None: ...
+
+    def __setitem__(self, index: int | slice, value: T | Iterable[T]) -> None:
+        if isinstance(index, slice):
+            # Rarely used, not worth keeping the chunks in place for
+            items = list(self)
+            items[index] = cast(Iterable[T], value)
+            self._reset(items)
+            return
+
+        chunk, offset = self._locate(self._position(index))
+        self._chunks[chunk][offset] = cast(T, value)
+
+    def __delitem__(self, index: int | slice) -> None:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step == 1:
+                self.delete_range(start, stop)
+                return
+
+            items = list(self)
+            del items[index]
+            self._reset(items)
+            return
+
+        chunk, offset = self._locate(self._position(index))
+        del self._chunks[chunk][offset]
+        self._len -= 1
+        self._shrunk(chunk, 1)
+
+    def _position(self, index: int) -> int:
+        position = index + self._len if index < 0 else index
+        if not 0 <= position < self._len:
+            raise IndexError("ChunkedList index out of range")
+
+        return position
+
+    def _locate(self, position: int) -> tuple[int, int]:
+        """Chunk holding ``position`` and the offset within it."""
+        chunk = 0
+        step = 1 << (len(self._chunks).bit_length() - 1) if self._chunks else 0
+        while step:
+            following = chunk + step
+            if following <= len(self._chunks) and self._tree[following] <= position:
+                chunk = following
+                position -= self._tree[following]
+            step >>= 1
+
+        return chunk, position
+
+    def _range(self, start: int, stop: int) -> list[T]:
+        if start >= stop:
+            return []
+
+        chunk, offset = self._locate(start)
+        items: list[T] = []
+        remaining = stop - start
+        while remaining > 0:
+            taken = self._chunks[chunk][offset : offset + remaining]
+            items.extend(taken)
+            remaining -= len(taken)
+            chunk, offset = chunk + 1, 0
+
+        return items
+
+    def _update(self, chunk: int, delta: int) -> None:
+        node = chunk + 1
+        while node < len(self._tree):
+            self._tree[node] += delta
+            node += node & -node
+
+    def _prefix(self, chunks: int) -> int:
+        """Items in the first ``chunks`` chunks."""
+        total = 0
+        while chunks:
+            total += self._tree[chunks]
+            chunks &= chunks - 1
+
+        return total
+
+    def _add_chunk(self, items: list[T]) -> None:
+        # Appends a node to the tree, which covers itself and the nodes
+        # before it down to its lowest set bit
+        self._chunks.append(items)
+        node = len(self._chunks)
+        self._tree.append(
+            len(items) + self._prefix(node - 1) - self._prefix(node - (node & -node))
+        )
+
+    def _rebuild(self) -> None:
+        tree = [0]
+        tree.extend(len(chunk) for chunk in self._chunks)
+        for node in range(1, len(tree)):
+            parent = node + (node & -node)
+            if parent < len(tree):
+                tree[parent] += tree[node]
+
+        self._tree = tree
+
+    def _reset(self, items: list[T]) -> None:
+        self.clear()
+        self.extend(items)
+
+    def _grown(self, chunk: int) -> None:
+        if len(self._chunks[chunk]) <= 2 * self.load:
+            self._update(chunk, 1)
+            return
+
+        items = self._chunks[chunk]
+        self._chunks[chunk : chunk + 1] = [items[: self.load], items[self.load :]]
+        self._rebuild()
+
+    def _shrunk(self, chunk: int, removed: int) -> None:
+        items = self._chunks[chunk]
+        if not items:
+            del self._chunks[chunk]
+            self._rebuild()
+            return
+
+        if len(items) >= self.load // 2 or len(self._chunks) == 1:
+            self._update(chunk, -removed)
+            return
+
+        # Merge with a neighbour, so chunks don't get lost in tiny ones
+        if chunk > 0:
+            chunk -= 1
+        merged = self._chunks[chunk] + self._chunks[chunk + 1]
+        if len(merged) > 2 * self.load:
+            half = len(merged) // 2
+            self._chunks[chunk : chunk + 2] = [merged[:half], merged[half:]]
+        else:
+            self._chunks[chunk : chunk + 2] = [merged]
+        self._rebuild()
+
+    def insert(self, index: int, value: T) -> None:
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            self.append(value)
+            return
+
+        chunk, offset = self._locate(index)
+        self._chunks[chunk].insert(offset, value)
+        self._len += 1
+        self._grown(chunk)
+
+    def append(self, value: T) -> None:
+        if not self._chunks:
+            self._add_chunk([value])
+            self._len = 1
+            return
+
+        self._chunks[-1].append(value)
+        self._len += 1
+        self._grown(len(self._chunks) - 1)
+
+    def extend(self, values: Iterable[T]) -> None:
+        items = list(values)
+        if not items:
+            return
+
+        self._len += len(items)
+
+        # Tops up the last chunk, the rest goes into new ones
+        if self._chunks and len(self._chunks[-1]) < self.load:
+            room = self.load - len(self._chunks[-1])
+            self._chunks[-1].extend(items[:room])
+            self._update(len(self._chunks) - 1, len(items[:room]))
+            items = items[room:]
+
+        for start in range(0, len(items), self.load):
+            self._add_chunk(items[start : start + self.load])
+
+    def pop(self, index: int = -1) -> T:
+        chunk, offset = self._locate(self._position(index))
+        value = self._chunks[chunk].pop(offset)
+        self._len -= 1
+        self._shrunk(chunk, 1)
+        return value
+
+    def delete_range(self, start: int, stop: int) -> None:
+        """Deletes positions ``start`` up to ``stop``, like ``del items[start:stop]``.
+
+        Only chunks the range overlaps are touched, whole chunks in between
+        are dropped at once.
+        """
+        start, stop, _ = slice(start, stop).indices(self._len)
+        if start >= stop:
+            return
+
+        first, offset = self._locate(start)
+        last, end = self._locate(stop - 1)
+
+        if first == last:
+            del self._chunks[first][offset : end + 1]
+            self._len -= stop - start
+            self._shrunk(first, stop - start)
+            return
+
+        self._len -= stop - start
+        first_removed = len(self._chunks[first]) - offset
+        del self._chunks[first][offset:]
+        del self._chunks[last][: end + 1]
+
+        if last == first + 1 and self._chunks[first] and self._chunks[last]:
+            self._update(first, -first_removed)
+            self._update(last, -(end + 1))
+            return
+
+        del self._chunks[first + 1 : last]
+        self._chunks = [chunk for chunk in self._chunks if chunk]
+        self._rebuild()
+
+    def move(self, index: int, to: int) -> None:
+        """Moves the item at ``index`` so it ends up at position ``to``."""
+        position = self._position(to)
+        self.insert(position, self.pop(index))
+
+    def clear(self) -> None:
+        self._chunks = []
+        self._tree = [0]
+        self._len = 0
+
+    def copy(self) -> ChunkedList[T]:
+        copied: ChunkedList[T] = ChunkedList(load=self.load)
+        copied._chunks = [chunk.copy() for chunk in self._chunks]
+        copied._tree = self._tree.copy()
+        copied._len = self._len
+        return copied
+
+    def shuffle(self) -> None:
+        items = list(self)
+        random.shuffle(items)
+        self._reset(items)
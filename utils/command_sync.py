@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+import discord
+from discord import app_commands
+
+from utils.player_store import PlayerStore
+
+logger = logging.getLogger("beatbob")
+
+# Fields of a command or option payload that Discord keeps. Everything else,
+# like contexts, isn't reliably echoed back by the API
+COMPARED_FIELDS = {
+    "type",
+    "name",
+    "description",
+    "options",
+    "required",
+    "choices",
+    "value",
+    "channel_types",
+    "min_value",
+    "max_value",
+    "min_length",
+    "max_length",
+    "autocomplete",
+    "nsfw",
+    "default_member_permissions",
+    "name_localizations",
+    "description_localizations",
+}
+
+
+@dataclass
+class SyncResult:
+    commands: int
+    synced: bool
+    # Why commands were or weren't pushed
+    reason: str
+
+
+def sync_scope(guild: discord.abc.Snowflake | None) -> str:
+    return str(guild.id) if guild is not None else "global"
+
+
+def hash_payloads(payloads: list[dict[str, Any]]) -> str:
+    """Hash of command payloads that doesn't depend on their order."""
+    ordered = sorted(payloads, key=lambda payload: (payload["type"], payload["name"]))
+    encoded = json.dumps(ordered, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def signature(payload: dict[str, Any]) -> dict[str, Any]:
+    """The parts of a command payload Discord keeps, with unset values left out.
+
+    Makes a local payload comparable with one fetched from Discord, which
+    fills in defaults like empty choices or ``required: false``.
+    """
+    kept: dict[str, Any] = {}
+    for key, value in payload.items():
+        if key not in COMPARED_FIELDS or value in (None, False, "", [], {}):
+            continue
+
+        if key in ("options", "choices"):
+            value = [signature(item) for item in value]
+        elif key == "channel_types":
+            value = sorted(value)
+        elif key == "default_member_permissions":
+            value = str(value)
+
+        kept[key] = value
+
+    return kept
+
+
+def signatures(payloads: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return sorted(
+        (signature(payload) for payload in payloads),
+        key=lambda kept: (kept.get("type", 1), kept["name"]),
+    )
+
+
+class CommandSyncer:
+    """Syncs app commands to Discord only when they changed.
+
+    The local command tree is hashed and compared with the hash saved after
+    the last sync of the same scope. A different hash means the commands
+    changed and are synced. Otherwise the commands Discord has are fetched
+    and compared as well, in case they were changed from somewhere else.
+    Fetching doesn't count against the much stricter limit on syncs.
+    """
+
+    def __init__(self, tree: app_commands.CommandTree[Any], store: PlayerStore) -> None:
+        self.tree = tree
+        self.store = store
+
+        self._lock = asyncio.Lock()
+
+    async def payloads(
+        self, guild: discord.abc.Snowflake | None = None
+    ) -> list[dict[str, Any]]:
+        """Command payloads exactly as ``CommandTree.sync`` would send them."""
+        translator = self.tree.translator
+        commands = self.tree.get_commands(guild=guild)
+
+        if translator is not None:
+            return [
+                await command.get_translated_payload(self.tree, translator)
+                for command in commands
+            ]
+
+        return [command.to_dict(self.tree) for command in commands]
+
+    async def remote_payloads(
+        self, guild: discord.abc.Snowflake | None = None
+    ) -> list[dict[str, Any]]:
+        return [
+            {
+                **command.to_dict(),
+                "nsfw": command.nsfw,
+                "default_member_permissions": (
+                    command.default_member_permissions.value
+                    if command.default_member_permissions is not None
+                    else None
+                ),
+            }
+            for command in await self.tree.fetch_commands(guild=guild)
+        ]
+
+    async def sync(
+        self, guild: discord.abc.Snowflake | None = None, force: bool = False
+    ) -> SyncResult:
+        """Pushes the command tree to Discord if it differs from what was synced.
+
+        Args:
+            guild (discord.abc.Snowflake | None, optional): Guild to sync
+                commands to, or None for global commands. Defaults to None.
+            force (bool, optional): Sync even if nothing changed. Defaults to False.
+
+        Raises:
+            discord.HTTPException: Fetching or syncing the commands failed.
+
+        Returns:
+            SyncResult: Whether commands were pushed, and why.
+        """
+        scope = sync_scope(guild)
+
+        # A sync started while another one runs sees its saved hash
+        async with self._lock:
+            payloads = await self.payloads(guild)
+            digest = hash_payloads(payloads)
+
+            saved = self.store.command_hash(scope)
+            if force:
+                reason = "forced"
+            elif saved is not None and saved != digest:
+                reason = "changed"
+            else:
+                # Even with an unchanged hash, the commands may have been
+                # changed from somewhere else since
+                remote = await self.remote_payloads(guild)
+                if signatures(remote) == signatures(payloads):
+                    if saved is None:
+                        await self.store.save_command_hash(scope, digest)
+                        return SyncResult(len(payloads), False, "already on Discord")
+
+                    return SyncResult(len(payloads), False, "unchanged since last sync")
+
+                reason = "changed" if saved is None else "changed on Discord"
+
+            synced = await self.tree.sync(guild=guild)
+            await self.store.save_command_hash(scope, digest)
+
+        logger.info(f"Synced {len(synced)} app commands to {scope}.")
+        return SyncResult(len(synced), True, reason)
@@ -0,0 +1,132 @@
+import time
+
+import discord
+import wavelink
+
+# Resuming across restarts and moving players between nodes need state that
+# discord.py and wavelink don't expose. Every access to their internals lives
+# here and is only made on the versions pinned in requirements.txt, which
+# these helpers were checked against. On any other version the features that
+# need them are turned off, see SUPPORTED.
+DISCORD_VERSION = "2.7.1"
+WAVELINK_VERSION = "3.5.2"
+
+SUPPORTED = (
+    discord.__version__ == DISCORD_VERSION and wavelink.__version__ == WAVELINK_VERSION
+)
+
+# Closing the gateway with 1000 ends the session, which makes Discord drop the
+# bot from voice right away. Any other code keeps the voice connection (and
+# Lavalink's audio) alive until the restarted bot takes over.
+RESUMABLE_CLOSE_CODE = 4000
+
+
+class UnsupportedVersion(RuntimeError):
+    pass
+
+
+def _require(feature: str) -> None:
+    if not SUPPORTED:
+        raise UnsupportedVersion(
+            f"{feature} needs discord.py {DISCORD_VERSION} and wavelink {WAVELINK_VERSION}, "
+            f"found {discord.__version__} and {wavelink.__version__}."
+        )
+
+
+def set_session_id(node: wavelink.Node, session_id: str) -> None:
+    """Makes a node resume a Lavalink session instead of starting a new one.
+
+    Wavelink sends the session id when connecting.
+
+    Args:
+        node (wavelink.Node): Node that hasn't connected yet.
+        session_id (str): Session to resume.
+    """
+    _require("Resuming a Lavalink session")
+    node._session_id = session_id
+
+
+def detach_player(player: wavelink.Player) -> None:
+    """Forgets a player without disconnecting it or destroying it on Lavalink.
+
+    Args:
+        player (wavelink.Player): Player to forget.
+    """
+    _require("Detaching a player")
+    guild = player.guild
+    assert guild is not None
+
+    # Otherwise closing the node would disconnect it
+    player.node._players.pop(guild.id, None)
+    # Otherwise closing the client would leave voice
+    player.cleanup()
+
+
+async def close_gateway_resumable(client: discord.AutoShardedClient) -> None:
+    """Closes every shard's gateway without ending its session.
+
+    The shards are closed again by ``Client.close``, which then does nothing.
+
+    Args:
+        client (discord.AutoShardedClient): The bot, about to be closed.
+    """
+    _require("Keeping the gateway session")
+
+    for info in client.shards.values():
+        shard = info._parent
+        # Stops the shard from reconnecting after the close
+        shard._cancel_task()
+        if shard.ws.open:
+            await shard.ws.close(code=RESUMABLE_CLOSE_CODE)
+
+
+def adopt_playback(
+    player: wavelink.Player, resumed: wavelink.PlayerResponsePayload
+) -> None:
+    """Mirrors playback Lavalink kept alive through a resumed session.
+
+    Lavalink is still playing, only the local copy of its state is missing.
+
+    Args:
+        player (wavelink.Player): New player of the guild.
+        resumed (wavelink.PlayerResponsePayload): The player on Lavalink.
+    """
+    _require("Adopting a resumed player")
+
+    player._current = player._original = resumed.track
+    player.queue._loaded = resumed.track
+    player._volume = resumed.volume
+    player._paused = resumed.paused
+    player._filters = resumed.filters
+    player._last_position = resumed.state.position
+    player._last_update = time.monotonic_ns()
+
+
+async def move_player(player: wavelink.Player, node: wavelink.Node) -> None:
+    """Moves a player and its voice connection to another node.
+
+    Mirrors the first half of ``Player.switch_node``, which can't be used
+    since it restarts the track itself and re-adds it to history. The node
+    may also be the player's own node, once it came back without its old
+    session. Playback has to be restarted afterwards.
+
+    Args:
+        player (wavelink.Player): Player to move.
+        node (wavelink.Node): Node to move it to.
+
+    Raises:
+        RuntimeError: If the voice connection could not be moved.
+    """
+    _require("Moving a player to another node")
+    guild = player.guild
+    assert guild is not None
+
+    if node.identifier != player.node.identifier:
+        await player._destroy(with_invalidate=False)
+        player._node = node
+
+    node._players[guild.id] = player
+
+    await player._dispatch_voice_update()
+    if not player.connected:
+        raise RuntimeError(f"Failed to move voice state of guild {guild.id}.")
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Callable
+
+import aiohttp
+import discord
+
+logger = logging.getLogger("beatbob")
+
+# Message edits share one rate limit bucket per channel
+MESSAGE_EDIT_PATH = re.compile(r"/channels/(\d+)/messages/\d+$")
+
+
+@dataclass
+class EditStats:
+    requested: int = 0
+    sent: int = 0
+    coalesced: int = 0
+    rate_limited: int = 0
+    failed: int = 0
+
+
+@dataclass
+class _Target:
+    message: discord.Message
+    render: Callable[[], discord.ui.LayoutView]
+
+    # Seconds between edits of this message, grows while Discord pushes back
+    interval: float
+    next_edit: float = 0.0
+    dirty: bool = False
+    final: bool = False
+    on_gone: Callable[[], None] | None = None
+
+    channel_id: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.channel_id = self.message.channel.id
+
+
+class EditScheduler:
+    """Edits messages in the background, as fast as Discord allows and no faster.
+
+    Requests for a message that is already waiting are merged, only the
+    latest render is sent. Each message is edited at most once per
+    ``min_interval`` seconds, and one message per channel at a time. When an
+    edit is rate limited, or Discord held it back, the message's interval
+    doubles up to ``max_interval`` and then slowly recovers. At most
+    ``max_per_second`` edits are sent across all messages.
+
+    With ``watch``, edits also follow the rate limit buckets Discord reports:
+    once a channel's bucket is used up, its messages wait for the reset
+    instead of being held back by discord.py.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 2.0,
+        max_interval: float = 60.0,
+        max_per_second: float = 10.0,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_per_second = max_per_second
+
+        self.stats = EditStats()
+
+        self._targets: dict[int, _Target] = {}
+        self._busy_channels: set[int] = set()
+        # Channel id to when its edit bucket resets, for used up buckets
+        self._bucket_resets: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._edits: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        for task in self._edits:
+            task.cancel()
+
+    def request(
+        self,
+        message: discord.Message,
+        render: Callable[[], discord.ui.LayoutView],
+        *,
+        on_gone: Callable[[], None] | None = None,
+        final: bool = False,
+    ) -> None:
+        """Schedules an edit of a message.
+
+        Args:
+            message (discord.Message): Message to edit.
+            render (Callable[[], discord.ui.LayoutView]): Builds the new content,
+                called right before the edit is sent.
+            on_gone (Callable[[], None] | None, optional): Called if the message
+                turns out to be deleted. Defaults to None.
+            final (bool, optional): Forget the message once this edit is sent,
+                for messages that won't change again. Defaults to False.
+        """
+        self.stats.requested += 1
+
+        target = self._targets.get(message.id)
+        if target is None:
+            target = self._targets[message.id] = _Target(
+                message, render, interval=self.min_interval
+            )
+        elif target.dirty:
+            self.stats.coalesced += 1
+
+        target.render = render
+        target.on_gone = on_gone
+        target.final = final
+        target.dirty = True
+
+        self._wakeup.set()
+
+    def forget(self, message: discord.Message) -> None:
+        self._targets.pop(message.id, None)
+
+    def watch(self, config: aiohttp.TraceConfig) -> None:
+        """Reads the rate limit headers of the bot's Discord requests.
+
+        Args:
+            config (aiohttp.TraceConfig): Trace config of the bot's HTTP session.
+        """
+        config.on_request_end.append(self._request_end)
+
+    async def _request_end(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        if params.method != "PATCH":
+            return
+
+        match = MESSAGE_EDIT_PATH.search(params.url.path)
+        if match is None:
+            return
+
+        headers = params.response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is None or reset_after is None:
+            return
+
+        channel_id = int(match[1])
+        if int(remaining) > 0:
+            self._bucket_resets.pop(channel_id, None)
+        else:
+            self._bucket_resets[channel_id] = time.monotonic() + float(reset_after)
+            self._wakeup.set()
+
+    def _ready_at(self, target: _Target) -> float:
+        return max(target.next_edit, self._bucket_resets.get(target.channel_id, 0.0))
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+
+            self._bucket_resets = {
+                channel_id: reset
+                for channel_id, reset in self._bucket_resets.items()
+                if reset > now
+            }
+
+            due = [
+                target
+                for target in self._targets.values()
+                if target.dirty
+                and self._ready_at(target) <= now
+                and target.channel_id not in self._busy_channels
+            ]
+            for target in sorted(due, key=lambda target: target.next_edit):
+                if target.channel_id in self._busy_channels:
+                    continue
+
+                self._busy_channels.add(target.channel_id)
+                target.dirty = False
+                task = asyncio.create_task(self._edit(target))
+                self._edits.add(task)
+                task.add_done_callback(self._edits.discard)
+
+                await asyncio.sleep(1 / self.max_per_second)
+
+            waiting = [
+                self._ready_at(target)
+                for target in self._targets.values()
+                if target.dirty and target.channel_id not in self._busy_channels
+            ]
+            timeout = max(0.0, min(waiting) - time.monotonic()) if waiting else None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _edit(self, target: _Target) -> None:
+        started = time.monotonic()
+        try:
+            await target.message.edit(view=target.render())
+            self.stats.sent += 1
+
+            if target.final and not target.dirty:
+                self.forget(target.message)
+
+            # discord.py sleeps through rate limits itself, which shows up as
+            # an edit that took much longer than a round trip should. That also
+            # catches limits the bucket headers don't show, like the global one.
+            if time.monotonic() - started > 1.0:
+                self._back_off(target)
+            else:
+                target.interval = max(self.min_interval, target.interval * 0.8)
+        except discord.NotFound:
+            self.forget(target.message)
+            if target.on_gone is not None:
+                target.on_gone()
+        except discord.HTTPException as error:
+            if error.status == 429:
+                self._back_off(target)
+                target.dirty = True
+            else:
+                self.stats.failed += 1
+                logger.warning(
+                    f"Failed to edit message {target.message.id}: {error.status} {error.text}"
+                )
+        except Exception:
+            self.stats.failed += 1
+            logger.exception(f"Failed to edit message {target.message.id}.")
+        finally:
+            target.next_edit = time.monotonic() + target.interval
+            self._busy_channels.discard(target.channel_id)
+            self._wakeup.set()
+
+    def _back_off(self, target: _Target) -> None:
+        self.stats.rate_limited += 1
+        target.interval = min(self.max_interval, target.interval * 2)
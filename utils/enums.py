@@ -10,3 +10,18 @@ class LoopMode(Enum):
 class AutoPlayMode(Enum):
     ON = 0
     OFF = 2
+
+
+class DuplicateMode(Enum):
+    ALLOW = 0
+    REJECT = 1
+
+
+class FilterPreset(Enum):
+    OFF = "off"
+    NIGHTCORE = "nightcore"
+    VAPORWAVE = "vaporwave"
+    BASS_BOOST = "bass boost"
+    KARAOKE = "karaoke"
+    EIGHT_D = "8d"
+    SOFT = "soft"
@@ -0,0 +1,47 @@
+from typing import Callable
+
+import wavelink
+
+from utils.enums import FilterPreset
+
+
+def _nightcore(filters: wavelink.Filters) -> None:
+    filters.timescale.set(pitch=1.2, speed=1.2, rate=1)
+
+
+def _vaporwave(filters: wavelink.Filters) -> None:
+    filters.timescale.set(pitch=0.8, speed=0.85, rate=1)
+    filters.equalizer.set(bands=[{"band": 0, "gain": 0.3}, {"band": 1, "gain": 0.3}])
+
+
+def _bass_boost(filters: wavelink.Filters) -> None:
+    gains = [0.2, 0.15, 0.1, 0.05, 0.0]
+    filters.equalizer.set(
+        bands=[{"band": band, "gain": gain} for band, gain in enumerate(gains)]
+    )
+
+
+def _karaoke(filters: wavelink.Filters) -> None:
+    filters.karaoke.set(
+        level=1.0, mono_level=1.0, filter_band=220.0, filter_width=100.0
+    )
+
+
+def _eight_d(filters: wavelink.Filters) -> None:
+    filters.rotation.set(rotation_hz=0.2)
+
+
+def _soft(filters: wavelink.Filters) -> None:
+    filters.low_pass.set(smoothing=20.0)
+
+
+# Each preset is applied on top of reset filters
+FILTER_PRESETS: dict[FilterPreset, Callable[[wavelink.Filters], None]] = {
+    FilterPreset.OFF: lambda filters: None,
+    FilterPreset.NIGHTCORE: _nightcore,
+    FilterPreset.VAPORWAVE: _vaporwave,
+    FilterPreset.BASS_BOOST: _bass_boost,
+    FilterPreset.KARAOKE: _karaoke,
+    FilterPreset.EIGHT_D: _eight_d,
+    FilterPreset.SOFT: _soft,
+}
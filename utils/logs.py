@@ -0,0 +1,183 @@
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+TEXT_FORMAT = "%(asctime)s :: %(levelname)-7s :: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as compact JSON objects, one per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line["exception"] = record.exc_text
+
+        return json.dumps(line, separators=(",", ":"))
+
+
+class RotatingLogHandler(logging.FileHandler):
+    """Writes to one file, rotated once it reaches ``max_bytes`` or ``interval`` seconds.
+
+    Rotated files get the time of rotation appended to their name. Only the
+    newest ``backup_count`` of them are kept.
+    """
+
+    def __init__(
+        self, filename: str, max_bytes: int, interval: float, backup_count: int
+    ) -> None:
+        super().__init__(filename, encoding="utf-8")
+
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.rollover_at = time.time() + interval if interval > 0 else float("inf")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self._should_rollover():
+                self._rollover()
+        except Exception:
+            self.handleError(record)
+
+        super().emit(record)
+
+    def _should_rollover(self) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+
+        return (
+            self.max_bytes > 0
+            and self.stream is not None
+            and self.stream.tell() >= self.max_bytes
+        )
+
+    def _rollover(self) -> None:
+        if self.stream is not None:
+            self.stream.close()
+
+        rotated = f"{self.baseFilename}.{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}"
+        suffix = 0
+        while os.path.exists(rotated + (f".{suffix}" if suffix else "")):
+            suffix += 1
+        os.replace(self.baseFilename, rotated + (f".{suffix}" if suffix else ""))
+
+        if self.backup_count > 0:
+            backups = sorted(glob.glob(f"{glob.escape(self.baseFilename)}.*"))
+            for old in backups[: -self.backup_count]:
+                os.remove(old)
+
+        self.stream = self._open()
+        if self.interval > 0:
+            self.rollover_at = time.time() + self.interval
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a background thread, dropping them while it's behind.
+
+    Logging never waits on disk or the console. When the queue is full,
+    records are counted instead, and a single warning with the count is
+    logged once there is room again.
+    """
+
+    def __init__(self, log_queue: queue.Queue[logging.LogRecord]) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._unreported:
+            summary = logging.LogRecord(
+                record.name,
+                logging.WARNING,
+                __file__,
+                0,
+                f"Dropped {self._unreported} log messages while logging was overloaded.",
+                None,
+                None,
+            )
+            try:
+                self.queue.put_nowait(summary)
+                self._unreported = 0
+            except queue.Full:
+                pass
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+
+class LogPipeline:
+    """Writes log records to a rotating file and the console from a background thread."""
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        json_format: bool = False,
+        max_bytes: int = 10 * 1024 * 1024,
+        interval: float = 24 * 60 * 60,
+        backup_count: int = 10,
+        queue_size: int = 10_000,
+    ) -> None:
+        formatter: logging.Formatter = (
+            JsonFormatter()
+            if json_format
+            else logging.Formatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT)
+        )
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.file_handler = RotatingLogHandler(path, max_bytes, interval, backup_count)
+        self.file_handler.setFormatter(formatter)
+
+        self.console_handler = logging.StreamHandler()
+        self.console_handler.setLevel(logging.INFO)
+        self.console_handler.setFormatter(formatter)
+
+        self.queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(
+            self.queue,
+            self.file_handler,
+            self.console_handler,
+            respect_handler_level=True,
+        )
+        self._running = False
+
+    def attach(self, logger: logging.Logger) -> None:
+        logger.addHandler(self.handler)
+        self.listener.start()
+        self._running = True
+
+    def close(self) -> None:
+        """Writes out every queued record and stops the background thread."""
+        while self._running:
+            try:
+                self.listener.stop()
+                self._running = False
+            except queue.Full:
+                # The stop signal has to wait for room like everything else
+                time.sleep(0.01)
+
+        self.file_handler.close()
@@ -0,0 +1,229 @@
+import asyncio
+import bisect
+import os
+import time
+from collections import OrderedDict
+
+# Upper bounds in ms of latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Steps from one track ending to the next one playing
+TRANSITION_PHASES = {
+    "delivery": "Track end event delivery",
+    "lock_wait": "Waiting for the player lock",
+    "play": "Lavalink play request",
+    "start": "Play request to track start",
+}
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def expose_metric(
+    name: str,
+    kind: str,
+    description: str,
+    samples: list[tuple[dict[str, str], float]],
+) -> list[str]:
+    """Lines of a counter or gauge in the Prometheus text format.
+
+    Args:
+        name (str): Metric name.
+        kind (str): ``counter`` or ``gauge``.
+        description (str): Help text.
+        samples (list[tuple[dict[str, str], float]]): Labels and value of each series.
+
+    Returns:
+        list[str]: Lines, without trailing newlines.
+    """
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{format_labels(labels)} {value}" for labels, value in samples]
+    return lines
+
+
+def process_rss() -> int:
+    """Resident memory of this process in bytes, or its peak where unknown.
+
+    Returns 0 on Windows, which has neither.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        # Unix only
+        import resource
+    except ImportError:
+        return 0
+
+    # ru_maxrss is in KiB on Linux, where /proc is normally there anyway
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histogram:
+    """Counts observations in fixed buckets, like a Prometheus histogram.
+
+    Memory use is the same no matter how many values are observed.
+    Quantiles are estimated by interpolating inside the bucket they fall in.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimates the value below which ``q`` of the observations fall."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(
+                    lower + (upper - lower) * (rank - seen) / count,
+                    self.max,
+                )
+            seen += count
+
+        return self.max
+
+    def expose(self, name: str, labels: dict[str, str] | None = None) -> list[str]:
+        """Lines of this histogram in the Prometheus text format."""
+        labels = labels or {}
+
+        lines: list[str] = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            bucket_labels = format_labels({**labels, "le": str(bound)})
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+class TransitionMetrics:
+    """Latency of every phase of a track transition, in ms.
+
+    Kept globally, per Lavalink node for the play request, and per guild for
+    the ``max_guilds`` guilds with the most recent transitions.
+    """
+
+    def __init__(self, max_guilds: int = 1000) -> None:
+        self.max_guilds = max_guilds
+
+        self.phases = {phase: Histogram() for phase in TRANSITION_PHASES}
+        self.nodes: dict[str, Histogram] = {}
+        self.guilds: OrderedDict[int, dict[str, Histogram]] = OrderedDict()
+
+    def observe(
+        self, phase: str, guild_id: int, ms: float, node: str | None = None
+    ) -> None:
+        """Records how long a phase of a transition took.
+
+        Args:
+            phase (str): One of ``TRANSITION_PHASES``.
+            guild_id (int): Id of the guild the transition happened in.
+            ms (float): Duration in ms.
+            node (str | None, optional): Identifier of the node that served
+                the play request. Defaults to None.
+        """
+        self.phases[phase].observe(ms)
+
+        if node is not None:
+            self.nodes.setdefault(node, Histogram()).observe(ms)
+
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = {}
+            while len(self.guilds) > self.max_guilds:
+                self.guilds.popitem(last=False)
+        else:
+            self.guilds.move_to_end(guild_id)
+
+        guild.setdefault(phase, Histogram()).observe(ms)
+
+    def forget(self, guild_id: int) -> None:
+        self.guilds.pop(guild_id, None)
+
+    def expose(self) -> str:
+        """Global and per node histograms in the Prometheus text format.
+
+        Per guild histograms are left out to keep the amount of series bounded.
+        """
+        lines = [
+            "# HELP beatbob_transition_phase_ms Latency of track transition phases.",
+            "# TYPE beatbob_transition_phase_ms histogram",
+        ]
+        for phase, histogram in self.phases.items():
+            lines += histogram.expose("beatbob_transition_phase_ms", {"phase": phase})
+
+        lines += [
+            "# HELP beatbob_play_request_ms Latency of play requests per Lavalink node.",
+            "# TYPE beatbob_play_request_ms histogram",
+        ]
+        for node, histogram in sorted(self.nodes.items()):
+            lines += histogram.expose("beatbob_play_request_ms", {"node": node})
+
+        return "\n".join(lines) + "\n"
+
+
+class LoopMonitor:
+    """Measures how late the event loop wakes up a sleeping task.
+
+    Anything that blocks the loop, like slow synchronous code, shows up as lag.
+    """
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+
+        self.lag = Histogram()
+        self.last_lag_ms = 0.0
+
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+
+            self.last_lag_ms = max(
+                0.0, (time.perf_counter() - started - self.interval) * 1000
+            )
+            self.lag.observe(self.last_lag_ms)
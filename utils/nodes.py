@@ -0,0 +1,295 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+
+import discord
+import wavelink
+
+from utils import compat
+
+logger = logging.getLogger("beatbob")
+
+# Discord voice regions grouped by the area a Lavalink node could be hosted in
+REGION_GROUPS: dict[str, set[str]] = {
+    "us": {"us-west", "us-east", "us-central", "us-south"},
+    "sa": {"brazil"},
+    "eu": {"rotterdam", "russia"},
+    "asia": {"hongkong", "india", "japan", "singapore", "south-korea"},
+    "oceania": {"sydney"},
+    "africa": {"southafrica"},
+}
+
+
+@dataclass(frozen=True)
+class NodeConfig:
+    uri: str
+    password: str
+    region: str | None = None
+
+    def matches_region(self, rtc_region: str) -> bool:
+        if self.region is None:
+            return False
+
+        return rtc_region == self.region or rtc_region in REGION_GROUPS.get(
+            self.region, set()
+        )
+
+
+def parse_nodes(spec: str, default_password: str) -> list[NodeConfig]:
+    """Parses a list of Lavalink nodes.
+
+    Nodes are separated by commas and written as ``[region@]uri[|password]``,
+    e.g. ``eu@http://lavalink-eu:2333|secret, http://localhost:2333``.
+
+    Args:
+        spec (str): Node list.
+        default_password (str): Password for nodes that don't specify one.
+
+    Raises:
+        ValueError: If a node has no uri.
+
+    Returns:
+        list[NodeConfig]: One config per node.
+    """
+    configs: list[NodeConfig] = []
+
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        region: str | None = None
+        if "@" in entry.split("://", 1)[0]:
+            region, entry = entry.split("@", 1)
+
+        uri, _, password = entry.partition("|")
+        if not uri:
+            raise ValueError(f"Lavalink node '{entry}' is missing a uri.")
+
+        configs.append(
+            NodeConfig(
+                uri=uri.strip(),
+                password=password.strip() or default_password,
+                region=region.strip().casefold() if region else None,
+            )
+        )
+
+    return configs
+
+
+def load_penalty(
+    stats: wavelink.StatsResponsePayload | None, players: int, foreign_players: int
+) -> float:
+    """Scores how loaded a node is. Lower is better.
+
+    Uses the same weighting as the Lavalink reference client: one point per
+    player, with CPU load and frame deficit growing exponentially.
+
+    Args:
+        stats (wavelink.StatsResponsePayload | None): Last stats reported by the node.
+        players (int): Players this bot currently has on the node.
+        foreign_players (int): Players on the node that belong to other clients.
+
+    Returns:
+        float: The penalty of the node.
+    """
+    penalty = float(players + foreign_players)
+
+    if stats is None:
+        return penalty
+
+    penalty += float(1.05 ** (100 * stats.cpu.system_load)) * 10 - 10
+
+    if stats.frames is not None:
+        # Frame stats are per minute, with 3000 frames sent per player
+        penalty += float(1.03 ** (500 * stats.frames.deficit / 3000)) * 600 - 600
+        penalty += (float(1.03 ** (500 * stats.frames.nulled / 3000)) * 300 - 300) * 2
+
+    return penalty
+
+
+@dataclass
+class MigrationStats:
+    migrated: int = 0
+    failed: int = 0
+    resumed: int = 0
+
+    # Audio gap in seconds of the most recent migrations
+    gaps: deque[float] = field(default_factory=lambda: deque(maxlen=100))
+
+    def record(self, gap: float) -> None:
+        self.migrated += 1
+        self.gaps.append(gap)
+
+
+class NodePool:
+    """Keeps a set of Lavalink nodes and places new players on the least loaded one."""
+
+    def __init__(
+        self,
+        configs: list[NodeConfig],
+        stats_interval: float = 30.0,
+        failover_delay: float = 5.0,
+        resume_timeout: int = 60,
+    ):
+        if not configs:
+            raise ValueError("At least one Lavalink node must be configured.")
+
+        self.stats_interval = stats_interval
+        # Seconds to wait for a lost node to resume before moving its players
+        self.failover_delay = failover_delay
+        # Seconds Lavalink keeps players alive while the bot is disconnected
+        self.resume_timeout = resume_timeout
+
+        self.migrations = MigrationStats()
+
+        self.configs: dict[str, NodeConfig] = {config.uri: config for config in configs}
+        self.stats: dict[str, wavelink.StatsResponsePayload] = {}
+
+        # Players we had on a node when its stats were last fetched
+        self._players_at_fetch: dict[str, int] = {}
+
+        self._stats_task: asyncio.Task[None] | None = None
+        self._connect_task: asyncio.Task[None] | None = None
+
+    def create_nodes(self, sessions: dict[str, str]) -> list[wavelink.Node]:
+        nodes: list[wavelink.Node] = []
+
+        for config in self.configs.values():
+            node = wavelink.Node(
+                identifier=config.uri,
+                uri=config.uri,
+                password=config.password,
+                resume_timeout=self.resume_timeout,
+            )
+
+            if config.uri in sessions:
+                compat.set_session_id(node, sessions[config.uri])
+
+            nodes.append(node)
+
+        return nodes
+
+    def sessions(self) -> dict[str, str]:
+        return {
+            node.identifier: node.session_id
+            for node in wavelink.Pool.nodes.values()
+            if node.session_id
+        }
+
+    def start(
+        self, client: discord.Client, sessions: dict[str, str] | None = None
+    ) -> None:
+        """Connects every configured node in the background and polls their stats.
+
+        Args:
+            client (discord.Client): The bot.
+            sessions (dict[str, str] | None, optional): Lavalink session id per
+                node identifier, to resume after a restart. Defaults to None.
+        """
+        if self._connect_task is None:
+            self._connect_task = asyncio.create_task(
+                self.connect(client, sessions or {})
+            )
+
+        if self._stats_task is None:
+            self._stats_task = asyncio.create_task(self._poll_stats())
+
+    @property
+    def ready(self) -> bool:
+        """Whether at least one node is connected and can take players."""
+        return bool(self.connected_nodes())
+
+    async def connect(self, client: discord.Client, sessions: dict[str, str]) -> None:
+        """Connects every configured node at the same time, retrying until they are up."""
+        await asyncio.gather(
+            *(self._connect_node(client, node) for node in self.create_nodes(sessions))
+        )
+
+    async def _connect_node(self, client: discord.Client, node: wavelink.Node) -> None:
+        # Wavelink keeps retrying unreachable nodes itself, this covers nodes
+        # that refused the connection, e.g. while Lavalink is still starting
+        delay = 1.0
+        while True:
+            await wavelink.Pool.connect(nodes=[node], client=client)
+            if node.identifier in wavelink.Pool.nodes:
+                break
+
+            logger.warning(f"Retrying Lavalink node {node.uri} in {delay:.0f}s.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+        logger.info(f"Connected Lavalink node {node.uri}.")
+        await self.refresh_stats()
+
+    async def close(self) -> None:
+        for task in (self._connect_task, self._stats_task):
+            if task is not None:
+                task.cancel()
+
+        self._connect_task = None
+        self._stats_task = None
+
+        await wavelink.Pool.close()
+
+    def connected_nodes(self) -> list[wavelink.Node]:
+        return [
+            node
+            for node in wavelink.Pool.nodes.values()
+            if node.status is wavelink.NodeStatus.CONNECTED
+        ]
+
+    async def refresh_stats(self) -> None:
+        for node in self.connected_nodes():
+            try:
+                self.stats[node.identifier] = await node.fetch_stats()
+                self._players_at_fetch[node.identifier] = len(node.players)
+            except Exception:
+                logger.warning(f"Failed to fetch stats from Lavalink node {node.uri}.")
+
+    async def _poll_stats(self) -> None:
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            await self.refresh_stats()
+
+    def penalty(self, node: wavelink.Node) -> float:
+        stats = self.stats.get(node.identifier)
+
+        foreign_players = 0
+        if stats is not None:
+            foreign_players = max(
+                0, stats.players - self._players_at_fetch.get(node.identifier, 0)
+            )
+
+        return load_penalty(stats, len(node.players), foreign_players)
+
+    def best_node(self, rtc_region: str | None = None) -> wavelink.Node:
+        """Picks the node a new player should be placed on.
+
+        Nodes configured for the voice channel's region are preferred, as long
+        as one of them is connected.
+
+        Args:
+            rtc_region (str | None): Voice region of the channel. None if automatic.
+
+        Raises:
+            wavelink.InvalidNodeException: If no node is connected.
+
+        Returns:
+            wavelink.Node: The connected node with the lowest load penalty.
+        """
+        nodes = self.connected_nodes()
+        if not nodes:
+            raise wavelink.InvalidNodeException("No Lavalink node is connected.")
+
+        if rtc_region:
+            local_nodes = [
+                node
+                for node in nodes
+                if node.identifier in self.configs
+                and self.configs[node.identifier].matches_region(rtc_region)
+            ]
+            nodes = local_nodes or nodes
+
+        return min(nodes, key=self.penalty)
@@ -0,0 +1,534 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+import wavelink
+from wavelink.types.filters import FilterPayload
+
+from utils.chunked_list import ChunkedList
+from utils.track_codec import decode_track
+
+logger = logging.getLogger("beatbob")
+
+# Encoded track and its userData (extras), which is all that's needed to rebuild it
+SavedTrack = tuple[str, dict[str, Any]]
+# A queued track: encoded track, userData, length in ms and track key, so the
+# queue can be rebuilt without decoding. The last two are None in rows saved
+# before they were kept
+SavedQueuedTrack = tuple[str, dict[str, Any], int | None, str | None]
+# A change to a saved queue by position, in the order they were made:
+# ("insert", index, 0, tracks), ("delete", start, stop, []),
+# ("move", index, to, []) or ("replace", index, 0, [track])
+QueueChange = tuple[str, int, int, list[SavedQueuedTrack]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    node_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS command_syncs (
+    scope TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    guild_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    node_id TEXT NOT NULL,
+    current TEXT,
+    current_data TEXT,
+    position INTEGER NOT NULL,
+    queue_mode INTEGER NOT NULL,
+    autoplay INTEGER NOT NULL,
+    volume INTEGER NOT NULL,
+    paused INTEGER NOT NULL,
+    filters TEXT NOT NULL
+);
+-- idx orders the queue. Values are spread out, so a track can be put
+-- between two others without renumbering the rest
+CREATE TABLE IF NOT EXISTS tracks (
+    guild_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    encoded TEXT NOT NULL,
+    data TEXT NOT NULL,
+    length INTEGER,
+    key TEXT,
+    PRIMARY KEY (guild_id, idx)
+) WITHOUT ROWID;
+"""
+
+# Columns added to tables of older stores
+MIGRATIONS = {"tracks": {"length": "INTEGER", "key": "TEXT"}}
+
+
+def save_track(track: wavelink.Playable) -> SavedTrack:
+    # The encoded track it was built from. For a mirrored track that plays a
+    # copy, that's the mirrored one, see players.queue.MirroredPlayable
+    return track.raw_data["encoded"], dict(track.extras)
+
+
+def load_track(saved: SavedTrack) -> wavelink.Playable:
+    encoded, user_data = saved
+
+    payload = decode_track(encoded)
+    payload["userData"] = user_data
+
+    return wavelink.Playable(payload)
+
+
+@dataclass
+class PlayerSnapshot:
+    """Everything needed to rebuild a guild player after a restart."""
+
+    guild_id: int
+    channel_id: int
+    node_id: str
+
+    current: SavedTrack | None = None
+    position: int = 0
+    queue: list[SavedQueuedTrack] = field(default_factory=list)
+    # Changes to the saved queue, if only those are written. Then queue is empty
+    changes: list[QueueChange] | None = None
+
+    queue_mode: int = 0
+    autoplay: int = 2
+    volume: int = 10
+    paused: bool = False
+    filters: FilterPayload = field(default_factory=FilterPayload)
+
+
+@dataclass
+class StoreStats:
+    flushes: int = 0
+    players_written: int = 0
+    tracks_written: int = 0
+    last_flush_ms: float = 0.0
+
+
+class PlayerStore:
+    """Crash-safe SQLite store of guild player state.
+
+    Changes are only marked on the event loop. A background task collects
+    them every ``flush_interval`` seconds and writes them in one transaction
+    from a worker thread. At startup only the ids of saved guilds are read,
+    a guild's state is loaded when its player is next created.
+
+    Once a guild's queue is saved, only the changes made to it since are
+    written, by position. To find the rows those positions refer to, the
+    store keeps the ``idx`` of every saved row in queue order. The whole
+    queue is rewritten only when its changes can't be told by position, like
+    after a shuffle, or when they may not have reached the store.
+    """
+
+    def __init__(
+        self, path: str, flush_interval: float = 2.0, session_scope: str = ""
+    ) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        # Separates the Lavalink sessions of processes sharing the store
+        self.session_scope = session_scope
+
+        self.stats = StoreStats()
+
+        # Guild id -> snapshot factory, or None if the guild should be deleted
+        self._pending: dict[int, Callable[[bool], PlayerSnapshot] | None] = {}
+        self._saved: set[int] = set()
+        # Guilds whose saved queue the changes of their next snapshot apply to
+        self._synced: set[int] = set()
+        # Guild id -> idx of its saved tracks in queue order. Only used in
+        # the worker thread
+        self._ranks: dict[int, ChunkedList[float]] = {}
+        self._sessions: dict[str, str] = {}
+        self._command_hashes: dict[str, str] = {}
+
+        self._connection: sqlite3.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task[None] | None = None
+
+    @property
+    def sessions(self) -> dict[str, str]:
+        """Lavalink session id per node identifier, as of the last run."""
+        return self._sessions
+
+    def open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._migrate()
+
+        self._saved = {
+            guild_id
+            for (guild_id,) in self._connection.execute("SELECT guild_id FROM players")
+        }
+        for key, session_id in self._connection.execute(
+            "SELECT node_id, session_id FROM sessions"
+        ):
+            # Node ids can't contain "|", see parse_nodes
+            scope, _, node_id = key.rpartition("|")
+            if scope == self.session_scope:
+                self._sessions[node_id] = session_id
+
+        self._command_hashes = dict(
+            self._connection.execute("SELECT scope, hash FROM command_syncs")
+        )
+
+        logger.info(f"Player store opened with {len(self._saved)} saved guilds.")
+
+    def start(self) -> None:
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        await self.flush()
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def has(self, guild_id: int) -> bool:
+        return guild_id in self._saved or self._pending.get(guild_id) is not None
+
+    def _migrate(self) -> None:
+        assert self._connection is not None
+
+        for table, columns in MIGRATIONS.items():
+            existing = {
+                row[1]
+                for row in self._connection.execute(f"PRAGMA table_info({table})")
+            }
+            for column, kind in columns.items():
+                if column not in existing:
+                    self._connection.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {column} {kind}"
+                    )
+
+    def mark_dirty(
+        self, guild_id: int, snapshot: Callable[[bool], PlayerSnapshot]
+    ) -> None:
+        """Schedules the guild's state to be written on the next flush.
+
+        Args:
+            guild_id (int): Id of guild.
+            snapshot (Callable[[bool], PlayerSnapshot]): Called at flush time,
+                so many changes in a row only cost one snapshot. Gets whether
+                the whole queue is needed, otherwise only the changes since
+                the last snapshot may be returned.
+        """
+        self._pending[guild_id] = snapshot
+
+    def mark_deleted(self, guild_id: int) -> None:
+        self._pending[guild_id] = None
+
+    async def save_session(self, node_id: str, session_id: str) -> None:
+        self._sessions[node_id] = session_id
+
+        async with self._lock:
+            await asyncio.to_thread(
+                self._write_session,
+                f"{self.session_scope}|{node_id}" if self.session_scope else node_id,
+                session_id,
+            )
+
+    def command_hash(self, scope: str) -> str | None:
+        """Hash of the app commands last synced to ``scope``, see utils.command_sync."""
+        return self._command_hashes.get(scope)
+
+    async def save_command_hash(self, scope: str, digest: str) -> None:
+        self._command_hashes[scope] = digest
+
+        async with self._lock:
+            await asyncio.to_thread(self._write_command_hash, scope, digest)
+
+    async def load(self, guild_id: int) -> PlayerSnapshot | None:
+        """Loads a guild's saved state, including changes not yet flushed."""
+        if guild_id in self._pending:
+            snapshot = self._pending[guild_id]
+            # Takes the changes the next flush would have written
+            self._synced.discard(guild_id)
+            return snapshot(True) if snapshot is not None else None
+
+        if guild_id not in self._saved:
+            return None
+
+        async with self._lock:
+            loaded = await asyncio.to_thread(self._read, guild_id)
+
+        self._synced.add(guild_id)
+        return loaded
+
+    async def flush(self) -> None:
+        if not self._pending or self._connection is None:
+            return
+
+        pending, self._pending = self._pending, {}
+
+        snapshots: list[PlayerSnapshot] = []
+        deleted: list[int] = []
+        for guild_id, snapshot in pending.items():
+            if snapshot is None:
+                deleted.append(guild_id)
+                continue
+
+            try:
+                snapshots.append(snapshot(guild_id not in self._synced))
+            except Exception:
+                self._synced.discard(guild_id)
+                logger.exception(f"Failed to snapshot player in guild {guild_id}.")
+
+        started = time.perf_counter()
+        try:
+            async with self._lock:
+                await asyncio.to_thread(self._write, snapshots, deleted)
+        except Exception:
+            # Retry on the next flush, unless the guild changed again meanwhile.
+            # The changes taken are lost, so whole queues are written then
+            for guild_id, snapshot in pending.items():
+                self._pending.setdefault(guild_id, snapshot)
+            self._synced.difference_update(pending)
+            raise
+
+        self._saved.difference_update(deleted)
+        self._saved.update(snapshot.guild_id for snapshot in snapshots)
+        self._synced.difference_update(deleted)
+        self._synced.update(snapshot.guild_id for snapshot in snapshots)
+
+        self.stats.flushes += 1
+        self.stats.players_written += len(snapshots)
+        self.stats.tracks_written += sum(
+            len(snapshot.queue)
+            + sum(len(tracks) for *_, tracks in snapshot.changes or ())
+            for snapshot in snapshots
+        )
+        self.stats.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush player store.")
+
+    def _write_session(self, node_id: str, session_id: str) -> None:
+        assert self._connection is not None
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (node_id, session_id) VALUES (?, ?)",
+                (node_id, session_id),
+            )
+
+    def _write_command_hash(self, scope: str, digest: str) -> None:
+        assert self._connection is not None
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO command_syncs (scope, hash) VALUES (?, ?)",
+                (scope, digest),
+            )
+
+    def _write(self, snapshots: list[PlayerSnapshot], deleted: list[int]) -> None:
+        assert self._connection is not None
+
+        with self._connection:
+            for guild_id in deleted:
+                self._connection.execute(
+                    "DELETE FROM players WHERE guild_id = ?", (guild_id,)
+                )
+                self._connection.execute(
+                    "DELETE FROM tracks WHERE guild_id = ?", (guild_id,)
+                )
+                self._ranks.pop(guild_id, None)
+
+            for snapshot in snapshots:
+                current, current_data = snapshot.current or (None, None)
+
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        snapshot.guild_id,
+                        snapshot.channel_id,
+                        snapshot.node_id,
+                        current,
+                        json.dumps(current_data) if current_data is not None else None,
+                        snapshot.position,
+                        snapshot.queue_mode,
+                        snapshot.autoplay,
+                        snapshot.volume,
+                        snapshot.paused,
+                        json.dumps(snapshot.filters),
+                    ),
+                )
+                if snapshot.changes is None:
+                    self._write_queue(snapshot.guild_id, snapshot.queue)
+                else:
+                    self._write_changes(snapshot.guild_id, snapshot.changes)
+
+    def _write_queue(self, guild_id: int, queue: list[SavedQueuedTrack]) -> None:
+        assert self._connection is not None
+
+        self._connection.execute("DELETE FROM tracks WHERE guild_id = ?", (guild_id,))
+        self._insert_tracks(guild_id, range(len(queue)), queue)
+        self._ranks[guild_id] = ChunkedList(map(float, range(len(queue))))
+
+    def _write_changes(self, guild_id: int, changes: list[QueueChange]) -> None:
+        assert self._connection is not None
+
+        ranks = self._ranks[guild_id]
+        for kind, first, second, tracks in changes:
+            if kind == "insert":
+                added = self._ranks_at(guild_id, ranks, first, len(tracks))
+                self._insert_tracks(guild_id, added, tracks)
+                if first == len(ranks):
+                    ranks.extend(added)
+                else:
+                    for offset, rank in enumerate(added):
+                        ranks.insert(first + offset, rank)
+
+            elif kind == "delete" and first < second:
+                self._connection.execute(
+                    "DELETE FROM tracks WHERE guild_id = ? AND idx BETWEEN ? AND ?",
+                    (guild_id, ranks[first], ranks[second - 1]),
+                )
+                ranks.delete_range(first, second)
+
+            elif kind == "move":
+                rank = ranks.pop(first)
+                (moved,) = self._ranks_at(guild_id, ranks, second, 1)
+                self._connection.execute(
+                    "UPDATE tracks SET idx = ? WHERE guild_id = ? AND idx = ?",
+                    (moved, guild_id, rank),
+                )
+                ranks.insert(second, moved)
+
+            elif kind == "replace":
+                ((encoded, data, length, key),) = tracks
+                self._connection.execute(
+                    "UPDATE tracks SET encoded = ?, data = ?, length = ?, key = ? "
+                    "WHERE guild_id = ? AND idx = ?",
+                    (encoded, json.dumps(data), length, key, guild_id, ranks[first]),
+                )
+
+    def _insert_tracks(
+        self, guild_id: int, ranks: Iterable[float], tracks: list[SavedQueuedTrack]
+    ) -> None:
+        assert self._connection is not None
+
+        self._connection.executemany(
+            "INSERT INTO tracks (guild_id, idx, encoded, data, length, key) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (guild_id, rank, encoded, json.dumps(data), length, key)
+                for rank, (encoded, data, length, key) in zip(ranks, tracks)
+            ),
+        )
+
+    def _ranks_at(
+        self, guild_id: int, ranks: ChunkedList[float], index: int, count: int
+    ) -> list[float]:
+        """Picks ``count`` idx values for rows put at position ``index``.
+
+        They are spread between the neighbouring rows. If those are too close
+        together, the guild's rows are renumbered first.
+        """
+        low = ranks[index - 1] if index > 0 else None
+        high = ranks[index] if index < len(ranks) else None
+
+        if high is None:
+            start = low + 1 if low is not None else 0.0
+            return [start + offset for offset in range(count)]
+
+        if low is None:
+            return [high - count + offset for offset in range(count)]
+
+        step = (high - low) / (count + 1)
+        added = [low + step * (offset + 1) for offset in range(count)]
+        bounds = [low, *added, high]
+        if all(before < after for before, after in zip(bounds, bounds[1:])):
+            return added
+
+        self._renumber(guild_id, ranks)
+        return self._ranks_at(guild_id, ranks, index, count)
+
+    def _renumber(self, guild_id: int, ranks: ChunkedList[float]) -> None:
+        assert self._connection is not None
+
+        # Above every idx in use, including a row being moved, so none collide
+        (highest,) = self._connection.execute(
+            "SELECT MAX(idx) FROM tracks WHERE guild_id = ?", (guild_id,)
+        ).fetchone()
+        start = math.floor(highest) + 1
+
+        self._connection.executemany(
+            "UPDATE tracks SET idx = ? WHERE guild_id = ? AND idx = ?",
+            (
+                (start + offset, guild_id, rank)
+                for offset, rank in enumerate(list(ranks))
+            ),
+        )
+        renumbered = [float(start + offset) for offset in range(len(ranks))]
+        ranks.clear()
+        ranks.extend(renumbered)
+
+    def _read(self, guild_id: int) -> PlayerSnapshot | None:
+        assert self._connection is not None
+
+        row = self._connection.execute(
+            "SELECT * FROM players WHERE guild_id = ?", (guild_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        ranks: ChunkedList[float] = ChunkedList()
+        queue: list[SavedQueuedTrack] = []
+        for rank, encoded, data, length, key in self._connection.execute(
+            "SELECT idx, encoded, data, length, key FROM tracks "
+            "WHERE guild_id = ? ORDER BY idx",
+            (guild_id,),
+        ):
+            ranks.append(rank)
+            queue.append((encoded, json.loads(data), length, key))
+        self._ranks[guild_id] = ranks
+
+        (
+            _,
+            channel_id,
+            node_id,
+            current,
+            current_data,
+            position,
+            queue_mode,
+            autoplay,
+            volume,
+            paused,
+            filters,
+        ) = row
+
+        return PlayerSnapshot(
+            guild_id=guild_id,
+            channel_id=channel_id,
+            node_id=node_id,
+            current=(current, json.loads(current_data)) if current else None,
+            position=position,
+            queue=queue,
+            queue_mode=queue_mode,
+            autoplay=autoplay,
+            volume=volume,
+            paused=bool(paused),
+            filters=json.loads(filters),
+        )
@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import re
+import time
+import urllib.parse
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, TypeVar, cast
+
+import wavelink
+from wavelink.types.tracks import TrackPayload
+
+from utils.metrics import Histogram
+from utils.tracing import traced
+
+logger = logging.getLogger("beatbob")
+
+T = TypeVar("T")
+
+YOUTUBE_HOSTS = {
+    "youtube.com",
+    "www.youtube.com",
+    "m.youtube.com",
+    "music.youtube.com",
+}
+YOUTUBE_SHORT_HOSTS = {"youtu.be", "www.youtu.be"}
+SPOTIFY_HOSTS = {"open.spotify.com", "play.spotify.com"}
+SOUNDCLOUD_HOSTS = {"soundcloud.com", "www.soundcloud.com", "m.soundcloud.com"}
+
+# Start of a URL written without its scheme, like youtube.com/watch?v=x
+SCHEMELESS_URL = re.compile(r"^(?:[a-z0-9-]+\.)+[a-z]{2,}(?::\d+)?(?:[/?#]|$)", re.I)
+
+
+def _normalize_youtube(url: urllib.parse.SplitResult) -> str | None:
+    params = urllib.parse.parse_qs(url.query)
+    path = url.path.strip("/").split("/")
+
+    video_id: str | None = None
+    if url.hostname in YOUTUBE_SHORT_HOSTS:
+        video_id = path[0] or None
+    elif path[0] == "watch":
+        video_id = params.get("v", [None])[0]
+    elif path[0] in ("shorts", "live", "embed") and len(path) > 1:
+        video_id = path[1]
+
+    playlist_id = params.get("list", [None])[0]
+
+    if video_id and playlist_id:
+        # Lavalink loads the whole playlist with the video selected
+        return f"youtube:video:{video_id}:list:{playlist_id}"
+    if video_id:
+        return f"youtube:video:{video_id}"
+    if playlist_id:
+        return f"youtube:playlist:{playlist_id}"
+
+    return None
+
+
+def _normalize_spotify(url: urllib.parse.SplitResult) -> str | None:
+    path = [part for part in url.path.split("/") if part]
+
+    # Localized links look like /intl-de/track/<id>
+    if path and path[0].startswith("intl-"):
+        path = path[1:]
+
+    if len(path) < 2:
+        return None
+
+    return f"spotify:{path[0].casefold()}:{path[1]}"
+
+
+def _normalize_soundcloud(url: urllib.parse.SplitResult) -> str | None:
+    path = url.path.strip("/").casefold()
+    if not path:
+        return None
+
+    return f"soundcloud:{path}"
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query into a cache key.
+
+    Free text is trimmed, whitespace collapsed and case-folded. Known YouTube,
+    Spotify and SoundCloud URLs are reduced to a canonical form, so e.g.
+    ``youtu.be/x`` and ``youtube.com/watch?v=x&t=3`` give the same key.
+
+    Args:
+        query (str): Query as written by the user.
+
+    Returns:
+        str: The normalized query.
+    """
+    query = query.strip()
+
+    if query.casefold().startswith("spotify:"):
+        parts = query.split(":")
+        if len(parts) == 3:
+            return f"spotify:{parts[1].casefold()}:{parts[2]}"
+
+    url = urllib.parse.urlsplit(query)
+    if not url.scheme and not any(char.isspace() for char in query):
+        # Parsed like the URL it is, so IDs in its path and query keep their case
+        if SCHEMELESS_URL.match(query):
+            url = urllib.parse.urlsplit(f"https://{query}")
+
+    if url.scheme in ("http", "https") and url.hostname:
+        host = url.hostname.casefold()
+
+        canonical: str | None = None
+        if host in YOUTUBE_HOSTS or host in YOUTUBE_SHORT_HOSTS:
+            canonical = _normalize_youtube(url)
+        elif host in SPOTIFY_HOSTS:
+            canonical = _normalize_spotify(url)
+        elif host in SOUNDCLOUD_HOSTS:
+            canonical = _normalize_soundcloud(url)
+
+        if canonical:
+            return canonical
+
+        # Unknown URL, only the host is safe to case-fold
+        return url._replace(netloc=url.netloc.casefold(), fragment="").geturl()
+
+    return "search:" + " ".join(query.split()).casefold()
+
+
+def _copy_track(
+    track: wavelink.Playable, playlist: wavelink.PlaylistInfo | None = None
+) -> wavelink.Playable:
+    data = dict(track.raw_data)
+    data["userData"] = copy.deepcopy(dict(track.extras))
+    return wavelink.Playable(cast(TrackPayload, data), playlist=playlist)
+
+
+def copy_search(result: wavelink.Search) -> wavelink.Search:
+    """Copies a search result so callers can set extras without affecting the cache."""
+    if isinstance(result, wavelink.Playlist):
+        playlist = copy.copy(result)
+        playlist.tracks = [
+            _copy_track(track, track.playlist) for track in result.tracks
+        ]
+        # Only set once assigned, and not through the setter, which would
+        # also set them on every track
+        extras = getattr(result, "_extras", None)
+        if extras is not None:
+            playlist._extras = wavelink.ExtrasNamespace(copy.deepcopy(dict(extras)))
+        return playlist
+
+    return [_copy_track(track) for track in result]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SearchCache:
+    """Bounded LRU cache of search results, where every entry expires after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self.stats = CacheStats()
+
+        self._entries: OrderedDict[str, tuple[float, wavelink.Search]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> wavelink.Search | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return result
+
+    def put(self, key: str, result: wavelink.Search) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def is_cacheable(result: wavelink.Search) -> bool:
+    """Empty results and live streams are never cached."""
+    if not result:
+        return False
+
+    tracks = result.tracks if isinstance(result, wavelink.Playlist) else result
+    return not any(track.is_stream for track in tracks)
+
+
+class SingleFlight(Generic[T]):
+    """Collapses concurrent calls with the same key into one shared call.
+
+    The first caller for a key starts the call, every caller that arrives
+    while it is still running waits on the same task instead. Errors are
+    raised to every waiter. A waiter being cancelled does not cancel the
+    shared call for the others.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.collapsed = 0
+
+        self._in_flight: dict[str, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Runs ``func`` unless a call for ``key`` is already in flight.
+
+        Args:
+            key (str): Key identifying identical calls.
+            func (Callable[[], Awaitable[T]]): Starts the call if needed.
+
+        Returns:
+            T: Result of the shared call.
+        """
+        self.calls += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.collapsed += 1
+
+        return await asyncio.shield(task)
+
+
+class TrackResolver:
+    """Resolves queries to tracks through Lavalink.
+
+    Repeated queries are served from a search cache, and identical queries
+    that are resolved at the same time share a single Lavalink request.
+    """
+
+    def __init__(self, cache: SearchCache) -> None:
+        self.cache = cache
+        self.in_flight: SingleFlight[wavelink.Search] = SingleFlight()
+        # Latency in ms of searches that went to Lavalink
+        self.latency = Histogram()
+
+    @traced("search")
+    async def search(
+        self,
+        query: str,
+        *,
+        prefixed: bool = False,
+        node: wavelink.Node | None = None,
+    ) -> wavelink.Search:
+        """Searches for tracks, serving repeated queries from the cache.
+
+        The returned result is always a fresh copy and may be mutated freely.
+
+        Args:
+            query (str): Search text or URL.
+            prefixed (bool, optional): Whether the query starts with its own
+                search prefix, like ``ytsearch:``. Otherwise text is searched
+                on YouTube Music. Defaults to False.
+            node (wavelink.Node | None, optional): Node to search on, if not
+                cached. Defaults to None, which lets wavelink pick one. Nodes
+                are expected to run the same sources and plugins, so the
+                result doesn't depend on the node. It only spreads the load,
+                and is left out of the cache key.
+
+        Returns:
+            wavelink.Search: A playlist or a list of tracks. Empty if nothing was found.
+        """
+        key = normalize_query(query)
+        if prefixed:
+            key = f"prefixed:{key}"
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug(f"Search cache hit for '{key}'")
+            return copy_search(cached)
+
+        source = None if prefixed else wavelink.TrackSource.YouTubeMusic
+        result = await self.in_flight.run(
+            key, lambda: self._fetch(key, query, source, node)
+        )
+
+        return copy_search(result)
+
+    async def _fetch(
+        self,
+        key: str,
+        query: str,
+        source: wavelink.TrackSource | None,
+        node: wavelink.Node | None,
+    ) -> wavelink.Search:
+        started = time.perf_counter()
+        result: wavelink.Search = await wavelink.Playable.search(
+            query, source=source, node=node
+        )
+        self.latency.observe((time.perf_counter() - started) * 1000)
+
+        if is_cacheable(result):
+            self.cache.put(key, result)
+
+        return result
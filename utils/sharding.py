@@ -0,0 +1,97 @@
+import aiohttp
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+def parse_shard_ids(spec: str) -> list[int] | None:
+    """Parses a list of shard ids.
+
+    Ids and inclusive ranges are separated by commas, e.g. ``0-3,8``.
+
+    Args:
+        spec (str): Shard id list. Empty for every shard.
+
+    Raises:
+        ValueError: If an entry is not an id or a range.
+
+    Returns:
+        list[int] | None: Sorted shard ids, or None if the list is empty.
+    """
+    shard_ids: set[int] = set()
+
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        start, _, end = entry.partition("-")
+        if not start.strip().isdigit() or (end and not end.strip().isdigit()):
+            raise ValueError(f"'{entry}' is not a shard id or a range of them.")
+
+        shard_ids.update(range(int(start), int(end or start) + 1))
+
+    return sorted(shard_ids) or None
+
+
+def split_shards(shard_count: int, clusters: int) -> list[list[int]]:
+    """Splits shards into contiguous, evenly sized ranges, one per cluster.
+
+    Args:
+        shard_count (int): Total amount of shards.
+        clusters (int): Amount of worker processes. Capped at ``shard_count``.
+
+    Returns:
+        list[list[int]]: Shard ids of each cluster.
+    """
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+
+    ranges: list[list[int]] = []
+    start = 0
+    for cluster in range(clusters):
+        end = start + size + (1 if cluster < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+
+    return ranges
+
+
+def format_shard_ids(shard_ids: list[int]) -> str:
+    """Formats shard ids the way ``parse_shard_ids`` reads them, e.g. ``0-3,8``."""
+    parts: list[str] = []
+
+    start = previous = None
+    for shard_id in sorted(shard_ids) + [-2]:
+        if previous is not None and shard_id == previous + 1:
+            previous = shard_id
+            continue
+
+        if start is not None and previous is not None:
+            parts.append(str(start) if start == previous else f"{start}-{previous}")
+
+        start = previous = shard_id
+
+    return ",".join(parts)
+
+
+async def fetch_gateway_limits(token: str) -> tuple[int, int]:
+    """Asks Discord how many shards the bot should use.
+
+    Args:
+        token (str): Bot token.
+
+    Raises:
+        aiohttp.ClientResponseError: If Discord rejected the request.
+
+    Returns:
+        tuple[int, int]: Recommended shard count, and how many shards may
+            identify at the same time.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            GATEWAY_BOT_URL, headers={"Authorization": f"Bot {token}"}
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+
+    return int(data["shards"]), int(data["session_start_limit"]["max_concurrency"])
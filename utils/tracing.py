@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator, TypeVar, cast
+
+import aiohttp
+import discord
+from discord import app_commands
+from discord.app_commands.tree import ClientT
+
+logger = logging.getLogger("beatbob.trace")
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass
+class Span:
+    name: str
+    # Seconds since the start of the trace
+    start: float
+    depth: int
+    duration: float = 0.0
+    error: bool = False
+
+
+@dataclass
+class Trace:
+    """Timings of everything one app command did."""
+
+    interaction_id: int
+    command: str
+    guild_id: int | None
+    started: float = field(default_factory=time.perf_counter)
+    spans: list[Span] = field(default_factory=list)
+    # Set once logged, later spans of tasks the command started are dropped
+    finished: bool = False
+
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "trace", default=None
+)
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar("trace_depth", default=0)
+
+
+def _open_span(name: str) -> Span | None:
+    trace = _trace.get()
+    if trace is None or trace.finished:
+        return None
+
+    record = Span(name, time.perf_counter() - trace.started, _depth.get())
+    trace.spans.append(record)
+    return record
+
+
+def _close_span(record: Span) -> None:
+    trace = _trace.get()
+    if trace is not None:
+        record.duration = time.perf_counter() - trace.started - record.start
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times a block as part of the current command's trace, if there is one."""
+    record = _open_span(name)
+    if record is None:
+        yield
+        return
+
+    token = _depth.set(record.depth + 1)
+    try:
+        yield
+    except BaseException:
+        record.error = True
+        raise
+    finally:
+        _depth.reset(token)
+        _close_span(record)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator that times every call of a function as a span named ``name``."""
+
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return cast(F, async_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+class Tracer:
+    """Traces app commands and logs them as JSON lines.
+
+    A ``sample_rate`` share of commands is logged with the total time per
+    span name. Commands that take at least ``slow_ms`` are always logged,
+    with every span in order.
+    """
+
+    def __init__(self, sample_rate: float = 0.05, slow_ms: float = 2000.0) -> None:
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    def start(self, interaction: discord.Interaction) -> None:
+        command = interaction.command
+        trace = Trace(
+            interaction.id,
+            command.qualified_name if command is not None else "unknown",
+            interaction.guild_id,
+        )
+
+        # Commands run in their own task, so this only applies to this command
+        # and tasks it starts, until finish() marks the trace as done
+        _trace.set(trace)
+        interaction.extras["trace"] = trace
+
+    def finish(self, interaction: discord.Interaction, error: bool = False) -> None:
+        trace: Trace | None = interaction.extras.pop("trace", None)
+        if trace is None:
+            return
+
+        trace.finished = True
+
+        total_ms = (time.perf_counter() - trace.started) * 1000
+        slow = total_ms >= self.slow_ms
+        if not slow and random.random() >= self.sample_rate:
+            return
+
+        spans: dict[str, float] = {}
+        for record in trace.spans:
+            spans[record.name] = spans.get(record.name, 0.0) + record.duration * 1000
+
+        line: dict[str, Any] = {
+            "trace": str(trace.interaction_id),
+            "command": trace.command,
+            "guild": str(trace.guild_id) if trace.guild_id is not None else None,
+            "status": "error" if error else "ok",
+            "total_ms": round(total_ms, 1),
+            "spans": {name: round(ms, 1) for name, ms in spans.items()},
+        }
+
+        if not slow:
+            logger.info(json.dumps(line))
+            return
+
+        line["slow"] = True
+        line["tree"] = [
+            {
+                "name": record.name,
+                "start_ms": round(record.start * 1000, 1),
+                "ms": round(record.duration * 1000, 1),
+                "depth": record.depth,
+                **({"error": True} if record.error else {}),
+            }
+            for record in trace.spans
+        ]
+        logger.warning(json.dumps(line))
+
+    def http_trace(self) -> aiohttp.TraceConfig:
+        """Times the bot's Discord requests, which covers replies to interactions."""
+        config = aiohttp.TraceConfig()
+        config.on_request_start.append(self._request_start)
+        config.on_request_end.append(self._request_end)
+        config.on_request_exception.append(self._request_end)
+        return config
+
+    async def _request_start(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        path = params.url.path
+        if "/interactions/" in path and path.endswith("/callback"):
+            # Defer or the first reply
+            name = "respond"
+        elif "/webhooks/" in path and params.method == "POST":
+            name = "followup"
+        elif "/webhooks/" in path and params.method == "PATCH":
+            name = "edit"
+        else:
+            name = f"discord {params.method}"
+
+        context.span = _open_span(name)
+
+    async def _request_end(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams | aiohttp.TraceRequestExceptionParams,
+    ) -> None:
+        record: Span | None = getattr(context, "span", None)
+        if record is None:
+            return
+
+        if isinstance(params, aiohttp.TraceRequestExceptionParams):
+            record.error = True
+        elif params.response.status >= 400:
+            record.error = True
+
+        _close_span(record)
+
+
+class TracingCommandTree(app_commands.CommandTree[ClientT]):
+    """Command tree that traces every app command with the client's ``tracer``."""
+
+    def __init__(self, client: ClientT, *args: Any, **kwargs: Any) -> None:
+        super().__init__(client, *args, **kwargs)
+
+        tracer = getattr(client, "tracer", None)
+        self.tracer = tracer if isinstance(tracer, Tracer) else Tracer()
+
+    async def interaction_check(
+        self, interaction: discord.Interaction[ClientT]
+    ) -> bool:
+        self.tracer.start(interaction)
+        return True
+
+    async def on_error(
+        self,
+        interaction: discord.Interaction[ClientT],
+        error: app_commands.AppCommandError,
+    ) -> None:
+        self.tracer.finish(interaction, error=True)
+        await super().on_error(interaction, error)
@@ -0,0 +1,155 @@
+import base64
+import struct
+
+from wavelink.types.tracks import TrackInfoPayload, TrackPayload
+
+# Flag in the message header telling that a version byte follows
+TRACK_INFO_VERSIONED = 1
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.offset = 0
+
+    def read(self, size: int) -> bytes:
+        chunk = self.data[self.offset : self.offset + size]
+        if len(chunk) != size:
+            raise ValueError("Encoded track ended unexpectedly.")
+
+        self.offset += size
+        return chunk
+
+    def byte(self) -> int:
+        return self.read(1)[0]
+
+    def boolean(self) -> bool:
+        return self.byte() != 0
+
+    def long(self) -> int:
+        value: int = struct.unpack(">q", self.read(8))[0]
+        return value
+
+    def utf(self) -> str:
+        (size,) = struct.unpack(">H", self.read(2))
+        return decode_modified_utf8(self.read(size))
+
+    def nullable_utf(self) -> str | None:
+        return self.utf() if self.boolean() else None
+
+
+def decode_modified_utf8(data: bytes) -> str:
+    """Decodes Java's modified UTF-8, which writes NUL as two bytes and
+    characters outside the BMP as two three-byte surrogates."""
+    text = data.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+    return text.encode("utf-16-le", "surrogatepass").decode("utf-16-le")
+
+
+def encode_modified_utf8(text: str) -> bytes:
+    # Characters outside the BMP are written as a surrogate pair
+    chars = []
+    for char in text:
+        code = ord(char)
+        if code > 0xFFFF:
+            code -= 0x10000
+            chars.append(chr(0xD800 + (code >> 10)) + chr(0xDC00 + (code & 0x3FF)))
+        else:
+            chars.append(char)
+
+    return "".join(chars).encode("utf-8", "surrogatepass").replace(b"\x00", b"\xc0\x80")
+
+
+def decode_track(encoded: str) -> TrackPayload:
+    """Decodes a Lavalink encoded track string without asking Lavalink.
+
+    Source specific data written by plugins is skipped, so the returned
+    ``pluginInfo`` is always empty.
+
+    Args:
+        encoded (str): Base64 encoded track, as in ``Playable.encoded``.
+
+    Raises:
+        ValueError: If the string is not a valid encoded track.
+
+    Returns:
+        TrackPayload: Track payload that ``wavelink.Playable`` can be built from.
+    """
+    reader = _Reader(base64.b64decode(encoded))
+
+    (header,) = struct.unpack(">i", reader.read(4))
+    flags = (header & 0xC0000000) >> 30
+    version = reader.byte() if flags & TRACK_INFO_VERSIONED else 1
+
+    title = reader.utf()
+    author = reader.utf()
+    length = reader.long()
+    identifier = reader.utf()
+    is_stream = reader.boolean()
+    uri = reader.nullable_utf() if version >= 2 else None
+    artwork = reader.nullable_utf() if version >= 3 else None
+    isrc = reader.nullable_utf() if version >= 3 else None
+    source = reader.utf()
+
+    # Position is always the last field, after any source specific data
+    (position,) = struct.unpack(">q", reader.data[-8:])
+
+    info: TrackInfoPayload = {
+        "identifier": identifier,
+        "isSeekable": not is_stream,
+        "author": author,
+        "length": length,
+        "isStream": is_stream,
+        "position": position,
+        "title": title,
+        "sourceName": source,
+    }
+    if uri is not None:
+        info["uri"] = uri
+    if artwork is not None:
+        info["artworkUrl"] = artwork
+    if isrc is not None:
+        info["isrc"] = isrc
+
+    return {"encoded": encoded, "info": info, "pluginInfo": {}, "userData": {}}
+
+
+def encode_track(payload: TrackPayload, version: int = 3) -> str:
+    """Encodes track info the way Lavalink does, without source specific data.
+
+    Args:
+        payload (TrackPayload): Track to encode.
+        version (int, optional): Format version. Older versions leave out the
+            fields they didn't have yet. Defaults to 3, the current one.
+
+    Returns:
+        str: Base64 encoded track, as in ``Playable.encoded``.
+    """
+    info = payload["info"]
+
+    def utf(text: str) -> bytes:
+        data = encode_modified_utf8(text)
+        return struct.pack(">H", len(data)) + data
+
+    def nullable_utf(text: str | None) -> bytes:
+        return b"\x00" if text is None else b"\x01" + utf(text)
+
+    # Version 1 came before the version byte
+    parts = [bytes([version])] if version >= 2 else []
+    parts += [
+        utf(info["title"]),
+        utf(info["author"]),
+        struct.pack(">q", info["length"]),
+        utf(info["identifier"]),
+        bytes([info["isStream"]]),
+    ]
+    if version >= 2:
+        parts.append(nullable_utf(info.get("uri")))
+    if version >= 3:
+        parts += [nullable_utf(info.get("artworkUrl")), nullable_utf(info.get("isrc"))]
+    parts += [utf(info["sourceName"]), struct.pack(">q", info["position"])]
+
+    body = b"".join(parts)
+    flags = TRACK_INFO_VERSIONED if version >= 2 else 0
+    header = struct.pack(">i", (flags << 30) | len(body))
+
+    return base64.b64encode(header + body).decode()
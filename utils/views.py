@@ -1,4 +1,7 @@
 import math
+import sys
+from dataclasses import dataclass
+from typing import Callable, Protocol
 
 import discord
 import wavelink
@@ -97,145 +100,302 @@ class NowPlayingView(discord.ui.LayoutView):
         self.add_item(container)
 
 
-class QueuedView(discord.ui.LayoutView):
-    def __init__(
-        self,
-        queue: wavelink.Queue,
-        page_number: int = 0,
-        page_size: int = 5,
-        *,
-        timeout: float | None = None,
-    ):
+class NothingPlayingView(discord.ui.LayoutView):
+    def __init__(self, *, timeout: float | None = None):
         super().__init__(timeout=timeout)
 
+        container: discord.ui.Container[discord.ui.LayoutView] = discord.ui.Container(
+            discord.ui.TextDisplay(
+                content="## Current song\n"
+                "Nothing is playing right now. Add something with `/play`!"
+            ),
+            accent_color=discord.Color.dark_grey(),
+        )
+        self.add_item(container)
+
+
+@dataclass(frozen=True)
+class QueuePage:
+    """Rendered text of one page of the queue."""
+
+    number: int
+    total_pages: int
+
+    # Empty if the queue is empty
+    heading: str = ""
+    thumbnail: str = ""
+    body: str = ""
+    footer: str = ""
+
+
+class PagedQueue(Protocol):
+    """What ``QueuePages`` reads of a queue, like ``players.queue.TrackQueue``."""
+
+    @property
+    def version(self) -> int:
+        """Changes whenever the queue does."""
+        ...
+
+    @property
+    def count(self) -> int: ...
+
+    @property
+    def is_empty(self) -> bool: ...
+
+    @property
+    def total_length(self) -> int: ...
+
+    def peek(self, index: int = 0, /) -> wavelink.Playable: ...
+
+    def page(self, start: int, size: int) -> list[wavelink.Playable]: ...
+
+
+class QueuePages:
+    """Renders pages of a queue, caching them until the queue changes."""
+
+    def __init__(self, queue: PagedQueue, page_size: int = 5) -> None:
+        self.queue = queue
         self.page_size = page_size
 
-        self.tracks: list[wavelink.Playable] = [
-            queue.peek(i) for i in range(queue.count)
-        ]
+        self.hits = 0
+        self.misses = 0
 
-        # If no tracks exists in queue
-        if not self.tracks:
-            self.add_item(
-                discord.ui.Container(
-                    discord.ui.TextDisplay(
-                        content=f"Queue is currently empty. Add more songs with `/play`!"
-                    ),
-                    accent_color=discord.Color.red(),
-                )
-            )
-            return
+        self._version = queue.version
+        self._pages: dict[int, QueuePage] = {}
+
+    @property
+    def total_pages(self) -> int:
+        # Everything after the first track is paged
+        return max(1, math.ceil((self.queue.count - 1) / self.page_size))
+
+    def get(self, page_number: int) -> QueuePage:
+        """Gets a page, clamped into the valid range.
 
-        current_track = self.tracks[0]
+        Args:
+            page_number (int): Page to get, starting at 1.
 
-        queued_tracks: list[wavelink.Playable] = []
-        if len(self.tracks) > 1:
-            queued_tracks = self.tracks[1:]
+        Returns:
+            QueuePage: The rendered page.
+        """
+        if self._version != self.queue.version:
+            self._version = self.queue.version
+            self._pages.clear()
 
-        total_pages = max(1, math.ceil(len(queued_tracks) / page_size))
+        page_number = max(1, min(page_number, self.total_pages))
 
-        # Clamp page into valid range
-        self.page_number = max(1, min(page_number, total_pages))
+        page = self._pages.get(page_number)
+        if page is not None:
+            self.hits += 1
+            return page
 
-        start_index = (self.page_number - 1) * page_size
-        end_index = start_index + page_size
+        self.misses += 1
+        page = self._pages[page_number] = self._render(page_number)
+        return page
 
-        page_tracks = queued_tracks[start_index:end_index]
+    def _render(self, page_number: int) -> QueuePage:
+        queue = self.queue
+        if queue.is_empty:
+            return QueuePage(number=1, total_pages=1)
+
+        current_track = queue.peek(0)
+
+        start_index = (page_number - 1) * self.page_size
+        page_tracks = queue.page(start_index + 1, self.page_size)
 
         # Format string to display queue
-        queue_string = ""
-        if len(self.tracks) > 1:
-            queue_string = "\n".join(
-                f"{start_index + index + 2}. [{song.title}]({song.uri}) [{ms_to_hhmmss(song.length)}] ({requested_by(song)})"
-                for index, song in enumerate(page_tracks)
-            )
+        queue_string = "\n".join(
+            f"{start_index + index + 2}. [{song.title}]({song.uri}) [{ms_to_hhmmss(song.length)}] ({requested_by(song)})"
+            for index, song in enumerate(page_tracks)
+        )
 
-        container: discord.ui.Container[discord.ui.LayoutView] = discord.ui.Container(
-            discord.ui.Section(
-                discord.ui.TextDisplay(
-                    content=f"## Coming up\n"
-                    f"1. **[{current_track.title}]({current_track.uri})** [{ms_to_hhmmss(current_track.length)}]\n"
-                    f"{self.tracks[0].author}\n"
-                    f"**Requested by: **{requested_by(current_track)}"
-                ),
-                accessory=discord.ui.Thumbnail(
-                    self.tracks[0].artwork
-                    or f"https://img.youtube.com/vi/{current_track.identifier}/hqdefault.jpg"
-                ),
-            ),
-            discord.ui.Separator(),
-            discord.ui.TextDisplay(
-                content=(
-                    f"### Queue\n{queue_string}\n"
-                    f"Page {self.page_number}/{total_pages}"
-                    if len(queue_string) > 1
-                    else "No additional songs in queue."
-                )
+        return QueuePage(
+            number=page_number,
+            total_pages=self.total_pages,
+            heading=f"## Coming up\n"
+            f"1. **[{current_track.title}]({current_track.uri})** [{ms_to_hhmmss(current_track.length)}]\n"
+            f"{current_track.author}\n"
+            f"**Requested by: **{requested_by(current_track)}",
+            thumbnail=current_track.artwork
+            or f"https://img.youtube.com/vi/{current_track.identifier}/hqdefault.jpg",
+            body=(
+                f"### Queue\n{queue_string}\n" f"Page {page_number}/{self.total_pages}"
+                if len(queue_string) > 1
+                else "No additional songs in queue."
             ),
-            accent_color=discord.Color.yellow(),
+            footer=f"{queue.count} songs | Total length: {ms_to_hhmmss(queue.total_length)}",
         )
-        self.add_item(container)
 
 
-class TrackSkippedView(discord.ui.LayoutView):
+class PageButton(discord.ui.Button["QueuedView"]):
     def __init__(
-        self,
-        track_title: str = "",
-        track_uri: str = "",
-        by_user: str = "",
-        *,
-        timeout: float | None = None,
+        self, label: str, target: Callable[[int], int], *, disabled: bool = False
     ):
-        super().__init__(timeout=timeout)
-
-        container: discord.ui.Container[discord.ui.LayoutView] = discord.ui.Container(
-            discord.ui.TextDisplay(
-                content="## Track skipped\n"
-                f"Track **[{track_title}]({track_uri})** skipped by **{by_user}**."
-            ),
-            accent_color=discord.Color.yellow(),
+        super().__init__(
+            label=label, style=discord.ButtonStyle.secondary, disabled=disabled
         )
-        self.add_item(container)
+
+        # Page to go to, given the page currently shown
+        self.target = target
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        assert self.view is not None
+
+        self.view.render(self.target(self.view.page_number))
+        await interaction.response.edit_message(view=self.view)
 
 
-class TrackAddedView(discord.ui.LayoutView):
+class QueuedView(discord.ui.LayoutView):
+    """Shows a page of the queue, with buttons that flip pages in place."""
+
     def __init__(
         self,
-        track_title: str = "",
-        track_uri: str = "",
-        requested_by: str = "",
+        pages: QueuePages,
+        page_number: int = 1,
         *,
-        timeout: float | None = None,
+        timeout: float | None = 600,
     ):
         super().__init__(timeout=timeout)
 
+        self.pages = pages
+        self.page_number = page_number
+
+        # Set by whoever sends the view, so buttons can be removed on timeout
+        self.message: discord.WebhookMessage | None = None
+
+        self.render(page_number)
+
+    def render(self, page_number: int) -> None:
+        page = self.pages.get(page_number)
+        self.page_number = page.number
+
+        self.clear_items()
+
+        # If no tracks exists in queue
+        if not page.heading:
+            self.add_item(
+                discord.ui.Container(
+                    discord.ui.TextDisplay(
+                        content=f"Queue is currently empty. Add more songs with `/play`!"
+                    ),
+                    accent_color=discord.Color.red(),
+                )
+            )
+            return
+
         container: discord.ui.Container[discord.ui.LayoutView] = discord.ui.Container(
-            discord.ui.TextDisplay(
-                content="## Track added\n"
-                f"Track **[{track_title}]({track_uri})** added by **{requested_by}**."
+            discord.ui.Section(
+                discord.ui.TextDisplay(content=page.heading),
+                accessory=discord.ui.Thumbnail(page.thumbnail),
             ),
-            accent_color=discord.Color.green(),
+            discord.ui.Separator(),
+            discord.ui.TextDisplay(content=page.body),
+            discord.ui.TextDisplay(content=page.footer),
+            accent_color=discord.Color.yellow(),
         )
         self.add_item(container)
 
+        if page.total_pages > 1:
+            first = page.number == 1
+            last = page.number == page.total_pages
+            self.add_item(
+                discord.ui.ActionRow(
+                    PageButton("⏮", lambda page: 1, disabled=first),
+                    PageButton("◀", lambda page: page - 1, disabled=first),
+                    PageButton("▶", lambda page: page + 1, disabled=last),
+                    # Clamped to the last page, which may have moved since
+                    PageButton("⏭", lambda page: sys.maxsize, disabled=last),
+                )
+            )
+
+    async def on_timeout(self) -> None:
+        if self.message is None:
+            return
+
+        self.render(self.page_number)
+        for item in self.walk_children():
+            if isinstance(item, discord.ui.Button):
+                item.disabled = True
+
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+
+@dataclass(frozen=True)
+class Announcement:
+    """One line of news about the queue, posted publicly in a channel."""
+
+    heading: str
+    text: str
+    color: discord.Color
+
+
+def track_skipped(track_title: str, track_uri: str, by_user: str) -> Announcement:
+    return Announcement(
+        "Track skipped",
+        f"Track **[{track_title}]({track_uri})** skipped by **{by_user}**.",
+        discord.Color.yellow(),
+    )
+
+
+def track_added(track_title: str, track_uri: str, requested_by: str) -> Announcement:
+    return Announcement(
+        "Track added",
+        f"Track **[{track_title}]({track_uri})** added by **{requested_by}**.",
+        discord.Color.green(),
+    )
+
+
+def playlist_added(
+    playlist_name: str,
+    playlist_url: str,
+    requested_by: str,
+    amount_added: int,
+    total: int | None = None,
+    stopped: bool = False,
+    skipped: int = 0,
+) -> Announcement:
+    if total is None or amount_added + skipped == total:
+        songs = f"{amount_added} songs"
+    elif stopped:
+        songs = f"{amount_added} of {total} songs, stopped"
+    else:
+        songs = f"{amount_added} of {total} songs so far"
+
+    if skipped:
+        songs += f", {skipped} duplicates skipped"
+
+    return Announcement(
+        "Playlist added",
+        f"Playlist **[{playlist_name}]({playlist_url})** ({songs}) added by **{requested_by}**.",
+        discord.Color.green(),
+    )
+
+
+class AnnouncementsView(discord.ui.LayoutView):
+    """Shows one or more announcements in a single message."""
 
-class PlaylistAddedView(discord.ui.LayoutView):
     def __init__(
-        self,
-        playlist_name: str = "",
-        playlist_url: str = "",
-        requested_by: str = "",
-        amount_added: int = 0,
-        *,
-        timeout: float | None = None,
+        self, announcements: list[Announcement], *, timeout: float | None = None
     ):
         super().__init__(timeout=timeout)
 
+        if len(announcements) == 1:
+            content = f"## {announcements[0].heading}\n{announcements[0].text}"
+        else:
+            # Group lines under their heading, in order of first appearance
+            groups: dict[str, list[str]] = {}
+            for announcement in announcements:
+                groups.setdefault(announcement.heading, []).append(announcement.text)
+
+            content = "\n".join(
+                f"### {heading}\n" + "\n".join(texts)
+                for heading, texts in groups.items()
+            )
+
         container: discord.ui.Container[discord.ui.LayoutView] = discord.ui.Container(
-            discord.ui.TextDisplay(
-                content="## Playlist added\n"
-                f"Playlist **[{playlist_name}]({playlist_url})** ({amount_added} songs) added by **{requested_by}**."
-            ),
-            accent_color=discord.Color.green(),
+            discord.ui.TextDisplay(content=content),
+            accent_color=announcements[-1].color,
         )
         self.add_item(container)